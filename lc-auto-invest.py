@@ -6,6 +6,17 @@
 #
 
 import argparse
+import concurrent.futures
+import datetime
+import time
+import lcallocate
+import lcmetrics
+import lcrecord
+import lcrequest
+import lcscript
+import lcscreen
+import lcstore
+import lcstrategy
 from lcrequest import LCRequest
 from operator import itemgetter
 
@@ -15,6 +26,7 @@ from operator import itemgetter
 #
 
 VERSION= '1.2.3'
+SCRIPT= 'lc-auto-invest'
 MINIMUM_INVESTMENT_AMOUNT= 25
 MINIMUM_EMPLOYMENT_MONTHS= 12
 MINIMUM_DELINQUENCY_MONTHS= 12
@@ -22,12 +34,28 @@ MINIMUM_RECORD_MONTHS= 36
 MINIMUM_DEROGATORY_MONTHS= 36
 MAXIMUM_DTI= 40
 MAXIMUM_UTILIZATION= 75
-GRADES= map(chr, range(ord('A'), ord('G')+1))
+ENGINES= ['python', 'numpy']
+ALLOCATIONS= ['spread', 'yield']
+
+# Lending Club releases new listings at 6AM, 10AM, 2PM, and 6PM (Pacific time)
+RELEASE_TIMES= ['06:00', '10:00', '14:00', '18:00']
+RELEASE_LEAD_SECONDS= 30
+POLL_INTERVAL_SECONDS= 0.25
+POLL_DURATION_SECONDS= 60
+PREFETCH_WORKERS= 4
+ORDER_CHUNK_SIZE= 100
+ORDER_WORKERS= 4
+REFILL_ROUNDS= 2
+GRADES= list(map(chr, range(ord('A'), ord('G')+1)))
 PORTFOLIO_DESCRIPTION= 'Automatically created'
 
 KEY_CASH= 'cash'
 KEY_INVESTED_LOANS= 'investedLoans'
 KEY_SHOPPING_LIST= 'shoppingList'
+KEY_SUMMARY= 'summary'
+KEY_TALLY= 'tally'
+KEY_LISTING= 'listing'
+KEY_CANDIDATES= 'candidates'
 
 
 # Lending Club API data structure keys
@@ -63,7 +91,9 @@ KEY_LOAN_ID= 'loanId'
 KEY_REQUESTED_AMOUNT= 'requestedAmount'
 KEY_INVESTED_AMOUNT= 'investedAmount'
 KEY_ORDER_ID= 'orderInstructId'
+KEY_ORDER_IDS= 'orderInstructIds'
 KEY_CONFIRMATIONS= 'orderConfirmations'
+KEY_FAILED_CHUNKS= 'failedChunks'
 KEY_EXECUTIONS_STATUS= 'executionStatus'
 
 ACCEPTABLE_HOME= ['RENT', 'OWN', 'MORTGAGE']
@@ -74,15 +104,16 @@ ACCEPTABLE_PURPOSES= ['debt_consolidation', 'home_improvement', 'small_business'
 # Define our functions
 #
 
-# Collect all expected and detected arguments from the command line
+# Collect all expected and detected arguments from the command line (or a given list)
 #
-def GetArguments():
+def GetArguments(arguments=None):
   argumentParser= argparse.ArgumentParser()
 
   argumentParser.add_argument('-t', '--token', '--authorization-token', nargs=1, dest='token', required=True, action='store', help='Lending Club individual API authorization token')
   argumentParser.add_argument('-i', '--id', '--investor-id', nargs=1, dest='id', required=True, action='store', help='Lending Club individual account number')
   argumentParser.add_argument('-p', '--portfolio', nargs=1, dest='portfolio', required=False, action='store', help='Lending Club destination portfolio for bought notes')
 
+  argumentParser.add_argument('-s', '--strategy', nargs=1, dest='strategy', required=False, action='store', help='Strategy file (JSON, YAML, or TOML) declaring screening rules, grade allocations, and per-note amounts')
   argumentParser.add_argument('-g', '--grade', nargs=2, metavar=('GRADE', 'PERCENT'), dest='grades', required=False, action='append', help='Specify percent allocation for a major note grade')
   argumentParser.add_argument('--minimum-amount-per-note', nargs=1, dest='min', type=int, required=False, action='store', default=[MINIMUM_INVESTMENT_AMOUNT], help='Smallest amount to invest per note')
   argumentParser.add_argument('--maximum-amount-per-note', nargs=1, dest='max', type=int, required=False, action='store', default=[MINIMUM_INVESTMENT_AMOUNT], help='Largest amount to invest per note')
@@ -93,16 +124,36 @@ def GetArguments():
   argumentParser.add_argument('--record-months', nargs=1, dest='minRecordMonths', type=int, required=False, action='store', default=[MINIMUM_RECORD_MONTHS], help='Minimum acceptable time since last public record (in whole months)')
   argumentParser.add_argument('--derogatory-months', nargs=1, dest='minDerogatoryMonths', type=int, required=False, action='store', default=[MINIMUM_DEROGATORY_MONTHS], help='Minimum acceptable time since last major derogatory (in whole months)')
 
+  argumentParser.add_argument('--engine', nargs=1, dest='engine', choices=ENGINES, required=False, action='store', default=[ENGINES[0]], help='Screen available notes one at a time (python) or as column arrays (numpy)')
+
+  argumentParser.add_argument('--allocation', nargs=1, dest='allocation', choices=ALLOCATIONS, required=False, action='store', default=[ALLOCATIONS[0]], help='Spread cash over suitable notes within each grade (spread) or buy the highest yielding notes across all grades (yield)')
   argumentParser.add_argument('--chase-yield', dest='chaseYield', required=False, action='store_true', default=False, help='Prefer higher yielding notes within a grade')
   argumentParser.add_argument('--eat-cash', dest='eatCash', required=False, action='store_true', default=False, help='Aggressively attempt to overbuy to use up any and all cash')
 
+  argumentParser.add_argument('--order-chunk-size', nargs=1, dest='orderChunkSize', type=int, required=False, action='store', default=[ORDER_CHUNK_SIZE], help='Number of notes per order above which orders are split and submitted concurrently (into no more orders than the orders rate limit lets through at once; 0 never splits)')
+  argumentParser.add_argument('--refill-rounds', nargs=1, dest='refillRounds', type=int, required=False, action='store', default=[REFILL_ROUNDS], help='Times to reinvest amounts left unfilled by an order in the next suitable notes')
+
+  argumentParser.add_argument('--prefetch', dest='prefetch', required=False, action='store_true', default=False, help='Request the account summary, owned notes, portfolios, and listing concurrently')
+  argumentParser.add_argument('--daemon', dest='daemon', required=False, action='store_true', default=False, help='Keep running and buy notes as soon as each listing release appears')
+  argumentParser.add_argument('--release-times', nargs='+', metavar='HH:MM', dest='releaseTimes', required=False, action='store', default=RELEASE_TIMES, help='Local times of day when new listings are released')
+  argumentParser.add_argument('--lead-time', nargs=1, dest='leadTime', type=float, required=False, action='store', default=[RELEASE_LEAD_SECONDS], help='Seconds before each release to assess the account and warm the connection')
+  argumentParser.add_argument('--poll-interval', nargs=1, dest='pollInterval', type=float, required=False, action='store', default=[POLL_INTERVAL_SECONDS], help='Seconds between listing polls after a release')
+  argumentParser.add_argument('--poll-duration', nargs=1, dest='pollDuration', type=float, required=False, action='store', default=[POLL_DURATION_SECONDS], help='Seconds to keep polling for a new listing after a release')
+
+  argumentParser.add_argument('--store', nargs=1, dest='store', required=False, action='store', help='Local SQLite file for keeping owned notes and their per-grade totals between runs')
+  argumentParser.add_argument('--store-max-age', nargs=1, dest='storeMaxAge', type=float, required=False, action='store', default=[lcstore.MAXIMUM_AGE_SECONDS], help='Seconds a local note store sync stays current before syncing again (orders placed by lc-auto-invest expire it at once)')
+
+  lcrequest.AddRequestArguments(argumentParser)
+  argumentParser.add_argument('--snapshot-log', nargs=1, dest='snapshotLog', required=False, action='store', help='Keep every listing fetched in this compressed, append-only snapshot log (see lcrecord)')
+  argumentParser.add_argument('--snapshot-account', dest='snapshotAccount', required=False, action='store_true', default=False, help='Also keep account summaries and owned notes in the snapshot log')
+
   argumentParser.add_argument('-n', '--simulation', dest='simulation', required=False, action='store_true', default=False, help='Take no action -- only report decisions')
   argumentParser.add_argument('-q', '--quiet', dest='quiet', required=False, action='store_true', default=False, help='Suppress non-critical messages')
   argumentParser.add_argument('-d', '--debug', dest='debug', required=False, action='store_true', default=False, help='Turn on verbose diagnostics')
 
   argumentParser.add_argument('-v', '--version', action='version', version='%(prog)s '+VERSION)
 
-  return argumentParser.parse_args()
+  return argumentParser.parse_args(arguments)
 
 
 # Validate and normalize some of the obtained arguments and pass the rest along
@@ -125,76 +176,139 @@ def NormalizeArguments(options):
   options.minDerogatoryMonths= int(options.minDerogatoryMonths.pop())
   options.minRecordMonths= int(options.minRecordMonths.pop())
 
+  if options.strategy != None:
+    # declarations in a strategy file override their command line counterparts
+    options.strategy= lcstrategy.LoadStrategy(str(options.strategy.pop()))
+    if options.strategy.minimum != None:
+      options.min= int(options.strategy.minimum)
+    if options.strategy.maximum != None:
+      options.max= int(options.strategy.maximum)
+    if options.strategy.grades != None:
+      options.grades= [[grade, str(options.strategy.grades[grade])] for grade in options.strategy.grades]
+    if len(options.strategy.rules) == 0:
+      options.strategy.rules= PreferenceRules(options)
+  else:
+    options.strategy= lcstrategy.Strategy(PreferenceRules(options))
+
   # convert lists of single strings into strings
+  options.engine= str(options.engine.pop())
+  options.allocation= str(options.allocation.pop())
   options.id= str(options.id.pop())
   options.token= str(options.token.pop())
-  if options.portfolio <> None:
+  if options.portfolio != None:
     options.portfolio= str(options.portfolio.pop())
 
   for grade in GRADES:
     # initialize our aggregator array
     allocations[grade]= 0
 
-  if options.grades <> None:
+  if options.grades != None:
     for specification in options.grades:
       # figure out our target allocations by note grade
       grade= specification[0][0].upper()
       if grade in GRADES:
-        if specification[1].isdigit():
-          allocations[grade]+= float(specification[1]) / 100
-          allocated+= int(specification[1])
-        elif options.debug:
-          print('\n*** Ignoring percent specification <{}> for grade {} as it is not an integer value\n'.format(specification[1], grade))
+        try:
+          percent= float(specification[1])
+        except ValueError:
+          raise Exception('Percent specification "{}" for grade {} is not a number'.format(specification[1], grade))
+        if not 0 <= percent <= 100:
+          raise Exception('Percent specification for grade {} must be between 0 and 100'.format(grade), percent)
+        allocations[grade]+= percent / 100
+        allocated+= percent
       elif options.debug:
         print('\n*** Ignoring grade specification "{}" as it is not an expected major grade label [A-G]\n'.format(specification[0]))
 
-  if allocated > 100:
-    # over-allocated!
+  if options.engine == 'numpy' and not lcscreen.Available():
+    raise Exception('The numpy screening engine was requested but NumPy is not installed')
+
+  if round(allocated, 6) > 100:
+    # over-allocated! (rounded, since fractional percentages may not add up exactly)
     if options.debug:
-      raise Exception("Specified allocations exceed 100% ({:.0f}% allocated)!".format(allocated), allocations)
+      raise Exception("Specified allocations exceed 100% ({:g}% allocated)!".format(allocated), allocations)
     else:
       raise Exception("Specified allocations exceed 100%!")
 
+  # convert release window settings
+  options.leadTime= float(options.leadTime.pop())
+  options.pollInterval= float(options.pollInterval.pop())
+  options.pollDuration= float(options.pollDuration.pop())
+  releaseTimes= []
+  for specification in options.releaseTimes:
+    try:
+      releaseTimes.append(datetime.datetime.strptime(specification, '%H:%M').time())
+    except ValueError:
+      raise Exception('Release time "{}" is not in HH:MM format'.format(specification))
+  options.releaseTimes= sorted(releaseTimes)
+  options.verdicts= None
+
+  # convert note store settings
+  if options.store != None:
+    options.store= str(options.store.pop())
+  options.storeMaxAge= float(options.storeMaxAge.pop())
+
+  # convert order submission settings
+  options.orderChunkSize= int(options.orderChunkSize.pop())
+  options.refillRounds= int(options.refillRounds.pop())
+
+  # convert the API request settings shared by all our scripts
+  lcrequest.NormalizeRequestArguments(options, SCRIPT)
+
+  # set up our snapshot log
+  options.recorder= None
+  if options.snapshotLog != None:
+    kinds= [lcrecord.KIND_LISTING]
+    if options.snapshotAccount:
+      kinds+= [lcrecord.KIND_SUMMARY, lcrecord.KIND_NOTES]
+    options.recorder= lcrecord.SnapshotRecorder(str(options.snapshotLog.pop()), kinds)
+
   options.allocations= allocations
   return options
 
 
+# Translate preferred criteria from the command line into strategy rules
+#
+def PreferenceRules(options):
+  return [
+    lcstrategy.Rule(KEY_PURPOSE, lcstrategy.OPERATOR_IN, ACCEPTABLE_PURPOSES),
+    lcstrategy.Rule(KEY_HOME, lcstrategy.OPERATOR_IN, ACCEPTABLE_HOME),
+    lcstrategy.Rule(KEY_EMPLOYMENT, lcstrategy.OPERATOR_MIN, options.minEmploymentMonths),
+    lcstrategy.Rule(KEY_DTI, lcstrategy.OPERATOR_MAX, options.maxDTI),
+    lcstrategy.Rule(KEY_DTI_JOINT, lcstrategy.OPERATOR_MAX, options.maxDTI),
+    lcstrategy.Rule(KEY_CREDIT_UTILIZATION, lcstrategy.OPERATOR_MAX, options.maxUtilization),
+    lcstrategy.Rule(KEY_COLLECTIONS, lcstrategy.OPERATOR_EQUALS, 0),
+    lcstrategy.Rule(KEY_TAX_LIEN, lcstrategy.OPERATOR_EQUALS, 0),
+    # missing months since an event mean that it never happened
+    lcstrategy.Rule(KEY_SINCE_LAST_DELINQUENCY, lcstrategy.OPERATOR_MIN, options.minDelinquencyMonths, 'pass'),
+    lcstrategy.Rule(KEY_SINCE_LAST_RECORD, lcstrategy.OPERATOR_MIN, options.minRecordMonths, 'pass'),
+    lcstrategy.Rule(KEY_SINCE_LAST_DEROGATORY, lcstrategy.OPERATOR_MIN, options.minDerogatoryMonths, 'pass'),
+  ]
+
+
 # Assess current account state and identify what to buy
 #
-def AssessAccount(options, request):
+def AssessAccount(options, request, prefetched=None):
 
   # check our account
-  summary= request.get_account_summary()
+  summary= Prefetched(prefetched, KEY_SUMMARY, options.metrics.timed(lcmetrics.SPAN_SUMMARY, request.get_account_summary))
   cash= summary[KEY_AVAILABLE_CASH]
   total= summary[KEY_ACCOUNT_TOTAL]
-  investedLoans= []
+  investedLoans= set()
   shoppingList= {}
 
   if cash >= options.min:
     # we seem to have enough for at least one note
     # let's figure out allocations
-    ownedNotes= request.get_owned_notes()
-    principal= {}
-    count= {}
+    count, principal, notesCount, investedLoans= Prefetched(prefetched, KEY_TALLY, lambda: TallyNotes(options, request))
+
+    for grade in GRADES:
+      # initialize our shopping list
+      shoppingList[grade]= 0
 
     if not options.quiet:
       print('')
       print(' Cash balance: ${:12,.2f}'.format(cash))
       print('Account total: ${:12,.2f}\n'.format(total))
-      print('My notes: {:,}'.format(len(ownedNotes)))
-
-    for grade in GRADES:
-      # initialize our aggregator arrays
-      principal[grade]= 0
-      count[grade]= 0
-      shoppingList[grade]= 0
-
-    for note in ownedNotes:
-      # calculate principal and count of notes for each major grade
-      grade= note[KEY_GRADE][0]
-      investedLoans.append(note[KEY_LOAN_ID])
-      count[grade]+= 1
-      principal[grade]+= note[KEY_PRINCIPAL]
+      print('My notes: {:,}'.format(notesCount))
 
     for grade in GRADES:
       # figure out which grades remain below target allocation and allocate buys
@@ -223,19 +337,16 @@ def AssessAccount(options, request):
 
         print('\t{:5d} grade {} notes with principal value ${:12,.2f} ({:6,.2%} / {:4,.0%}) [{:>4} unit{} to buy]'.format(count[grade], grade, principal[grade], invested, options.allocations[grade], countLabel, plurality))
 
-    if options.portfolio <> None:
+    if options.portfolio != None:
       # check if our target portfolio exists and create it if not
       # lastly, replace the portfolio name with its ID, for future reference
-      portfolios= request.get_owned_portfolios()
-      matchedPortfolio= [portfolio[KEY_PORTFOLIO_ID] for portfolio in portfolios if
-      (
-        portfolio[KEY_PORTFOLIO_NAME] == options.portfolio
-      )
-      ]
-      if len(matchedPortfolio) > 0:
+      # (IDs of portfolios seen before come from our cache, without a round trip)
+      findPortfolio= options.metrics.timed(lcmetrics.SPAN_PORTFOLIOS, request.find_portfolio)
+      matchedPortfolio= Prefetched(prefetched, KEY_PORTFOLIOS, lambda: findPortfolio(options.portfolio))
+      if matchedPortfolio != None:
         if options.debug:
-          print('\nFound existing target portfolio "{}" with ID "{}"'.format(options.portfolio, matchedPortfolio[0]))
-        options.portfolio= matchedPortfolio[0]
+          print('\nFound existing target portfolio "{}" with ID "{}"'.format(options.portfolio, matchedPortfolio))
+        options.portfolio= matchedPortfolio
       else:
         if options.simulation:
           print('\nSpecified target portfolio "{}" does not exist:'.format(options.portfolio))
@@ -246,7 +357,7 @@ def AssessAccount(options, request):
           if not options.quiet:
             print('\nSpecified target portfolio "{}" does not exist:'.format(options.portfolio))
             print('\tcreated target portfolio named "{}"\n\twith ID "{}"\n\tand description "{}"'.format(response[KEY_PORTFOLIO_NAME], response[KEY_PORTFOLIO_ID], response[KEY_PORTFOLIO_DESCRIPTION]))
-            options.portfolio= response[KEY_PORTFOLIO_ID]
+          options.portfolio= response[KEY_PORTFOLIO_ID]
 
   else:
     # we don't have enough cash to proceed
@@ -257,43 +368,119 @@ def AssessAccount(options, request):
 
 
 
+# Count notes and sum principal for each major grade and collect owned loan IDs
+#
+def TallyNotes(options, request):
+  with options.metrics.span(lcmetrics.SPAN_NOTES):
+    principal= {}
+    count= {}
+    notesCount= 0
+    investedLoans= set()
+
+    for grade in GRADES:
+      # initialize our aggregator arrays
+      principal[grade]= 0
+      count[grade]= 0
+
+    if options.store != None:
+      # read principal and count of notes for each major grade from our local note store
+      # along with the set of owned loans
+      with lcstore.NoteStore(options.store, options.id) as store:
+        store.refresh(request, options.storeMaxAge)
+        totals= store.major_grade_totals()
+        for grade in totals:
+          count[grade]= totals[grade][lcstore.KEY_COUNT]
+          principal[grade]= totals[grade][KEY_PRINCIPAL]
+          notesCount+= count[grade]
+        investedLoans= store.owned_loans()
+
+    else:
+      for note in request.iter_owned_notes([KEY_GRADE, KEY_LOAN_ID, KEY_PRINCIPAL]):
+        # calculate principal and count of notes for each major grade as notes arrive
+        grade= note[KEY_GRADE][0]
+        investedLoans.add(note[KEY_LOAN_ID])
+        count[grade]+= 1
+        principal[grade]+= note[KEY_PRINCIPAL]
+        notesCount+= 1
+
+  return count, principal, notesCount, investedLoans
+
+
+# Issue the independent requests behind an assessment and an order concurrently
+#
+def Prefetch(options, request, executor):
+  prefetched= {}
+  prefetched[KEY_SUMMARY]= executor.submit(options.metrics.timed(lcmetrics.SPAN_SUMMARY, request.get_account_summary))
+  prefetched[KEY_TALLY]= executor.submit(TallyNotes, options, request)
+  prefetched[KEY_LISTING]= executor.submit(options.metrics.timed(lcmetrics.SPAN_LISTING, request.get_available_notes))
+  if options.portfolio != None:
+    prefetched[KEY_PORTFOLIOS]= executor.submit(options.metrics.timed(lcmetrics.SPAN_PORTFOLIOS, request.find_portfolio), options.portfolio)
+
+  return prefetched
+
+
+# Wait for a prefetched result or, if there is none, obtain it now
+#
+def Prefetched(prefetched, key, obtain):
+  if prefetched != None and key in prefetched:
+    return prefetched[key].result()
+  return obtain()
+
+
 # Find and buy notes to meet desired allocation targets
 #
-def BuyNotes(options, request, account):
+def BuyNotes(options, request, account, prefetched=None):
   # compose our order and submit it
-  result= SubmitOrder(options, request, ComposeOrder(options, request, account))
+  notesAvailable= Prefetched(prefetched, KEY_LISTING, lambda: None)
+  result= SubmitOrder(options, request, ComposeOrder(options, request, account, notesAvailable), account)
 
   return result
 
 
 
 # Compose a buy order for desired notes
+# (from a freshly fetched listing, unless one is supplied)
+# and keep the ranked candidates in the account for refilling the order
 #
-def ComposeOrder(options, request, account):
+def ComposeOrder(options, request, account, notesAvailable=None):
   # prioritize orders by rate or by deficit (i.e., most wanted)
-  notesAvailable= request.get_available_notes()
+  if notesAvailable == None:
+    with options.metrics.span(lcmetrics.SPAN_LISTING):
+      notesAvailable= request.get_available_notes()
   shoppingList= account[KEY_SHOPPING_LIST]
   if options.chaseYield:
     # sort the shopping list by highest grade, in descending order
-    # also, sort filtered available loans by highest rate, in descending order
     shoppingOrder= sorted(shoppingList, reverse=True)
-    notesDesired= sorted(FilterNotesByPreference(options, account[KEY_INVESTED_LOANS], notesAvailable, shoppingOrder), key=itemgetter(KEY_RATE), reverse=True)
   else:
     # sort the shopping list by highest relative deficit (i.e., most notes to buy), in descending order
-    # also, just filter available loans preserving their original order
     shoppingOrder= sorted(shoppingList, key=shoppingList.get, reverse=True)
-    notesDesired= FilterNotesByPreference(options, account[KEY_INVESTED_LOANS], notesAvailable, shoppingOrder)
+
+  # filter available loans and bucket them by grade, preserving their original order
+  with options.metrics.span(lcmetrics.SPAN_SCREEN):
+    notesDesired= BucketNotesByPreference(options, account[KEY_INVESTED_LOANS], notesAvailable, shoppingOrder)
+  options.metrics.count(lcmetrics.COUNTER_SCREENED, len(notesAvailable))
+  options.metrics.count(lcmetrics.COUNTER_ACCEPTED, sum(len(notesDesired[grade]) for grade in notesDesired))
+  if options.chaseYield:
+    # sort each bucket by highest rate, in descending order
+    for grade in notesDesired:
+      notesDesired[grade].sort(key=itemgetter(KEY_RATE), reverse=True)
+  account[KEY_CANDIDATES]= notesDesired
 
   # collect our orders
   cash= account[KEY_CASH]
   orders= {}
+  plannedUnits= None
+  if options.allocation == 'yield':
+    # plan units across all grades at once for the highest total yield
+    with options.metrics.span(lcmetrics.SPAN_ALLOCATE):
+      plannedUnits= lcallocate.YieldUnits(notesDesired, shoppingList, int(cash // options.min), options.min, options.max)
   for grade in shoppingOrder:
     # attempt to find and purchase notes for each grade in our shopping list
     if not options.quiet:
       print('')
       print('Allocating available cash to grade {} notes:'.format(grade))
 
-    notes= FilterNotesByGrade(notesDesired, grade)
+    notes= notesDesired[grade]
     if not options.quiet:
       if len(notes) > 0:
         units= int(min(cash/options.min, shoppingList[grade]))
@@ -305,40 +492,21 @@ def ComposeOrder(options, request, account):
       else:
         print('\tfound no suitable grade {} notes out of {:,} unfunded notes currently available'.format(grade, len(notesAvailable)))
 
-    # collect candidate notes and desired amounts
+    # allocate units of the minimum investment to notes
+    if plannedUnits != None:
+      allocations= plannedUnits[grade]
+    else:
+      with options.metrics.span(lcmetrics.SPAN_ALLOCATE):
+        allocations= lcallocate.SpreadUnits(notes, min(shoppingList[grade], int(cash // options.min)), options.min, options.max)
+
     count= 0
     spent= 0
-    unfunded= {}
-
-    for note in notes:
-      # first pass allocation
-      if (note[KEY_LOAN_AMOUNT] - note[KEY_FUNDED_AMOUNT]) >= options.min and (spent + options.min) <= cash:
-        orders[note[KEY_ID]]= options.min
-        unfunded[note[KEY_ID]]= note[KEY_LOAN_AMOUNT] - note[KEY_FUNDED_AMOUNT] - options.min
-        count+= 1
-        spent+= options.min
-        if not options.quiet:
-          print('\tallocated ${:3.2f} to note {} (${:,.2f} remaining)'.format(options.min, note[KEY_ID], cash-spent))
-        if (spent + options.min) > cash or count == shoppingList[grade]:
-          # ran out of money!
-          break
-
-    while (spent + options.min) <= cash and count < shoppingList[grade] and len(unfunded) > 0:
-      # raise allocations for currently funded notes
-      unfundedIDs= unfunded.keys()
-      for id in unfundedIDs:
-        if unfunded[id] >= options.min and (orders[id] + options.min) <= options.max:
-          orders[id]+= options.min
-          unfunded[id]-= options.min
-          count+= 1
-          spent+= options.min
-          if not options.quiet:
-            print('\tallocated ${:.2f} more to note {} (${:,.2f} remaining)'.format(options.min, id, cash-spent))
-          if (spent + options.min) > cash or count == shoppingList[grade]:
-            # ran out of money!
-            break
-        else:
-          del unfunded[id]
+    for note, units in allocations:
+      orders[note[KEY_ID]]= units * options.min
+      count+= units
+      spent+= units * options.min
+      if not options.quiet:
+        print('\tallocated ${:,.2f} to note {} (${:,.2f} remaining)'.format(units * options.min, note[KEY_ID], cash-spent))
 
     if options.debug:
       if count < shoppingList[grade]:
@@ -357,10 +525,7 @@ def ComposeOrder(options, request, account):
   buyList= []
   if len(orders) > 0:
     for id in orders:
-      if options.portfolio <> None:
-        buyList.append({KEY_LOAN_ID:id, KEY_REQUESTED_AMOUNT:orders[id], KEY_PORTFOLIO_ID:options.portfolio})
-      else:
-        buyList.append({KEY_LOAN_ID:id, KEY_REQUESTED_AMOUNT:orders[id]})
+      buyList.append(OrderItem(options, id, orders[id]))
       if options.debug:
         print('\twill attempt to order ${:,.2f} worth of note {}'.format(orders[id], id))
   else:
@@ -370,6 +535,14 @@ def ComposeOrder(options, request, account):
   return buyList
 
 
+# Itemize one note of a buy order
+#
+def OrderItem(options, id, amount):
+  if options.portfolio != None:
+    return {KEY_LOAN_ID:id, KEY_REQUESTED_AMOUNT:amount, KEY_PORTFOLIO_ID:options.portfolio}
+  return {KEY_LOAN_ID:id, KEY_REQUESTED_AMOUNT:amount}
+
+
 # Filter offered notes by grade
 #
 def FilterNotesByGrade(notes, grade):
@@ -381,32 +554,61 @@ def FilterNotesByGrade(notes, grade):
   return notesDesired
 
 
+# Filter offered notes by preference and sort them into per-grade buckets
+# (ownedLoans should be a set for constant-time lookups)
+#
+def BucketNotesByPreference(options, ownedLoans, notes, desiredGrades):
+  notesDesired= {}
+  for grade in desiredGrades:
+    notesDesired[grade]= []
+
+  for note in FilterNotesByPreference(options, ownedLoans, notes, notesDesired):
+    notesDesired[note[KEY_GRADE]].append(note)
+
+  return notesDesired
+
+
 # Filter offered notes by various preferred criteria
+# (missing values fail minimums and pass maximums unless a rule says otherwise)
 #
 def FilterNotesByPreference(options, ownedLoans, notes, desiredGrades):
+  if options.verdicts != None and not isinstance(notes, lcscreen.NoteColumns):
+    # only screen loans that are new or changed since the last poll
+    return options.verdicts.screen(notes, ownedLoans, desiredGrades, lambda changed: ScreenNotesByPreference(options, ownedLoans, changed, desiredGrades))
+
+  return ScreenNotesByPreference(options, ownedLoans, notes, desiredGrades)
+
+
+# Screen offered notes by strategy rules
+#
+def ScreenNotesByPreference(options, ownedLoans, notes, desiredGrades):
+  strategy= options.strategy
+
+  if options.engine == 'numpy':
+    # evaluate all criteria as boolean masks over column arrays
+    # (notes may already be decoded into columns, e.g., for repeated screening)
+    if not isinstance(notes, lcscreen.NoteColumns):
+      notes= lcscreen.NoteColumns(notes)
+    return lcscreen.ScreenNotes(ownedLoans, notes, desiredGrades, strategy.rules)
+
+  if not strategy.calibrated:
+    # reorder our rules so the most selective ones reject loans first
+    strategy.calibrate(notes)
+
+  predicate= strategy.predicate
   notesDesired= [note for note in notes if
   (
     note[KEY_ID] not in ownedLoans
     and note[KEY_GRADE] in desiredGrades
-    and note[KEY_PURPOSE] in ACCEPTABLE_PURPOSES
-    and note[KEY_HOME] in ACCEPTABLE_HOME
-    and note[KEY_EMPLOYMENT] >= options.minEmploymentMonths
-    and note[KEY_DTI] <= options.maxDTI
-    and note[KEY_DTI_JOINT] <= options.maxDTI
-    and note[KEY_CREDIT_UTILIZATION] <= options.maxUtilization
-    and note[KEY_COLLECTIONS] == 0
-    and note[KEY_TAX_LIEN] == 0
-    and (note[KEY_SINCE_LAST_DELINQUENCY] == None or note[KEY_SINCE_LAST_DELINQUENCY] >= options.minDelinquencyMonths)
-    and (note[KEY_SINCE_LAST_RECORD] == None or note[KEY_SINCE_LAST_RECORD] >= options.minRecordMonths)
-    and (note[KEY_SINCE_LAST_DEROGATORY] == None or note[KEY_SINCE_LAST_DEROGATORY] >= options.minDerogatoryMonths)
+    and predicate(note)
   )
   ]
   return notesDesired
 
 
-# Submit our order
+# Submit our order, reinvesting any unfilled amounts when the composing account is supplied
 #
-def SubmitOrder(options, request, buyList):
+def SubmitOrder(options, request, buyList, account=None):
   response= {}
 
   if options.debug:
@@ -417,36 +619,268 @@ def SubmitOrder(options, request, buyList):
       print('\nSubmitting order:')
       print('\twould have tried to submit the order if this was not a simulated run')
     else:
-      response= request.submit_order(buyList)
+      if options.store != None and len(buyList) > 0:
+        # the store will miss the notes ordered (even if the order fails midway), so sync it again next time
+        with lcstore.NoteStore(options.store, options.id) as store:
+          store.expire()
+
+      response= SubmitChunks(options, request, buyList)
       if len(buyList) > 0:
         if options.debug:
           print('\tsubmitted order')
+        if account != None:
+          response= RefillOrder(options, request, account, buyList, response)
       else:
         print('\tsubmitted empty order')
 
+      invested= sum(confirmation[KEY_INVESTED_AMOUNT] for confirmation in response.get(KEY_CONFIRMATIONS, []))
+      options.metrics.count(lcmetrics.COUNTER_UNITS, int(invested // options.min))
+      options.metrics.count(lcmetrics.COUNTER_CASH, invested)
+
+      failures= response.get(KEY_FAILED_CHUNKS, [])
+      if len(failures) > 0:
+        # report what did execute before failing, so nobody reruns the order and buys it twice
+        Report(options, response)
+        raise Exception('{} of the order chunks failed (the notes reported above were bought)'.format(len(failures)), *failures)
+
   return response
 
 
+# Submit an order, split into chunks submitted concurrently if it is large
+#
+def SubmitChunks(options, request, buyList):
+  throttle= options.metrics.timed(lcmetrics.SPAN_THROTTLE, request.throttle_order)
+  submit= options.metrics.timed(lcmetrics.SPAN_SUBMIT, request.submit_order)
+
+  # wait for the order rate limit outside the submit span, which then times only the order itself
+  def SubmitChunk(chunk):
+    throttle()
+    return submit(chunk, throttled=True)
+
+  count= 1
+  if options.orderChunkSize > 0:
+    count= -(-len(buyList) // options.orderChunkSize)
+    capacity= request.order_capacity()
+    if capacity != None:
+      # split no further than the rate limit lets orders through at once (more chunks would only queue behind it)
+      count= max(1, min(count, capacity))
+  if count == 1:
+    return SubmitChunk(buyList)
+
+  size= -(-len(buyList) // count)
+  chunks= [buyList[index:index + size] for index in range(0, len(buyList), size)]
+  if options.debug:
+    print('\tsplitting the order into {} orders of up to {} notes'.format(len(chunks), size))
+
+  with concurrent.futures.ThreadPoolExecutor(max_workers=min(ORDER_WORKERS, len(chunks))) as executor:
+    # keep the responses in chunk order
+    futures= [executor.submit(SubmitChunk, chunk) for chunk in chunks]
+
+  # keep the confirmations of every chunk that executed, even if others failed (that money is spent)
+  responses= []
+  failures= []
+  for chunk, future in zip(chunks, futures):
+    try:
+      responses.append(future.result())
+    except Exception as error:
+      failures.append('order of {} note{} (loan IDs {}) failed: {}'.format(len(chunk), PluralS(len(chunk)), ', '.join(str(item[KEY_LOAN_ID]) for item in chunk), error.args[0] if len(error.args) > 0 else type(error).__name__))
+  if len(responses) == 0:
+    raise futures[0].exception()
+
+  response= MergeResponses(responses)
+  if len(failures) > 0:
+    response[KEY_FAILED_CHUNKS]= failures
+  return response
+
+
+# Combine the responses of several orders into one
+#
+def MergeResponses(responses):
+  orderIds= []
+  confirmations= []
+  failures= []
+  for response in responses:
+    orderIds.extend(orderId for orderId in response.get(KEY_ORDER_IDS, [response.get(KEY_ORDER_ID)]) if orderId != None)
+    confirmations.extend(response.get(KEY_CONFIRMATIONS, []))
+    failures.extend(response.get(KEY_FAILED_CHUNKS, []))
+
+  merged= {KEY_ORDER_ID: None, KEY_CONFIRMATIONS: confirmations}
+  if len(orderIds) > 0:
+    merged= {KEY_ORDER_ID: orderIds[0], KEY_ORDER_IDS: orderIds, KEY_CONFIRMATIONS: confirmations}
+  if len(failures) > 0:
+    merged[KEY_FAILED_CHUNKS]= failures
+  return merged
+
+
+# Reinvest amounts left unfilled by an order in the next-ranked candidates of the same grade
+#
+def RefillOrder(options, request, account, buyList, response):
+  candidates= account.get(KEY_CANDIDATES)
+  if candidates == None:
+    return response
+
+  grades= {}
+  for grade in candidates:
+    for note in candidates[grade]:
+      grades[note[KEY_ID]]= grade
+
+  ordered= set(item[KEY_LOAN_ID] for item in buyList)
+  responses= [response]
+  for refill in range(options.refillRounds):
+    # tally amounts left unfilled by the latest order for each grade
+    unfilled= {}
+    for confirmation in responses[-1].get(KEY_CONFIRMATIONS, []):
+      shortfall= confirmation[KEY_REQUESTED_AMOUNT] - confirmation[KEY_INVESTED_AMOUNT]
+      grade= grades.get(confirmation[KEY_LOAN_ID])
+      if shortfall > 0 and grade != None:
+        unfilled[grade]= unfilled.get(grade, 0) + shortfall
+
+    refillList= []
+    for grade in unfilled:
+      # skip every loan already ordered, since a partial fill means it has no room left
+      notes= [note for note in candidates[grade] if note[KEY_ID] not in ordered]
+      units= int(unfilled[grade] // options.min)
+      with options.metrics.span(lcmetrics.SPAN_ALLOCATE):
+        if options.allocation == 'yield':
+          allocations= lcallocate.YieldUnits({grade: notes}, {grade: units}, units, options.min, options.max)[grade]
+        else:
+          allocations= lcallocate.SpreadUnits(notes, units, options.min, options.max)
+
+      for note, units in allocations:
+        refillList.append(OrderItem(options, note[KEY_ID], units * options.min))
+        ordered.add(note[KEY_ID])
+
+    if len(refillList) == 0:
+      break
+
+    if not options.quiet:
+      print('\nRefilling ${:,.2f} left unfilled with {:,} more note{}'.format(sum(unfilled.values()), len(refillList), PluralS(len(refillList))))
+    responses.append(SubmitChunks(options, request, refillList))
+
+  if len(responses) == 1:
+    return response
+  return MergeResponses(responses)
+
+
 # Compose an activity report
 #
 def Report(options, response):
-  if not options.quiet:
-    print('')
-    print('Order execution report:')
-    if len(response) > 0:
-      if response[KEY_ORDER_ID] <> None:
-        print('\tOrder ID {}'.format(response[KEY_ORDER_ID]))
-        for orderConfirmation in response[KEY_CONFIRMATIONS]:
-          # report results of each note order
-          print('\tLoan ID {} invested ${:6,.2f} of ${:6,.2f} requested (codes: {})'.format(orderConfirmation[KEY_LOAN_ID], orderConfirmation[KEY_INVESTED_AMOUNT], orderConfirmation[KEY_REQUESTED_AMOUNT], ' '.join(orderConfirmation[KEY_EXECUTIONS_STATUS])))
+  with options.metrics.span(lcmetrics.SPAN_REPORT):
+    if not options.quiet:
+      print('')
+      print('Order execution report:')
+      if len(response) > 0:
+        if response[KEY_ORDER_ID] != None:
+          orderIds= response.get(KEY_ORDER_IDS, [response[KEY_ORDER_ID]])
+          print('\tOrder ID{} {}'.format(PluralS(len(orderIds)), ', '.join(str(orderId) for orderId in orderIds)))
+          for orderConfirmation in response[KEY_CONFIRMATIONS]:
+            # report results of each note order
+            print('\tLoan ID {} invested ${:6,.2f} of ${:6,.2f} requested (codes: {})'.format(orderConfirmation[KEY_LOAN_ID], orderConfirmation[KEY_INVESTED_AMOUNT], orderConfirmation[KEY_REQUESTED_AMOUNT], ' '.join(orderConfirmation[KEY_EXECUTIONS_STATUS])))
+        else:
+          print('\tnothing happened (order ID "{}")'.format(response[KEY_ORDER_ID]))
       else:
-        print('\tnothing happened (order ID "{}")'.format(response[KEY_ORDER_ID]))
-    else:
-      print('\tno order submitted')
+        print('\tno order submitted')
 
   return True
 
 
+# Find the next listing release after a given moment
+#
+def NextRelease(options, now):
+  day= datetime.date.fromtimestamp(now)
+  for offset in range(2):
+    for releaseTime in options.releaseTimes:
+      release= time.mktime(datetime.datetime.combine(day + datetime.timedelta(days=offset), releaseTime).timetuple())
+      if release > now:
+        return release
+
+
+# Sleep until a given moment
+#
+def SleepUntil(moment):
+  delay= moment - time.time()
+  if delay > 0:
+    time.sleep(delay)
+
+
+# Poll the listing until loans we have not seen before appear
+#
+def PollListing(options, request, knownLoans, release):
+  polls= 0
+  deadline= release + options.pollDuration
+  while True:
+    with options.metrics.span(lcmetrics.SPAN_LISTING):
+      notesAvailable= request.get_available_notes()
+    polls+= 1
+    if any(note[KEY_ID] not in knownLoans for note in notesAvailable):
+      return notesAvailable, polls
+    if time.time() >= deadline:
+      return None, polls
+    SleepUntil(min(time.time() + options.pollInterval, deadline))
+
+
+# Buy notes as soon as each listing release appears
+#
+def RunDaemon(options, request):
+  portfolio= options.portfolio
+  options.verdicts= lcscreen.VerdictCache([KEY_GRADE] + [rule.field for rule in options.strategy.rules])
+
+  while True:
+    release= NextRelease(options, time.time() + options.leadTime)
+    if not options.quiet:
+      print('\nWaiting for the listing release at {}'.format(time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(release))))
+    SleepUntil(release - options.leadTime)
+
+    try:
+      # precompute our shopping list, resolve the target portfolio, and warm the connection
+      options.portfolio= portfolio
+      account= AssessAccount(options, request)
+      if len(account[KEY_SHOPPING_LIST]) == 0 and not options.debug:
+        if not options.quiet:
+          print('\nNothing to buy for this release')
+        continue
+      request.warm()
+      notesAvailable= request.get_available_notes()
+      knownLoans= set(note[KEY_ID] for note in notesAvailable)
+
+      # screen the current listing ahead of time so only new loans need screening after the release
+      options.verdicts.clear()
+      FilterNotesByPreference(options, account[KEY_INVESTED_LOANS], notesAvailable, account[KEY_SHOPPING_LIST])
+
+      # poll for the new listing and buy right away
+      SleepUntil(release)
+      notesAvailable, polls= PollListing(options, request, knownLoans, release)
+      listed= time.time()
+      if notesAvailable == None:
+        print('\nNo new listing appeared within {:.0f} seconds of the release ({} poll{})'.format(options.pollDuration, polls, PluralS(polls)))
+        continue
+
+      response= SubmitOrder(options, request, ComposeOrder(options, request, account, notesAvailable), account)
+      ordered= time.time()
+      Report(options, response)
+      print('\nRelease at {}: listing after {:.3f}s ({} poll{}), order after {:.3f}s'.format(time.strftime('%H:%M:%S', time.localtime(release)), listed - release, polls, PluralS(polls), ordered - release))
+      options.metrics.record(lcmetrics.SPAN_RELEASE_LISTING, listed - release, release)
+      options.metrics.record(lcmetrics.SPAN_RELEASE_ORDER, ordered - release, release)
+
+    except Exception as error:
+      # keep going -- the next release may fare better
+      ReportError(error)
+
+    finally:
+      # export metrics for each release window separately
+      options.metrics.export()
+      options.metrics.clear()
+
+
+# Print an exception and its details
+#
+def ReportError(error):
+  print(type(error))
+  print(error.args[0])
+  for counter in range(1, len(error.args)):
+    print('\t' + str(error.args[counter]))
+
+
 # Should there be an 's' at the end?
 #
 def PluralS(number):
@@ -456,33 +890,71 @@ def PluralS(number):
     return 's'
 
 
+# Release what a run set up (profiler, snapshot log, metrics)
+#
+def Shutdown(options):
+  try:
+    try:
+      if options.profiler != None:
+        options.profiler.stop()
+    finally:
+      # queued snapshots are lost unless written here (our writer is a daemon thread)
+      if options.recorder != None:
+        options.recorder.close()
+  finally:
+    # the last export of a daemon run happens here, on interruption
+    options.metrics.export()
+
+
 # Main entry point
 #
 def main():
+  options= None
+  lcscript.HandleTermination()
   try:
     # instantiate our Lending Club API and initialize from command line arguments
+    started= time.perf_counter()
     options= NormalizeArguments(GetArguments())
-    request= LCRequest(options)
+    options.metrics.record(lcmetrics.SPAN_ARGUMENTS, time.perf_counter() - started)
+    if options.profiler != None:
+      options.profiler.start()
 
-    # figure out what we want
-    account= AssessAccount(options, request)
+    with LCRequest(options) as request:
+      if options.daemon:
+        # buy notes at every listing release until interrupted
+        RunDaemon(options, request)
+
+      else:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=PREFETCH_WORKERS) as executor:
+          prefetched= None
+          if options.prefetch:
+            # issue all independent requests at once
+            prefetched= Prefetch(options, request, executor)
 
-    if len(account[KEY_SHOPPING_LIST]) > 0 or options.debug:
-      # attempt to buy notes or just go through the motions for the sake of debugging
-      # deliver a report on the outcome
-      Report(options, BuyNotes(options, request, account))
+          # figure out what we want
+          account= AssessAccount(options, request, prefetched)
+
+          if len(account[KEY_SHOPPING_LIST]) > 0 or options.debug:
+            # attempt to buy notes or just go through the motions for the sake of debugging
+            # deliver a report on the outcome
+            Report(options, BuyNotes(options, request, account, prefetched))
+
+  except KeyboardInterrupt:
+    print('\nInterrupted, shutting down')
 
   except Exception as error:
-    print(type(error))
-    print(error.args[0])
-    for counter in range(1, len(error.args)):
-      print('\t' + str(error.args[counter]))
+    ReportError(error)
 
   else:
     if options.debug:
       print('')
       print('All done!')
 
+  finally:
+    # stop profiling, write out queued snapshots and export metrics even when interrupted
+    if options != None:
+      Shutdown(options)
+
 
 #
 # Execute if we were run as a program
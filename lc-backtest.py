@@ -0,0 +1,498 @@
+#!/usr/bin/env python3
+
+
+#
+# Import all necessary libraries
+#
+
+import argparse
+import datetime
+import heapq
+import random
+import sys
+import time
+import lcrecord
+import lcsynthetic
+from lcscript import LoadScript
+
+
+#
+# Define some global constants
+#
+
+VERSION= '1.0.0'
+CASH= 1000.0
+FILL_RATE= 1.0
+ORDER_LATENCY= 0.5
+REPORT_INTERVAL_HOURS= 24
+SEED= 0
+NOTE_AMOUNT= 25
+TERM_MONTHS= 36
+MONTH_SECONDS= 365.25 / 12 * 86400
+PERCENTILES= [50, 90, 99]
+GRADES= lcsynthetic.GRADES
+
+# Order execution status codes (as returned by the live API and lc-mock-server)
+STATUS_FILLED= 'ORDER_FULFILLED'
+STATUS_PARTIAL= 'LOAN_AMNT_EXCEEDED'
+STATUS_NOT_LISTED= 'NOT_AN_IN_FUNDING_LOAN'
+STATUS_NO_CASH= 'INSUFFICIENT_CASH'
+
+# Lending Club API data structure keys
+KEY_ID= 'id'
+KEY_LOAN_ID= 'loanId'
+KEY_NOTE_ID= 'noteId'
+KEY_GRADE= 'grade'
+KEY_SUB_GRADE= 'subGrade'
+KEY_RATE= 'intRate'
+KEY_TERM= 'term'
+KEY_LOAN_AMOUNT= 'loanAmount'
+KEY_FUNDED_AMOUNT= 'fundedAmount'
+KEY_AVAILABLE_CASH= 'availableCash'
+KEY_ACCOUNT_TOTAL= 'accountTotal'
+KEY_ORDERS= 'orders'
+KEY_REQUESTED_AMOUNT= 'requestedAmount'
+KEY_INVESTED_AMOUNT= 'investedAmount'
+KEY_EXECUTIONS_STATUS= 'executionStatus'
+KEY_ORDER_ID= 'orderInstructId'
+KEY_CONFIRMATIONS= 'orderConfirmations'
+KEY_PORTFOLIO_ID= 'portfolioId'
+KEY_PORTFOLIO_NAME= 'portfolioName'
+KEY_PORTFOLIO_DESCRIPTION= 'portfolioDescription'
+KEY_AMOUNT= 'amount'
+KEY_TRANSFER_DATE= 'estimatedFundsTransferDate'
+KEY_NOTE_AMOUNT= 'noteAmount'
+KEY_PRINCIPAL= 'principalPending'
+KEY_PRINCIPAL_RECEIVED= 'principalReceived'
+KEY_INTEREST_RECEIVED= 'interestReceived'
+KEY_PAYMENTS_RECEIVED= 'paymentsReceived'
+KEY_NOTE_RATE= 'interestRate'
+KEY_NOTE_STATUS= 'loanStatus'
+
+
+#
+# Define our classes
+#
+
+# Stand-in for LCRequest replaying recorded listings against a simulated account
+#
+# Orders fill against the listing being replayed, as far as each loan's remaining amount
+# (less what we already bought), our cash and the fill rate allow. Notes bought during the
+# replay repay as level monthly installments at their loan's rate and term; notes the
+# account started with keep their principal. Recorded loans are never modified (loans we
+# buy into are copied), so one decoded listing can be replayed any number of times.
+#
+class ReplayRequest:
+
+  # Constructor
+  def __init__(self, options, cash, notes):
+    self.random= random.Random(options.seed)
+    self.fillRate= options.fillRate
+    self.orderLatency= options.orderLatency
+    self.now= None
+    self.started= None
+    self.idle= 0
+    self.loans= []
+    self.cash= cash
+    self.notes= list(notes)
+    self.portfolios= []
+    self.payments= []
+    self.funded= {}
+    self.firstSeen= {}
+    self.fills= []
+    self.repaid= 0
+    self.orderId= 0
+    self.nextNoteId= max([note[KEY_NOTE_ID] for note in self.notes] + [0]) + 1
+
+
+  # Move our clock forward, collecting every installment due until then
+  # (and integrating uninvested cash over time)
+  def advance(self, moment):
+    if self.now == None:
+      self.now= self.started= moment
+
+    while len(self.payments) > 0 and self.payments[0][0] <= moment:
+      due, noteId, note, installment, rate= heapq.heappop(self.payments)
+      self.idle+= self.cash * (due - self.now)
+      self.now= due
+      interest= round(note[KEY_PRINCIPAL] * rate, 2)
+      principal= min(note[KEY_PRINCIPAL], round(installment - interest, 2))
+      note[KEY_PRINCIPAL]= round(note[KEY_PRINCIPAL] - principal, 2)
+      note[KEY_PRINCIPAL_RECEIVED]= round(note[KEY_PRINCIPAL_RECEIVED] + principal, 2)
+      note[KEY_INTEREST_RECEIVED]= round(note[KEY_INTEREST_RECEIVED] + interest, 2)
+      note[KEY_PAYMENTS_RECEIVED]= round(note[KEY_PAYMENTS_RECEIVED] + principal + interest, 2)
+      self.cash+= principal + interest
+      self.repaid+= principal + interest
+      if note[KEY_PRINCIPAL] > 0:
+        note[KEY_NOTE_STATUS]= 'Current'
+        heapq.heappush(self.payments, (due + MONTH_SECONDS, noteId, note, installment, rate))
+      else:
+        note[KEY_NOTE_STATUS]= 'Fully Paid'
+
+    if moment > self.now:
+      self.idle+= self.cash * (moment - self.now)
+      self.now= moment
+
+
+  # Average uninvested cash over the time replayed so far
+  def idle_cash(self):
+    if self.now == None or self.now <= self.started:
+      return self.cash
+    return self.idle / (self.now - self.started)
+
+
+  # Replace the listing with a recorded one, counting what we bought toward each loan's funding
+  def list(self, loans):
+    self.loans= []
+    for loan in loans:
+      self.firstSeen.setdefault(loan[KEY_ID], self.now)
+      if loan[KEY_ID] in self.funded:
+        loan= dict(loan)
+        loan[KEY_FUNDED_AMOUNT]+= self.funded[loan[KEY_ID]]
+      if loan[KEY_FUNDED_AMOUNT] < loan[KEY_LOAN_AMOUNT]:
+        self.loans.append(loan)
+
+
+  def get_account_summary(self):
+    return lcsynthetic.Summary(0, self.notes, round(self.cash, 2))
+
+
+  def get_available_notes(self):
+    return self.loans
+
+
+  def get_owned_notes(self):
+    return self.notes
+
+
+  def iter_owned_notes(self, fields=None):
+    for note in self.notes:
+      if fields == None:
+        yield note
+      else:
+        yield dict((field, note.get(field)) for field in fields)
+
+
+  def get_owned_portfolios(self):
+    return self.portfolios
+
+
+  def find_portfolio(self, name):
+    matched= [portfolio[KEY_PORTFOLIO_ID] for portfolio in self.portfolios if portfolio[KEY_PORTFOLIO_NAME] == name]
+    return matched[0] if len(matched) > 0 else None
+
+
+  def create_portfolio(self, name, description):
+    portfolio= {KEY_PORTFOLIO_ID: 1000 + len(self.portfolios), KEY_PORTFOLIO_NAME: name, KEY_PORTFOLIO_DESCRIPTION: description}
+    self.portfolios.append(portfolio)
+    return portfolio
+
+
+  def warm(self):
+    return True
+
+
+  # Orders are never rate limited here
+  def order_capacity(self):
+    return None
+
+
+  def throttle_order(self):
+    return 0
+
+
+  # Execute a buy order, filling notes as far as loans, cash, and our fill rate allow
+  def submit_order(self, orders, throttled=False):
+    positions= dict((loan[KEY_ID], position) for position, loan in enumerate(self.loans))
+    filled= self.now + self.orderLatency
+    self.orderId+= 1
+    confirmations= []
+
+    for item in orders:
+      requested= item[KEY_REQUESTED_AMOUNT]
+      position= positions.get(item[KEY_LOAN_ID])
+      loan= self.loans[position] if position != None else None
+      if loan == None or loan[KEY_FUNDED_AMOUNT] >= loan[KEY_LOAN_AMOUNT]:
+        invested= 0
+        status= STATUS_NOT_LISTED
+      elif self.cash < NOTE_AMOUNT:
+        invested= 0
+        status= STATUS_NO_CASH
+      else:
+        invested= lcsynthetic.FilledAmount(self.random, requested, loan[KEY_LOAN_AMOUNT] - loan[KEY_FUNDED_AMOUNT], self.cash, self.fillRate)
+        status= STATUS_FILLED if invested == requested else STATUS_PARTIAL
+
+      if invested > 0:
+        self.loans[position]= self.buy(loan, invested, filled)
+
+      confirmations.append({KEY_LOAN_ID: item[KEY_LOAN_ID], KEY_REQUESTED_AMOUNT: requested, KEY_INVESTED_AMOUNT: invested, KEY_EXECUTIONS_STATUS: [status]})
+
+    return {KEY_ORDER_ID: self.orderId, KEY_CONFIRMATIONS: confirmations}
+
+
+  # Take a note of a loan and schedule its installments, returning the loan as funded since
+  def buy(self, loan, amount, moment):
+    loan= dict(loan)
+    loan[KEY_FUNDED_AMOUNT]+= amount
+    self.funded[loan[KEY_ID]]= self.funded.get(loan[KEY_ID], 0) + amount
+    self.cash-= amount
+
+    note= {KEY_NOTE_ID: self.nextNoteId, KEY_LOAN_ID: loan[KEY_ID], 'orderId': self.orderId, KEY_GRADE: loan.get(KEY_SUB_GRADE) or loan[KEY_GRADE], KEY_NOTE_RATE: loan[KEY_RATE], KEY_NOTE_STATUS: 'Issuing',
+      KEY_NOTE_AMOUNT: amount, KEY_PRINCIPAL: amount, KEY_PRINCIPAL_RECEIVED: 0, KEY_INTEREST_RECEIVED: 0, KEY_PAYMENTS_RECEIVED: 0, 'orderDate': datetime.datetime.fromtimestamp(moment).isoformat()}
+    self.notes.append(note)
+
+    # level installments paying the note off over its term
+    rate= loan[KEY_RATE] / 1200
+    term= loan.get(KEY_TERM) or TERM_MONTHS
+    installment= amount * rate / (1 - (1 + rate) ** -term) if rate > 0 else amount / term
+    heapq.heappush(self.payments, (moment + MONTH_SECONDS, self.nextNoteId, note, installment, rate))
+    self.nextNoteId+= 1
+
+    self.fills.append((moment, loan[KEY_ID], amount, moment - self.firstSeen.get(loan[KEY_ID], moment), loan[KEY_RATE]))
+
+    return loan
+
+
+  def submit_withdrawal(self, amount):
+    amount= min(amount, self.cash)
+    self.cash-= amount
+    return {KEY_AMOUNT: amount, KEY_TRANSFER_DATE: time.strftime('%m/%d/%Y', time.localtime(self.now + 3 * 86400))}
+
+
+#
+# Define our functions
+#
+
+# Collect all expected and detected arguments from the command line (or a given list)
+#
+def GetArguments(arguments=None):
+  argumentParser= argparse.ArgumentParser(description='Replay recorded listings through lc-auto-invest against a simulated account', epilog='Arguments after "--" go to lc-auto-invest (e.g., -- --grade A 40 --grade B 60)')
+
+  argumentParser.add_argument('-l', '--snapshot-log', nargs=1, dest='snapshotLog', required=True, action='store', help='Snapshot log of recorded listings (see lc-auto-invest --snapshot-log)')
+  argumentParser.add_argument('--start', nargs=1, dest='start', required=False, action='store', help='Replay listings recorded from this moment on (e.g., 2026-01-31 or 2026-01-31T06:00)')
+  argumentParser.add_argument('--end', nargs=1, dest='end', required=False, action='store', help='Replay listings recorded until this moment')
+
+  argumentParser.add_argument('--cash', nargs=1, dest='cash', type=float, required=False, action='store', default=[CASH], help='Cash the simulated account starts with')
+  argumentParser.add_argument('--from-account', dest='fromAccount', required=False, action='store_true', default=False, help='Start from the latest account summary and owned notes recorded before the first listing instead')
+  argumentParser.add_argument('--fill-rate', nargs=1, dest='fillRate', type=float, required=False, action='store', default=[FILL_RATE], help='Fraction of order items filled in full (the rest fill partially, as if others got there first)')
+  argumentParser.add_argument('--order-latency', nargs=1, dest='orderLatency', type=float, required=False, action='store', default=[ORDER_LATENCY], help='Seconds between fetching a listing and an order filling')
+  argumentParser.add_argument('--seed', nargs=1, dest='seed', type=int, required=False, action='store', default=[SEED], help='Seed for simulated partial fills')
+  argumentParser.add_argument('--report-interval', nargs=1, dest='reportInterval', type=float, required=False, action='store', default=[REPORT_INTERVAL_HOURS], help='Hours of replayed time between timeline rows')
+
+  argumentParser.add_argument('-d', '--debug', dest='debug', required=False, action='store_true', default=False, help='Turn on verbose diagnostics (including every lc-auto-invest decision)')
+
+  argumentParser.add_argument('-v', '--version', action='version', version='%(prog)s '+VERSION)
+
+  argumentParser.add_argument('investArguments', nargs=argparse.REMAINDER, help=argparse.SUPPRESS)
+
+  return argumentParser.parse_args(arguments)
+
+
+# Validate and normalize all of the obtained arguments
+#
+def NormalizeArguments(options):
+  options.snapshotLog= str(options.snapshotLog.pop())
+  if options.start != None:
+    options.start= ParseMoment(options.start.pop())
+  if options.end != None:
+    options.end= ParseMoment(options.end.pop())
+  options.cash= float(options.cash.pop())
+  options.fillRate= float(options.fillRate.pop())
+  if options.fillRate < 0 or options.fillRate > 1:
+    raise Exception('Fill rate ({}) must be between 0 and 1'.format(options.fillRate))
+  options.orderLatency= float(options.orderLatency.pop())
+  options.seed= int(options.seed.pop())
+  options.reportInterval= float(options.reportInterval.pop()) * 3600
+  if options.reportInterval <= 0:
+    raise Exception('Report interval ({}) must be positive'.format(options.reportInterval))
+
+  if len(options.investArguments) > 0 and options.investArguments[0] == '--':
+    options.investArguments= options.investArguments[1:]
+
+  return options
+
+
+# Parse a moment given as an ISO date (and time) in local time
+#
+def ParseMoment(moment):
+  try:
+    return time.mktime(datetime.datetime.fromisoformat(moment).timetuple())
+  except ValueError:
+    raise Exception('Could not parse the moment "{}" (expected e.g. 2026-01-31 or 2026-01-31T06:00)'.format(moment))
+
+
+# Parse lc-auto-invest options for replayed runs
+#
+def InvestOptions(script, options):
+  arguments= ['--token', 'backtest', '--id', '0'] + options.investArguments
+  if not options.debug:
+    arguments.append('--quiet')
+
+  return script.NormalizeArguments(script.GetArguments(arguments))
+
+
+# Set up a simulated account, optionally as recorded before the replay starts
+#
+def Account(options, reader, first):
+  cash= options.cash
+  notes= []
+  if options.fromAccount:
+    summary= reader.at(lcrecord.KIND_SUMMARY, first)
+    owned= reader.at(lcrecord.KIND_NOTES, first)
+    if summary == None:
+      raise Exception('No account summary was recorded before the first listing', options.snapshotLog)
+    cash= summary.records()[0][KEY_AVAILABLE_CASH]
+    if owned != None:
+      notes= owned.records()
+
+  return ReplayRequest(options, cash, notes)
+
+
+# Run lc-auto-invest once, as of a recorded listing
+#
+def Replay(script, investOptions, request, portfolio):
+  investOptions.portfolio= portfolio
+  account= script.AssessAccount(investOptions, request)
+  if len(account[script.KEY_SHOPPING_LIST]) > 0:
+    script.SubmitOrder(investOptions, request, script.ComposeOrder(investOptions, request, account, request.get_available_notes()), account)
+
+
+# Share of principal held in each major grade
+#
+def GradeMix(notes):
+  principal= dict((grade, 0) for grade in GRADES)
+  for note in notes:
+    principal[note[KEY_GRADE][0]]+= note[KEY_PRINCIPAL]
+  total= sum(principal.values())
+
+  return dict((grade, principal[grade] / total if total > 0 else 0) for grade in GRADES)
+
+
+# Find a percentile of some measurements (nearest rank)
+#
+def Percentile(values, percent):
+  ordered= sorted(values)
+  rank= max(1, -(-len(ordered) * percent // 100))
+  return ordered[int(rank) - 1]
+
+
+def ReportHeader():
+  print('{:<16} {:>12} {:>12} {:>12} {:>7} {:>7}  {}'.format('Replayed time', 'Cash', 'Total', 'Deployed', 'Notes', 'Fills', ' '.join('{:>5}'.format(grade) for grade in GRADES)))
+  print('-' * (16 + 13 * 3 + 8 * 2 + 2 + 6 * len(GRADES)))
+
+
+# Print one timeline row: cash, account total, cash deployed since the last row, and grade mix
+#
+def ReportRow(request, moment, deployed, fills):
+  summary= request.get_account_summary()
+  mix= GradeMix(request.notes)
+  print('{:<16} {:12,.2f} {:12,.2f} {:12,.2f} {:7,} {:7,}  {}'.format(time.strftime('%Y-%m-%d %H:%M', time.localtime(moment)), summary[KEY_AVAILABLE_CASH], summary[KEY_ACCOUNT_TOTAL], deployed, len(request.notes), fills, ' '.join('{:5.1%}'.format(mix[grade]) for grade in GRADES)))
+  sys.stdout.flush()
+
+
+# Replay listings, given as (timestamp, loans) pairs, through lc-auto-invest against a simulated
+# account, optionally printing a timeline row every report interval, and count failed runs
+#
+def Simulate(options, script, investOptions, request, listings, timeline=False):
+  portfolio= investOptions.portfolio
+  nextRow= None
+  reportedFills= 0
+  failures= 0
+
+  for timestamp, loans in listings:
+    if nextRow == None:
+      nextRow= timestamp + options.reportInterval
+    while timeline and timestamp >= nextRow:
+      # rows fall on report boundaries, even when no listing was recorded for a while
+      request.advance(nextRow)
+      fills= request.fills[reportedFills:]
+      ReportRow(request, nextRow, sum(fill[2] for fill in fills), len(fills))
+      reportedFills= len(request.fills)
+      nextRow+= options.reportInterval
+
+    request.advance(timestamp)
+    request.list(loans)
+    try:
+      Replay(script, investOptions, request, portfolio)
+    except Exception as error:
+      # keep going, just as the live script would at its next run
+      failures+= 1
+      if options.debug:
+        print('\n*** Replay at {} failed: {}'.format(time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp)), ' '.join(str(argument) for argument in error.args)))
+
+  if timeline and nextRow != None:
+    fills= request.fills[reportedFills:]
+    ReportRow(request, request.now, sum(fill[2] for fill in fills), len(fills))
+
+  return failures
+
+
+# Replay every recorded listing in range, reporting a timeline and a final summary
+#
+def Backtest(options, script, investOptions, reader):
+  snapshots= list(reader.snapshots(lcrecord.KIND_LISTING, options.start, options.end))
+  if len(snapshots) == 0:
+    raise Exception('No listings were recorded in the requested range', options.snapshotLog)
+
+  request= Account(options, reader, snapshots[0].timestamp)
+  started= time.perf_counter()
+  startingCash= request.cash
+
+  ReportHeader()
+  failures= Simulate(options, script, investOptions, request, ((snapshot.timestamp, snapshot.records()) for snapshot in snapshots), True)
+  last= snapshots[-1].timestamp
+  elapsed= time.perf_counter() - started
+
+  # final summary
+  deployed= sum(fill[2] for fill in request.fills)
+  print('')
+  print('Replayed {:,} listing{} over {:,.1f} hours in {:,.1f} seconds ({:,.0f}x real time)'.format(len(snapshots), PluralS(len(snapshots)), (last - snapshots[0].timestamp) / 3600, elapsed, (last - snapshots[0].timestamp) / max(elapsed, 1e-9)))
+  print('{:>18}: ${:12,.2f}'.format('Starting cash', startingCash))
+  print('{:>18}: ${:12,.2f}'.format('Cash deployed', deployed))
+  print('{:>18}: ${:12,.2f}'.format('Repayments', request.repaid))
+  print('{:>18}: ${:12,.2f}'.format('Ending cash', request.cash))
+  print('{:>18}: ${:12,.2f}'.format('Average idle cash', request.idle_cash()))
+  print('{:>18}: {:13,}'.format('Notes bought', len(request.fills)))
+  if len(request.fills) > 0:
+    latencies= [fill[3] for fill in request.fills]
+    print('{:>18}: {}'.format('Fill latency', ', '.join('p{} {:,.1f}s'.format(percent, Percentile(latencies, percent)) for percent in PERCENTILES)))
+  if failures > 0:
+    print('{:>18}: {:13,}'.format('Failed runs', failures))
+
+  return request
+
+
+# Should there be an 's' at the end?
+#
+def PluralS(number):
+  if int(number) == 1:
+    return ''
+  else:
+    return 's'
+
+
+# Main entry point
+#
+def main():
+  try:
+    options= NormalizeArguments(GetArguments())
+    script= LoadScript('lc-auto-invest')
+    investOptions= InvestOptions(script, options)
+
+    with lcrecord.SnapshotReader(options.snapshotLog) as reader:
+      Backtest(options, script, investOptions, reader)
+
+  except Exception as error:
+    print(type(error))
+    print(error.args[0])
+    for counter in range(1, len(error.args)):
+      print('\t' + str(error.args[counter]))
+    sys.exit(2)
+
+
+#
+# Execute if we were run as a program
+#
+
+if __name__ == '__main__':
+  main()
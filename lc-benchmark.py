@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+
+
+#
+# Import all necessary libraries
+#
+
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+import lcscreen
+import lcsynthetic
+from lcscript import LoadScript
+
+
+#
+# Define some global constants
+#
+
+VERSION= '1.0.0'
+LISTING_SIZES= [100, 1000, 10000, 100000]
+PORTFOLIO_SIZES= [1000, 10000, 100000]
+REPEAT= 5
+TOLERANCE= 0.25
+SEED= 0
+CASH= 100000.0
+PERCENTILES= [50, 90, 99]
+
+# Benchmarks over listings and over portfolios
+BENCHMARK_FILTER_PREFERENCE= 'FilterNotesByPreference'
+BENCHMARK_FILTER_GRADE= 'FilterNotesByGrade'
+BENCHMARK_COMPOSE= 'ComposeOrder'
+BENCHMARK_TALLY= 'AssessAccount.TallyNotes'
+BENCHMARK_PERFORMANCE= 'CompilePerformance'
+LISTING_BENCHMARKS= [BENCHMARK_FILTER_PREFERENCE, BENCHMARK_FILTER_GRADE, BENCHMARK_COMPOSE]
+PORTFOLIO_BENCHMARKS= [BENCHMARK_TALLY, BENCHMARK_PERFORMANCE]
+
+# Result keys
+KEY_BENCHMARK= 'benchmark'
+KEY_SIZE= 'size'
+KEY_SECONDS= 'seconds'
+KEY_THROUGHPUT= 'throughput'
+KEY_PEAK= 'peak'
+KEY_REGRESSED= 'regressed'
+
+
+#
+# Define our classes
+#
+
+# Stand-in for LCRequest serving synthetic payloads from memory
+#
+class SyntheticRequest:
+
+  # Constructor
+  def __init__(self, loans, notes, cash):
+    self.loans= loans
+    self.notes= notes
+    self.summary= lcsynthetic.Summary(0, notes, cash)
+
+
+  def get_account_summary(self):
+    return self.summary
+
+
+  def get_available_notes(self):
+    return self.loans
+
+
+  def get_owned_notes(self):
+    return self.notes
+
+
+  def iter_owned_notes(self, fields=None):
+    for note in self.notes:
+      if fields == None:
+        yield note
+      else:
+        yield dict((field, note.get(field)) for field in fields)
+
+
+  def get_owned_portfolios(self):
+    return []
+
+
+  def find_portfolio(self, name):
+    return None
+
+
+#
+# Define our functions
+#
+
+# Collect all expected and detected arguments from the command line (or a given list)
+#
+def GetArguments(arguments=None):
+  argumentParser= argparse.ArgumentParser()
+
+  argumentParser.add_argument('--listing-sizes', nargs='+', dest='listingSizes', type=int, required=False, action='store', default=LISTING_SIZES, help='Numbers of listed loans to benchmark screening and allocation with (up to 1,000,000)')
+  argumentParser.add_argument('--portfolio-sizes', nargs='+', dest='portfolioSizes', type=int, required=False, action='store', default=PORTFOLIO_SIZES, help='Numbers of owned notes to benchmark aggregation with (up to 500,000)')
+  argumentParser.add_argument('-b', '--benchmark', nargs=1, dest='benchmarks', choices=LISTING_BENCHMARKS + PORTFOLIO_BENCHMARKS, required=False, action='append', help='Run only this benchmark (may be repeated)')
+  argumentParser.add_argument('--engine', nargs=1, dest='engine', choices=['python', 'numpy'], required=False, action='store', default=['python'], help='Screening and aggregation engine to benchmark')
+  argumentParser.add_argument('-r', '--repeat', nargs=1, dest='repeat', type=int, required=False, action='store', default=[REPEAT], help='Timed runs per benchmark and size')
+  argumentParser.add_argument('--seed', nargs=1, dest='seed', type=int, required=False, action='store', default=[SEED], help='Seed for the synthetic payloads')
+  argumentParser.add_argument('--no-memory', dest='memory', required=False, action='store_false', default=True, help='Skip the (slower) peak memory measurement')
+
+  argumentParser.add_argument('--baseline', nargs=1, dest='baseline', required=False, action='store', help='Compare results to this stored baseline (JSON) and fail on regressions')
+  argumentParser.add_argument('--save-baseline', nargs=1, dest='saveBaseline', required=False, action='store', help='Store results as a baseline (JSON) for later comparisons')
+  argumentParser.add_argument('--tolerance', nargs=1, dest='tolerance', type=float, required=False, action='store', default=[TOLERANCE], help='Fraction by which median latency or peak memory may exceed the baseline')
+
+  argumentParser.add_argument('-v', '--version', action='version', version='%(prog)s '+VERSION)
+
+  return argumentParser.parse_args(arguments)
+
+
+# Validate and normalize all of the obtained arguments
+#
+def NormalizeArguments(options):
+  options.engine= str(options.engine.pop())
+  options.repeat= max(1, int(options.repeat.pop()))
+  options.seed= int(options.seed.pop())
+  options.tolerance= float(options.tolerance.pop())
+  if options.baseline != None:
+    options.baseline= str(options.baseline.pop())
+  if options.saveBaseline != None:
+    options.saveBaseline= str(options.saveBaseline.pop())
+  if options.benchmarks == None:
+    options.benchmarks= LISTING_BENCHMARKS + PORTFOLIO_BENCHMARKS
+  else:
+    options.benchmarks= [benchmark.pop() for benchmark in options.benchmarks]
+
+  if options.engine == 'numpy' and not lcscreen.Available():
+    raise Exception('The numpy screening engine was requested but NumPy is not installed')
+
+  return options
+
+
+# Parse lc-auto-invest options for a quiet run buying every grade
+#
+def InvestOptions(script, options):
+  arguments= ['--token', 'benchmark', '--id', '0', '--quiet', '--engine', options.engine, '--maximum-amount-per-note', '100']
+  for grade in lcsynthetic.GRADES:
+    arguments.extend(['--grade', grade, str(100.0 / len(lcsynthetic.GRADES))])
+
+  return script.NormalizeArguments(script.GetArguments(arguments))
+
+
+# Time repeated calls of a function (after an untimed warm-up call), returning per-call seconds
+#
+def Time(work, repeat):
+  work()
+  seconds= []
+  for counter in range(repeat):
+    gc.collect()
+    started= time.perf_counter()
+    work()
+    seconds.append(time.perf_counter() - started)
+
+  return seconds
+
+
+# Measure the peak memory allocated during one call of a function
+#
+def PeakMemory(work):
+  gc.collect()
+  tracemalloc.start()
+  try:
+    work()
+    current, peak= tracemalloc.get_traced_memory()
+  finally:
+    tracemalloc.stop()
+
+  return peak
+
+
+# Find a percentile of some measurements (nearest rank)
+#
+def Percentile(values, percent):
+  ordered= sorted(values)
+  rank= max(1, -(-len(ordered) * percent // 100))
+  return ordered[int(rank) - 1]
+
+
+# Run one benchmark for one size and summarize its measurements
+#
+def Measure(options, benchmark, size, work):
+  seconds= Time(work, options.repeat)
+  result= {KEY_BENCHMARK: benchmark, KEY_SIZE: size, KEY_SECONDS: dict(('p{}'.format(percent), Percentile(seconds, percent)) for percent in PERCENTILES)}
+  result[KEY_THROUGHPUT]= size / max(result[KEY_SECONDS]['p50'], 1e-9)
+  if options.memory:
+    result[KEY_PEAK]= PeakMemory(work)
+
+  return result
+
+
+# Benchmark screening and allocation over listings of each size
+#
+def BenchmarkListings(options, script, investOptions):
+  results= []
+  owned= lcsynthetic.OwnedNotes(max(options.portfolioSizes + [1000]), options.seed)
+
+  for size in options.listingSizes:
+    loans= lcsynthetic.Listing(size, options.seed)
+    request= SyntheticRequest(loans, owned, CASH)
+    account= script.AssessAccount(investOptions, request)
+    ownedLoans= account[script.KEY_INVESTED_LOANS]
+    grades= lcsynthetic.GRADES
+    start= len(results)
+
+    if BENCHMARK_FILTER_PREFERENCE in options.benchmarks:
+      results.append(Measure(options, BENCHMARK_FILTER_PREFERENCE, size, lambda: script.FilterNotesByPreference(investOptions, ownedLoans, loans, grades)))
+    if BENCHMARK_FILTER_GRADE in options.benchmarks:
+      results.append(Measure(options, BENCHMARK_FILTER_GRADE, size, lambda: [script.FilterNotesByGrade(loans, grade) for grade in grades]))
+    if BENCHMARK_COMPOSE in options.benchmarks:
+      results.append(Measure(options, BENCHMARK_COMPOSE, size, lambda: script.ComposeOrder(investOptions, request, account, loans)))
+
+    Report(results[start:])
+
+  return results
+
+
+# Benchmark note aggregation over portfolios of each size
+#
+def BenchmarkPortfolios(options, script, investOptions):
+  results= []
+  report= LoadScript('lc-report')
+
+  for size in options.portfolioSizes:
+    notes= lcsynthetic.OwnedNotes(size, options.seed)
+    request= SyntheticRequest([], notes, CASH)
+    start= len(results)
+
+    if BENCHMARK_TALLY in options.benchmarks:
+      results.append(Measure(options, BENCHMARK_TALLY, size, lambda: script.TallyNotes(investOptions, request)))
+    if BENCHMARK_PERFORMANCE in options.benchmarks:
+      if options.engine == 'numpy':
+        results.append(Measure(options, BENCHMARK_PERFORMANCE, size, lambda: report.CompilePerformanceColumns(request.iter_owned_notes())))
+      else:
+        results.append(Measure(options, BENCHMARK_PERFORMANCE, size, lambda: report.CompilePerformance(request.iter_owned_notes(report.NOTE_FIELDS))))
+
+    Report(results[start:])
+
+  return results
+
+
+# Flag results slower or hungrier than the baseline allows
+#
+def Compare(options, results):
+  with open(options.baseline) as source:
+    baseline= json.load(source)
+
+  regressions= 0
+  for result in results:
+    reference= baseline.get('{}@{}'.format(result[KEY_BENCHMARK], result[KEY_SIZE]))
+    if reference == None:
+      continue
+
+    result[KEY_REGRESSED]= []
+    change= result[KEY_SECONDS]['p50'] / reference[KEY_SECONDS]['p50'] - 1
+    result['change']= change
+    if change > options.tolerance:
+      result[KEY_REGRESSED].append('latency {:+.0%}'.format(change))
+    if KEY_PEAK in result and KEY_PEAK in reference and reference[KEY_PEAK] > 0:
+      growth= result[KEY_PEAK] / reference[KEY_PEAK] - 1
+      if growth > options.tolerance:
+        result[KEY_REGRESSED].append('memory {:+.0%}'.format(growth))
+    if len(result[KEY_REGRESSED]) > 0:
+      regressions+= 1
+
+  return regressions
+
+
+# Print results as table rows
+#
+def Report(results):
+  for result in results:
+    seconds= result[KEY_SECONDS]
+    peak= '{:8.1f}'.format(result[KEY_PEAK] / 2**20) if KEY_PEAK in result else '{:>8}'.format('-')
+    comparison= ''
+    if 'change' in result:
+      comparison= '  {:+6.0%}'.format(result['change'])
+      if len(result[KEY_REGRESSED]) > 0:
+        comparison+= '  REGRESSED ({})'.format(', '.join(result[KEY_REGRESSED]))
+    print('{:<26} {:>9,} {:10.3f} {:10.3f} {:10.3f} {:14,.0f} {}{}'.format(result[KEY_BENCHMARK], result[KEY_SIZE], seconds['p50'] * 1000, seconds['p90'] * 1000, seconds['p99'] * 1000, result[KEY_THROUGHPUT], peak, comparison))
+    sys.stdout.flush()
+
+
+def ReportHeader():
+  print('{:<26} {:>9} {:>10} {:>10} {:>10} {:>14} {:>8}'.format('Benchmark', 'Size', 'p50 ms', 'p90 ms', 'p99 ms', 'Items/second', 'Peak MB'))
+  print('-' * 94)
+
+
+# Main entry point
+#
+def main():
+  try:
+    options= NormalizeArguments(GetArguments())
+    script= LoadScript('lc-auto-invest')
+    investOptions= InvestOptions(script, options)
+
+    ReportHeader()
+    results= BenchmarkListings(options, script, investOptions) + BenchmarkPortfolios(options, script, investOptions)
+
+    regressions= 0
+    if options.baseline != None:
+      regressions= Compare(options, results)
+      print('\nCompared to {}:'.format(options.baseline))
+      ReportHeader()
+      Report(results)
+      print('\n{} regression{} beyond {:.0%}'.format(regressions, '' if regressions == 1 else 's', options.tolerance))
+
+    if options.saveBaseline != None:
+      baseline= dict(('{}@{}'.format(result[KEY_BENCHMARK], result[KEY_SIZE]), result) for result in results)
+      with open(options.saveBaseline, 'w') as destination:
+        json.dump(baseline, destination, indent=2, sort_keys=True)
+      print('\nSaved baseline to {}'.format(options.saveBaseline))
+
+  except Exception as error:
+    print(type(error))
+    print(error.args[0])
+    for counter in range(1, len(error.args)):
+      print('\t' + str(error.args[counter]))
+    sys.exit(2)
+
+  if regressions > 0:
+    sys.exit(1)
+
+
+#
+# Execute if we were run as a program
+#
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,491 @@
+#!/usr/bin/env python3
+
+
+#
+# Import all necessary libraries
+#
+
+import argparse
+import collections
+import json
+import os
+import random
+import re
+import threading
+import time
+import lcsynthetic
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from lcrequest import LCRequest, REQUEST_HEADER
+
+
+#
+# Define some global constants
+#
+
+VERSION= '1.0.0'
+HOST= '127.0.0.1'
+PORT= 8080
+ROOT= '/api/investor/v1/'
+LISTING_SIZE= 500
+NOTES_COUNT= 1000
+CASH= 1000.0
+NOTE_AMOUNT= 25
+
+# Recorded payloads (raw API response bodies) in a fixtures directory
+FIXTURE_LISTING= 'listing.json'
+FIXTURE_SUMMARY= 'summary.json'
+FIXTURE_NOTES= 'detailednotes.json'
+FIXTURE_PORTFOLIOS= 'portfolios.json'
+
+# Routes we serve (relative to the API root)
+ROUTE_LISTING= re.compile(r'^loans/listing$')
+ROUTE_ACCOUNT= re.compile(r'^accounts/([^/]+)/(summary|detailednotes|portfolios|orders|funds/withdraw)$')
+
+# Order execution status codes
+STATUS_FILLED= 'ORDER_FULFILLED'
+STATUS_PARTIAL= 'LOAN_AMNT_EXCEEDED'
+STATUS_NOT_LISTED= 'NOT_AN_IN_FUNDING_LOAN'
+STATUS_NO_CASH= 'INSUFFICIENT_CASH'
+
+# Lending Club API data structure keys
+KEY_LOANS= 'loans'
+KEY_AS_OF= 'asOfDate'
+KEY_NOTES= 'myNotes'
+KEY_PORTFOLIOS= 'myPortfolios'
+KEY_ID= 'id'
+KEY_LOAN_ID= 'loanId'
+KEY_NOTE_ID= 'noteId'
+KEY_GRADE= 'grade'
+KEY_SUB_GRADE= 'subGrade'
+KEY_RATE= 'intRate'
+KEY_LOAN_AMOUNT= 'loanAmount'
+KEY_FUNDED_AMOUNT= 'fundedAmount'
+KEY_AVAILABLE_CASH= 'availableCash'
+KEY_ORDERS= 'orders'
+KEY_REQUESTED_AMOUNT= 'requestedAmount'
+KEY_INVESTED_AMOUNT= 'investedAmount'
+KEY_EXECUTIONS_STATUS= 'executionStatus'
+KEY_ORDER_ID= 'orderInstructId'
+KEY_CONFIRMATIONS= 'orderConfirmations'
+KEY_PORTFOLIO_ID= 'portfolioId'
+KEY_PORTFOLIO_NAME= 'portfolioName'
+KEY_PORTFOLIO_DESCRIPTION= 'portfolioDescription'
+KEY_AMOUNT= 'amount'
+KEY_TRANSFER_DATE= 'estimatedFundsTransferDate'
+KEY_ERRORS= 'errors'
+KEY_MESSAGE= 'message'
+
+
+#
+# Define our classes
+#
+
+# State of one simulated account and the loan listing, shared by all request threads
+#
+class MockAccount:
+
+  # Constructor
+  def __init__(self, options):
+    self.options= options
+    self.lock= threading.Lock()
+    self.random= random.Random(options.seed)
+    self.orderId= 0
+
+    fixtures= LoadFixtures(options.fixtures)
+    if FIXTURE_LISTING in fixtures:
+      self.loans= fixtures[FIXTURE_LISTING][KEY_LOANS]
+    else:
+      self.loans= lcsynthetic.Listing(options.listingSize, options.seed)
+    if FIXTURE_NOTES in fixtures:
+      self.notes= fixtures[FIXTURE_NOTES][KEY_NOTES]
+    else:
+      self.notes= lcsynthetic.OwnedNotes(options.notesCount, options.seed)
+    if FIXTURE_SUMMARY in fixtures:
+      self.cash= fixtures[FIXTURE_SUMMARY][KEY_AVAILABLE_CASH]
+    else:
+      self.cash= options.cash
+    if FIXTURE_PORTFOLIOS in fixtures:
+      self.portfolios= fixtures[FIXTURE_PORTFOLIOS][KEY_PORTFOLIOS]
+    else:
+      self.portfolios= []
+
+    self.nextLoanId= max([loan[KEY_ID] for loan in self.loans] + [lcsynthetic.FIRST_LOAN_ID]) + 1
+    self.nextNoteId= max([note[KEY_NOTE_ID] for note in self.notes] + [0]) + 1
+    self.release= self.current_release()
+
+
+  # Number of the release period we are in (periods are aligned to the clock)
+  def current_release(self):
+    if self.options.releaseInterval <= 0:
+      return 0
+    return int(time.time() // self.options.releaseInterval)
+
+
+  # List a fresh batch of loans whenever a new release period starts
+  def _release(self):
+    release= self.current_release()
+    if release != self.release:
+      self.release= release
+      self.loans= [loan for loan in self.loans if loan[KEY_FUNDED_AMOUNT] < loan[KEY_LOAN_AMOUNT]]
+      self.loans.extend(lcsynthetic.Listing(self.options.releaseSize, self.options.seed + release, self.nextLoanId))
+      self.nextLoanId+= self.options.releaseSize
+
+
+  def listing(self):
+    with self.lock:
+      self._release()
+      return {KEY_AS_OF: time.strftime('%Y-%m-%dT%H:%M:%S'), KEY_LOANS: [loan for loan in self.loans if loan[KEY_FUNDED_AMOUNT] < loan[KEY_LOAN_AMOUNT]]}
+
+
+  def summary(self, id):
+    with self.lock:
+      return lcsynthetic.Summary(id, self.notes, round(self.cash, 2))
+
+
+  def owned_notes(self):
+    with self.lock:
+      return {KEY_NOTES: list(self.notes)}
+
+
+  def owned_portfolios(self):
+    with self.lock:
+      return {KEY_PORTFOLIOS: list(self.portfolios)}
+
+
+  def create_portfolio(self, payload):
+    with self.lock:
+      portfolio= {KEY_PORTFOLIO_ID: 1000 + len(self.portfolios), KEY_PORTFOLIO_NAME: payload[KEY_PORTFOLIO_NAME], KEY_PORTFOLIO_DESCRIPTION: payload[KEY_PORTFOLIO_DESCRIPTION]}
+      self.portfolios.append(portfolio)
+      return portfolio
+
+
+  # Execute a buy order, filling notes as far as loans, cash, and our fill rate allow
+  def order(self, payload):
+    with self.lock:
+      self._release()
+      loans= dict((loan[KEY_ID], loan) for loan in self.loans)
+      self.orderId+= 1
+      confirmations= []
+
+      for item in payload[KEY_ORDERS]:
+        requested= item[KEY_REQUESTED_AMOUNT]
+        loan= loans.get(item[KEY_LOAN_ID])
+        if loan == None or loan[KEY_FUNDED_AMOUNT] >= loan[KEY_LOAN_AMOUNT]:
+          invested= 0
+          status= STATUS_NOT_LISTED
+        elif self.cash < NOTE_AMOUNT:
+          invested= 0
+          status= STATUS_NO_CASH
+        else:
+          invested= lcsynthetic.FilledAmount(self.random, requested, loan[KEY_LOAN_AMOUNT] - loan[KEY_FUNDED_AMOUNT], self.cash, self.options.fillRate)
+          status= STATUS_FILLED if invested == requested else STATUS_PARTIAL
+
+        if invested > 0:
+          loan[KEY_FUNDED_AMOUNT]+= invested
+          self.cash-= invested
+          self.notes.append({KEY_NOTE_ID: self.nextNoteId, KEY_LOAN_ID: loan[KEY_ID], 'orderId': self.orderId, KEY_GRADE: loan.get(KEY_SUB_GRADE, loan[KEY_GRADE]), 'interestRate': loan[KEY_RATE], 'loanStatus': 'Issuing',
+            'noteAmount': invested, 'principalPending': invested, 'principalReceived': 0, 'interestReceived': 0, 'paymentsReceived': 0, 'orderDate': time.strftime('%Y-%m-%dT%H:%M:%S')})
+          self.nextNoteId+= 1
+
+        confirmations.append({KEY_LOAN_ID: item[KEY_LOAN_ID], KEY_REQUESTED_AMOUNT: requested, KEY_INVESTED_AMOUNT: invested, KEY_EXECUTIONS_STATUS: [status]})
+
+      return {KEY_ORDER_ID: self.orderId, KEY_CONFIRMATIONS: confirmations}
+
+
+  def withdraw(self, payload):
+    with self.lock:
+      amount= min(payload[KEY_AMOUNT], self.cash)
+      self.cash-= amount
+      return {KEY_AMOUNT: amount, KEY_TRANSFER_DATE: time.strftime('%m/%d/%Y', time.localtime(time.time() + 3 * 86400))}
+
+
+# Requests seen within the last second, for rejecting requests above a rate limit
+#
+class RequestWindow:
+
+  # Constructor
+  def __init__(self, limit):
+    self.limit= limit
+    self.lock= threading.Lock()
+    self.requests= collections.deque()
+
+
+  # Record a request and report whether it stays within the limit
+  def admit(self):
+    if self.limit <= 0:
+      return True
+
+    with self.lock:
+      now= time.time()
+      while len(self.requests) > 0 and self.requests[0] <= now - 1:
+        self.requests.popleft()
+      if len(self.requests) >= self.limit:
+        return False
+      self.requests.append(now)
+      return True
+
+
+# Serve the Lending Club API endpoints used by LCRequest
+#
+class MockHandler(BaseHTTPRequestHandler):
+  protocol_version= 'HTTP/1.1'
+  server_version= 'lc-mock-server/' + VERSION
+
+
+  def log_message(self, format, *arguments):
+    if self.server.options.debug:
+      BaseHTTPRequestHandler.log_message(self, format, *arguments)
+
+
+  def respond(self, status, body=None):
+    content= b'' if body == None else json.dumps(body).encode('utf-8')
+    self.send_response(status)
+    self.send_header('Content-Type', 'application/json')
+    self.send_header('Content-Length', str(len(content)))
+    self.end_headers()
+    if self.command != 'HEAD':
+      self.wfile.write(content)
+
+
+  # Apply simulated latency, rate limits, authorization, and failures; return True to proceed
+  # (every draw comes from the account's seeded generator, so --seed makes a run reproducible)
+  def admit(self):
+    options= self.server.options
+    generator= self.server.account.random
+    if options.latency > 0 or options.jitter > 0:
+      time.sleep(options.latency + generator.uniform(0, options.jitter))
+
+    if not self.server.window.admit():
+      self.respond(429, {KEY_ERRORS: [{KEY_MESSAGE: 'Too many requests'}]})
+      return False
+
+    if options.token != None and self.headers.get(REQUEST_HEADER) != options.token:
+      self.respond(401, {KEY_ERRORS: [{KEY_MESSAGE: 'Unauthorized'}]})
+      return False
+
+    if options.errorRate > 0 and generator.random() < options.errorRate:
+      self.respond(generator.choice([500, 503]), {KEY_ERRORS: [{KEY_MESSAGE: 'Simulated failure'}]})
+      return False
+
+    return True
+
+
+  # Find the route of a request path, or None if we don't serve it
+  def route(self):
+    path= self.path.split('?', 1)[0]
+    if not path.startswith(ROOT):
+      return None
+    path= path[len(ROOT):]
+
+    if ROUTE_LISTING.match(path):
+      return (None, 'loans/listing')
+    match= ROUTE_ACCOUNT.match(path)
+    if match == None or (self.server.options.id != None and match.group(1) != self.server.options.id):
+      return None
+    return match.groups()
+
+
+  def do_HEAD(self):
+    self.respond(200)
+
+
+  def do_GET(self):
+    route= self.route()
+    if route == None:
+      self.respond(404, {KEY_ERRORS: [{KEY_MESSAGE: 'Not found'}]})
+      return
+    if not self.admit():
+      return
+
+    id, endpoint= route
+    account= self.server.account
+    if endpoint == 'loans/listing':
+      self.respond(200, account.listing())
+    elif endpoint == 'summary':
+      self.respond(200, account.summary(id))
+    elif endpoint == 'detailednotes':
+      self.respond(200, account.owned_notes())
+    elif endpoint == 'portfolios':
+      self.respond(200, account.owned_portfolios())
+    else:
+      self.respond(405, {KEY_ERRORS: [{KEY_MESSAGE: 'Method not allowed'}]})
+
+
+  def do_POST(self):
+    route= self.route()
+    length= int(self.headers.get('Content-Length', 0))
+    try:
+      payload= json.loads(self.rfile.read(length) or b'null')
+    except ValueError:
+      self.respond(400, {KEY_ERRORS: [{KEY_MESSAGE: 'Malformed JSON'}]})
+      return
+    if route == None:
+      self.respond(404, {KEY_ERRORS: [{KEY_MESSAGE: 'Not found'}]})
+      return
+    if not self.admit():
+      return
+
+    id, endpoint= route
+    account= self.server.account
+    try:
+      if endpoint == 'orders':
+        self.respond(200, account.order(payload))
+      elif endpoint == 'portfolios':
+        self.respond(200, account.create_portfolio(payload))
+      elif endpoint == 'funds/withdraw':
+        self.respond(200, account.withdraw(payload))
+      else:
+        self.respond(405, {KEY_ERRORS: [{KEY_MESSAGE: 'Method not allowed'}]})
+    except (KeyError, TypeError) as error:
+      self.respond(400, {KEY_ERRORS: [{KEY_MESSAGE: 'Missing or malformed field {}'.format(error)}]})
+
+
+#
+# Define our functions
+#
+
+# Collect all expected and detected arguments from the command line (or a given list)
+#
+def GetArguments(arguments=None):
+  argumentParser= argparse.ArgumentParser()
+
+  argumentParser.add_argument('--host', nargs=1, dest='host', required=False, action='store', default=[HOST], help='Address to listen on')
+  argumentParser.add_argument('--port', nargs=1, dest='port', type=int, required=False, action='store', default=[PORT], help='Port to listen on (0 picks a free port)')
+  argumentParser.add_argument('-t', '--token', '--authorization-token', nargs=1, dest='token', required=False, action='store', help='Only accept requests with this authorization token (or, when recording, the token for the live API)')
+  argumentParser.add_argument('-i', '--id', '--investor-id', nargs=1, dest='id', required=False, action='store', help='Only serve this account number (or, when recording, the account to record)')
+
+  argumentParser.add_argument('--fixtures', nargs=1, dest='fixtures', required=False, action='store', help='Directory of recorded payloads to serve instead of synthetic ones (listing.json, summary.json, detailednotes.json, portfolios.json)')
+  argumentParser.add_argument('--record', nargs=1, dest='record', required=False, action='store', help='Record payloads from the live API into this directory and exit (requires --token and --id)')
+  argumentParser.add_argument('--seed', nargs=1, dest='seed', type=int, required=False, action='store', default=[0], help='Seed for synthetic payloads and simulated outcomes')
+  argumentParser.add_argument('--listing-size', nargs=1, dest='listingSize', type=int, required=False, action='store', default=[LISTING_SIZE], help='Number of synthetic loans listed at start')
+  argumentParser.add_argument('--notes', nargs=1, dest='notesCount', type=int, required=False, action='store', default=[NOTES_COUNT], help='Number of synthetic notes owned at start')
+  argumentParser.add_argument('--cash', nargs=1, dest='cash', type=float, required=False, action='store', default=[CASH], help='Available cash at start')
+
+  argumentParser.add_argument('--release-interval', nargs=1, dest='releaseInterval', type=float, required=False, action='store', default=[0], help='Seconds between listing releases, aligned to the clock (0 never releases new loans)')
+  argumentParser.add_argument('--release-size', nargs=1, dest='releaseSize', type=int, required=False, action='store', default=[LISTING_SIZE], help='Number of loans listed at each release')
+  argumentParser.add_argument('--latency', nargs=1, dest='latency', type=float, required=False, action='store', default=[0], help='Seconds to delay every response')
+  argumentParser.add_argument('--jitter', nargs=1, dest='jitter', type=float, required=False, action='store', default=[0], help='Most seconds of random delay added to every response')
+  argumentParser.add_argument('--error-rate', nargs=1, dest='errorRate', type=float, required=False, action='store', default=[0], help='Fraction of requests failing with a server error (500 or 503)')
+  argumentParser.add_argument('--rate-limit', nargs=1, dest='requestLimit', type=int, required=False, action='store', default=[0], help='Requests per second served before rejecting with 429 (0 for no limit)')
+  argumentParser.add_argument('--fill-rate', nargs=1, dest='fillRate', type=float, required=False, action='store', default=[1], help='Fraction of ordered notes filled in full (the rest fill partially or not at all)')
+
+  argumentParser.add_argument('-d', '--debug', dest='debug', required=False, action='store_true', default=False, help='Log every request')
+
+  argumentParser.add_argument('-v', '--version', action='version', version='%(prog)s '+VERSION)
+
+  return argumentParser.parse_args(arguments)
+
+
+# Validate and normalize all of the obtained arguments
+#
+def NormalizeArguments(options):
+  # convert lists of single values into values
+  options.host= str(options.host.pop())
+  options.port= int(options.port.pop())
+  if options.token != None:
+    options.token= str(options.token.pop())
+  if options.id != None:
+    options.id= str(options.id.pop())
+  if options.fixtures != None:
+    options.fixtures= str(options.fixtures.pop())
+  if options.record != None:
+    options.record= str(options.record.pop())
+    if options.token == None or options.id == None:
+      raise Exception('Recording payloads from the live API requires a token and an account number')
+
+  options.seed= int(options.seed.pop())
+  options.listingSize= int(options.listingSize.pop())
+  options.notesCount= int(options.notesCount.pop())
+  options.cash= float(options.cash.pop())
+
+  # convert simulation settings
+  options.releaseInterval= float(options.releaseInterval.pop())
+  options.releaseSize= int(options.releaseSize.pop())
+  options.latency= float(options.latency.pop())
+  options.jitter= float(options.jitter.pop())
+  options.errorRate= float(options.errorRate.pop())
+  options.requestLimit= int(options.requestLimit.pop())
+  options.fillRate= float(options.fillRate.pop())
+  if not 0 <= options.errorRate <= 1 or not 0 <= options.fillRate <= 1:
+    raise Exception('Error and fill rates must lie between 0 and 1', options.errorRate, options.fillRate)
+
+  return options
+
+
+# Read whichever recorded payloads a fixtures directory holds
+#
+def LoadFixtures(directory):
+  fixtures= {}
+  if directory != None:
+    for name in [FIXTURE_LISTING, FIXTURE_SUMMARY, FIXTURE_NOTES, FIXTURE_PORTFOLIOS]:
+      path= os.path.join(directory, name)
+      if os.path.exists(path):
+        with open(path) as source:
+          fixtures[name]= json.load(source)
+
+  return fixtures
+
+
+# Record payloads from the live API as fixtures
+#
+def RecordFixtures(options):
+  os.makedirs(options.record, exist_ok=True)
+  with LCRequest(options) as request:
+    payloads= {
+      FIXTURE_LISTING: {KEY_LOANS: request.get_available_notes()},
+      FIXTURE_SUMMARY: request.get_account_summary(),
+      FIXTURE_NOTES: {KEY_NOTES: request.get_owned_notes()},
+      FIXTURE_PORTFOLIOS: {KEY_PORTFOLIOS: request.get_owned_portfolios()},
+    }
+
+  for name in payloads:
+    with open(os.path.join(options.record, name), 'w') as destination:
+      json.dump(payloads[name], destination)
+    print('Recorded {}'.format(os.path.join(options.record, name)))
+
+
+# Start serving in a background thread and return the server
+# (its API root is at http://host:port/api/investor/v1/)
+#
+def StartServer(options):
+  server= ThreadingHTTPServer((options.host, options.port), MockHandler)
+  server.daemon_threads= True
+  server.options= options
+  server.account= MockAccount(options)
+  server.window= RequestWindow(options.requestLimit)
+  server.root= 'http://{}:{}{}'.format(options.host, server.server_address[1], ROOT)
+
+  thread= threading.Thread(target=server.serve_forever, daemon=True)
+  thread.start()
+  return server
+
+
+# Main entry point
+#
+def main():
+  try:
+    options= NormalizeArguments(GetArguments())
+    if options.record != None:
+      RecordFixtures(options)
+    else:
+      server= StartServer(options)
+      print('Serving the Lending Club API stand-in at {} (point scripts there with --api-root)'.format(server.root))
+      try:
+        while True:
+          time.sleep(3600)
+      except KeyboardInterrupt:
+        server.shutdown()
+
+  except Exception as error:
+    print(type(error))
+    print(error.args[0])
+    for counter in range(1, len(error.args)):
+      print('\t' + str(error.args[counter]))
+
+
+#
+# Execute if we were run as a program
+#
+
+if __name__ == '__main__':
+  main()
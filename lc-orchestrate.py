@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+
+
+#
+# Import all necessary libraries
+#
+
+import argparse
+import concurrent.futures
+import copy
+import datetime
+import json
+import sys
+import threading
+import time
+from lcrequest import LCRequest
+from lcscript import HandleTermination, LoadScript
+
+
+#
+# Define some global constants
+#
+
+VERSION= '1.0.0'
+WORKERS= 4
+RELEASE_TIMES= ['06:00', '10:00', '14:00', '18:00']
+RELEASE_LEAD_SECONDS= 30
+POLL_INTERVAL_SECONDS= 0.25
+POLL_DURATION_SECONDS= 60
+
+# Tasks we know how to run (in the order they run for each account) and their scripts
+TASK_INVEST= 'invest'
+TASK_WITHDRAW= 'withdraw'
+TASK_REPORT= 'report'
+TASKS= [TASK_INVEST, TASK_WITHDRAW, TASK_REPORT]
+SCRIPTS= {TASK_INVEST: 'lc-auto-invest', TASK_WITHDRAW: 'lc-withdraw-funds', TASK_REPORT: 'lc-report'}
+
+# Accounts file keys
+KEY_ACCOUNTS= 'accounts'
+KEY_NAME= 'name'
+KEY_ID= 'id'
+KEY_TOKEN= 'token'
+
+# Consolidated report keys
+KEY_ACCOUNT= 'account'
+KEY_TASK= 'task'
+KEY_STATUS= 'status'
+KEY_SECONDS= 'seconds'
+KEY_RESULT= 'result'
+KEY_ERROR= 'error'
+KEY_OUTPUT= 'output'
+KEY_RELEASE= 'release'
+KEY_RESULTS= 'results'
+STATUS_OK= 'ok'
+STATUS_FAILED= 'failed'
+
+# Lending Club API data structure keys
+KEY_AVAILABLE_CASH= 'availableCash'
+KEY_ACCOUNT_TOTAL= 'accountTotal'
+KEY_NOTES_COUNT= 'totalNotes'
+KEY_CONFIRMATIONS= 'orderConfirmations'
+KEY_INVESTED_AMOUNT= 'investedAmount'
+
+
+#
+# Define our classes
+#
+
+# Route printed output to a per-thread buffer while a task runs in that thread
+#
+class ThreadOutput:
+
+  # Constructor
+  def __init__(self, stream):
+    self.stream= stream
+    self.local= threading.local()
+
+
+  def start(self):
+    self.local.buffer= []
+
+
+  def stop(self):
+    output= ''.join(self.local.buffer)
+    self.local.buffer= None
+    return output
+
+
+  def write(self, text):
+    buffer= getattr(self.local, 'buffer', None)
+    if buffer != None:
+      buffer.append(text)
+    else:
+      self.stream.write(text)
+
+
+  def flush(self):
+    self.stream.flush()
+
+
+#
+# Define our functions
+#
+
+# Collect all expected and detected arguments from the command line
+#
+def GetArguments():
+  argumentParser= argparse.ArgumentParser()
+
+  argumentParser.add_argument('-a', '--accounts', nargs=1, dest='accounts', required=True, action='store', help='JSON file listing accounts (name, id, token) and per-task script arguments (invest, withdraw, report)')
+  argumentParser.add_argument('-w', '--workers', nargs=1, dest='workers', type=int, required=False, action='store', default=[WORKERS], help='Number of accounts to work on at once')
+  argumentParser.add_argument('-o', '--output', nargs=1, dest='output', required=False, action='store', help='Also write the consolidated report to this file as JSON')
+
+  argumentParser.add_argument('--api-root', nargs=1, dest='root', required=False, action='store', help='Lending Club API root URL for all accounts to use instead of the live API (e.g., a local lc-mock-server.py)')
+
+  argumentParser.add_argument('--daemon', dest='daemon', required=False, action='store_true', default=False, help='Keep running and invest for all accounts as soon as each listing release appears')
+  argumentParser.add_argument('--release-times', nargs='+', metavar='HH:MM', dest='releaseTimes', required=False, action='store', default=RELEASE_TIMES, help='Local times of day when new listings are released')
+  argumentParser.add_argument('--lead-time', nargs=1, dest='leadTime', type=float, required=False, action='store', default=[RELEASE_LEAD_SECONDS], help='Seconds before each release to assess accounts and warm connections')
+  argumentParser.add_argument('--poll-interval', nargs=1, dest='pollInterval', type=float, required=False, action='store', default=[POLL_INTERVAL_SECONDS], help='Seconds between listing polls after a release')
+  argumentParser.add_argument('--poll-duration', nargs=1, dest='pollDuration', type=float, required=False, action='store', default=[POLL_DURATION_SECONDS], help='Seconds to keep polling for a new listing after a release')
+
+  argumentParser.add_argument('-n', '--simulation', dest='simulation', required=False, action='store_true', default=False, help='Take no action -- only report decisions')
+  argumentParser.add_argument('-d', '--debug', dest='debug', required=False, action='store_true', default=False, help='Turn on verbose diagnostics')
+
+  argumentParser.add_argument('-v', '--version', action='version', version='%(prog)s '+VERSION)
+
+  return argumentParser.parse_args()
+
+
+# Validate and normalize some of the obtained arguments and pass the rest along
+#
+def NormalizeArguments(options):
+  options.accounts= str(options.accounts.pop())
+  options.workers= max(1, int(options.workers.pop()))
+  if options.output != None:
+    options.output= str(options.output.pop())
+  if options.root != None:
+    options.root= str(options.root.pop())
+
+  # convert release window settings
+  options.leadTime= float(options.leadTime.pop())
+  options.pollInterval= float(options.pollInterval.pop())
+  options.pollDuration= float(options.pollDuration.pop())
+  releaseTimes= []
+  for specification in options.releaseTimes:
+    try:
+      releaseTimes.append(datetime.datetime.strptime(specification, '%H:%M').time())
+    except ValueError:
+      raise Exception('Release time "{}" is not in HH:MM format'.format(specification))
+  options.releaseTimes= sorted(releaseTimes)
+
+  return options
+
+
+# Read and check the accounts file
+#
+def LoadAccounts(options):
+  with open(options.accounts) as source:
+    accounts= json.load(source)[KEY_ACCOUNTS]
+
+  for account in accounts:
+    if KEY_ID not in account or KEY_TOKEN not in account:
+      raise Exception('Each account needs an "{}" and a "{}"'.format(KEY_ID, KEY_TOKEN), account.get(KEY_NAME))
+    account[KEY_NAME]= str(account.get(KEY_NAME, account[KEY_ID]))
+
+  return accounts
+
+
+# Parse a script's options for one of our accounts
+#
+def TaskOptions(options, account, task):
+  script= LoadScript(SCRIPTS[task])
+  arguments= ['--token', str(account[KEY_TOKEN]), '--id', str(account[KEY_ID])] + [str(argument) for argument in account[task]]
+  if options.simulation and task != TASK_REPORT:
+    arguments.append('--simulation')
+  if options.root != None:
+    arguments.extend(['--api-root', options.root])
+  if options.debug:
+    arguments.append('--debug')
+
+  taskOptions= script.NormalizeArguments(script.GetArguments(arguments))
+  if taskOptions.profiler != None:
+    # the profiler samples every thread of the process, so it cannot single out one account's task
+    raise Exception('Accounts cannot ask for "--profile" (profiling covers the whole process, not one account)', account[KEY_NAME], task)
+
+  return script, taskOptions
+
+
+# Options for fetching the listing on behalf of all accounts with one of their tokens
+# (no script runs, so there are no metrics, snapshot log, or profiler to keep)
+#
+def ListingOptions(options, account):
+  return argparse.Namespace(token=str(account[KEY_TOKEN]), id=str(account[KEY_ID]), root=options.root, debug=options.debug)
+
+
+# Run a task, capturing its output, timing, and outcome
+#
+def RunTask(account, task, work):
+  sys.stdout.start()
+  started= time.time()
+  outcome= {KEY_ACCOUNT: account[KEY_NAME], KEY_TASK: task}
+  try:
+    outcome[KEY_RESULT]= work()
+    outcome[KEY_STATUS]= STATUS_OK
+  except Exception as error:
+    outcome[KEY_STATUS]= STATUS_FAILED
+    outcome[KEY_ERROR]= ' '.join(str(argument) for argument in error.args)
+  finally:
+    outcome[KEY_SECONDS]= time.time() - started
+    outcome[KEY_OUTPUT]= sys.stdout.stop()
+
+  return outcome
+
+
+# Summarize an account assessment and its order response
+#
+def OrderResult(script, assessment, response):
+  confirmations= []
+  if response != None:
+    confirmations= response.get(KEY_CONFIRMATIONS, [])
+  return {'cash': assessment[script.KEY_CASH], 'notes': len(confirmations), 'invested': sum(confirmation[KEY_INVESTED_AMOUNT] for confirmation in confirmations)}
+
+
+# Invest for one account using a shared listing
+#
+def Invest(options, account, listing):
+  script, taskOptions= TaskOptions(options, account, TASK_INVEST)
+  try:
+    with LCRequest(taskOptions) as request:
+      assessment= script.AssessAccount(taskOptions, request)
+      response= None
+      if len(assessment[script.KEY_SHOPPING_LIST]) > 0 or taskOptions.debug:
+        response= script.BuyNotes(taskOptions, request, assessment, {script.KEY_LISTING: listing})
+        script.Report(taskOptions, response)
+  finally:
+    # close the account's snapshot log and export its metrics
+    script.Shutdown(taskOptions)
+
+  return OrderResult(script, assessment, response)
+
+
+# Withdraw cash for one account
+#
+def Withdraw(options, account):
+  script, taskOptions= TaskOptions(options, account, TASK_WITHDRAW)
+  try:
+    with LCRequest(taskOptions) as request:
+      cash= script.Withdraw(taskOptions, request)
+  finally:
+    script.Shutdown(taskOptions)
+
+  return {'cash': cash}
+
+
+# Report on one account
+#
+def Report(options, account):
+  script, taskOptions= TaskOptions(options, account, TASK_REPORT)
+  try:
+    with LCRequest(taskOptions) as request:
+      summary= script.GetSummary(taskOptions, request)
+      script.GetPerformanceDetails(taskOptions, request)
+  finally:
+    script.Shutdown(taskOptions)
+
+  return {'total': summary[KEY_ACCOUNT_TOTAL], 'cash': summary[KEY_AVAILABLE_CASH], 'notes': summary[KEY_NOTES_COUNT]}
+
+
+# Run all of an account's tasks in order
+#
+def RunAccount(options, account, listing):
+  outcomes= []
+  if TASK_INVEST in account:
+    outcomes.append(RunTask(account, TASK_INVEST, lambda: Invest(options, account, listing)))
+  if TASK_WITHDRAW in account:
+    outcomes.append(RunTask(account, TASK_WITHDRAW, lambda: Withdraw(options, account)))
+  if TASK_REPORT in account:
+    outcomes.append(RunTask(account, TASK_REPORT, lambda: Report(options, account)))
+
+  return outcomes
+
+
+# Fetch the listing once on behalf of all investing accounts
+#
+def FetchListing(options, accounts):
+  for account in accounts:
+    if TASK_INVEST in account:
+      with LCRequest(ListingOptions(options, account)) as request:
+        return request.get_available_notes()
+
+  return []
+
+
+# Run all tasks for all accounts once, sharing one listing fetch
+#
+def RunOnce(options, accounts):
+  with concurrent.futures.ThreadPoolExecutor(max_workers=options.workers + 1) as executor:
+    listing= executor.submit(FetchListing, options, accounts)
+    runs= [executor.submit(RunAccount, options, account, listing) for account in accounts]
+    outcomes= []
+    for run in runs:
+      outcomes.extend(run.result())
+
+  return outcomes
+
+
+# Assess an investing account ahead of a release, keeping its connection warm
+#
+def PrepareInvestment(options, account, sessions):
+  if account[KEY_NAME] not in sessions:
+    script, taskOptions= TaskOptions(options, account, TASK_INVEST)
+    sessions[account[KEY_NAME]]= (script, taskOptions, taskOptions.portfolio, LCRequest(taskOptions))
+
+  script, taskOptions, portfolio, request= sessions[account[KEY_NAME]]
+  taskOptions.portfolio= portfolio
+  assessment= script.AssessAccount(taskOptions, request)
+  request.warm()
+  return assessment
+
+
+# Buy notes for an assessed account from a shared listing
+#
+def CompleteInvestment(account, sessions, assessment, listing):
+  script, taskOptions, portfolio, request= sessions[account[KEY_NAME]]
+  response= None
+  try:
+    if len(assessment[script.KEY_SHOPPING_LIST]) > 0:
+      response= script.SubmitOrder(taskOptions, request, script.ComposeOrder(taskOptions, request, assessment, listing), assessment)
+      script.Report(taskOptions, response)
+  finally:
+    # export each account's metrics for each release window separately
+    taskOptions.metrics.export()
+    taskOptions.metrics.clear()
+
+  return OrderResult(script, assessment, response)
+
+
+# Close the connections, snapshot logs, and metrics of all accounts the daemon kept ready
+#
+def CloseSessions(sessions):
+  for script, taskOptions, portfolio, request in sessions.values():
+    try:
+      request.close()
+    finally:
+      script.Shutdown(taskOptions)
+
+
+# Invest for all accounts at every listing release, sharing one listing poll per release
+#
+def RunDaemon(options, accounts):
+  script= LoadScript(SCRIPTS[TASK_INVEST])
+  investors= [account for account in accounts if TASK_INVEST in account]
+  if len(investors) == 0:
+    raise Exception('No accounts have "{}" arguments for the daemon to use'.format(TASK_INVEST))
+  sessions= {}
+
+  try:
+    with concurrent.futures.ThreadPoolExecutor(max_workers=options.workers) as executor:
+      while True:
+        release= script.NextRelease(options, time.time() + options.leadTime)
+        print('\nWaiting for the listing release at {}'.format(time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(release))))
+        script.SleepUntil(release - options.leadTime)
+
+        # assess all accounts and warm their connections ahead of the release
+        assessments= {}
+        preparations= dict((account[KEY_NAME], executor.submit(RunTask, account, TASK_INVEST, lambda account=account: PrepareInvestment(options, account, sessions))) for account in investors)
+        for account in investors:
+          outcome= preparations[account[KEY_NAME]].result()
+          if outcome[KEY_STATUS] == STATUS_OK:
+            assessments[account[KEY_NAME]]= outcome
+          else:
+            ReportOutcomes(options, [outcome])
+
+        if len(assessments) == 0:
+          continue
+
+        try:
+          # poll for the new listing once on behalf of all accounts, timed in the polling account's metrics
+          poller= sessions[next(iter(assessments))]
+          polling= copy.copy(options)
+          polling.metrics= poller[1].metrics
+          listingRequest= poller[3]
+          knownLoans= set(note[script.KEY_ID] for note in listingRequest.get_available_notes())
+          script.SleepUntil(release)
+          listing, polls= script.PollListing(polling, listingRequest, knownLoans, release)
+        except Exception as error:
+          script.ReportError(error)
+          continue
+        listed= time.time()
+
+        if listing == None:
+          print('\nNo new listing appeared within {:.0f} seconds of the release ({} poll{})'.format(options.pollDuration, polls, script.PluralS(polls)))
+          continue
+
+        purchases= [executor.submit(RunTask, account, TASK_INVEST, lambda account=account: CompleteInvestment(account, sessions, assessments[account[KEY_NAME]][KEY_RESULT], listing)) for account in investors if account[KEY_NAME] in assessments]
+        outcomes= []
+        for purchase in purchases:
+          outcome= purchase.result()
+          outcome[KEY_OUTPUT]= assessments[outcome[KEY_ACCOUNT]][KEY_OUTPUT] + outcome[KEY_OUTPUT]
+          outcomes.append(outcome)
+
+        ReportOutcomes(options, outcomes, release)
+        print('\nRelease at {}: listing after {:.3f}s ({} poll{}), all orders after {:.3f}s'.format(time.strftime('%H:%M:%S', time.localtime(release)), listed - release, polls, script.PluralS(polls), time.time() - release))
+
+  finally:
+    CloseSessions(sessions)
+
+
+# Print the consolidated report and optionally append it to a JSON file
+#
+def ReportOutcomes(options, outcomes, release=None):
+  separator= '{:=>81}'.format('')
+  for outcome in outcomes:
+    print(separator)
+    print('{} -- {} ({}, {:.3f}s)'.format(outcome[KEY_ACCOUNT], outcome[KEY_TASK], outcome[KEY_STATUS], outcome[KEY_SECONDS]))
+    print(separator)
+    sys.stdout.write(outcome[KEY_OUTPUT])
+    if outcome[KEY_STATUS] != STATUS_OK:
+      print('\n*** {}'.format(outcome[KEY_ERROR]))
+    print('')
+
+  print('')
+  print('Summary')
+  print('{:->81}'.format(''))
+  for outcome in outcomes:
+    print('{:<24} {:<9} {:<7} {:8.3f}s  {}'.format(outcome[KEY_ACCOUNT], outcome[KEY_TASK], outcome[KEY_STATUS], outcome[KEY_SECONDS], json.dumps(outcome.get(KEY_RESULT, outcome.get(KEY_ERROR)))))
+
+  if options.output != None:
+    with open(options.output, 'a') as destination:
+      destination.write(json.dumps({KEY_RELEASE: release, KEY_RESULTS: outcomes}) + '\n')
+
+
+# Main entry point
+#
+def main():
+  sys.stdout= ThreadOutput(sys.stdout)
+  HandleTermination()
+
+  try:
+    options= NormalizeArguments(GetArguments())
+    accounts= LoadAccounts(options)
+
+    if options.daemon:
+      RunDaemon(options, accounts)
+    else:
+      ReportOutcomes(options, RunOnce(options, accounts))
+
+  except KeyboardInterrupt:
+    print('\nInterrupted, shutting down')
+
+  except Exception as error:
+    print(type(error))
+    print(error.args[0])
+    for counter in range(1, len(error.args)):
+      print('\t' + str(error.args[counter]))
+
+  else:
+    if options.debug:
+      print('')
+      print('All done!')
+
+
+#
+# Execute if we were run as a program
+#
+
+if __name__ == '__main__':
+  main()
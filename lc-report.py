@@ -6,15 +6,28 @@
 #
 
 import argparse
+import time
+import lcmetrics
+import lcrecord
+import lcrequest
+import lcscript
+import lcstore
 from lcrequest import LCRequest
 
+try:
+  import numpy
+except ImportError:
+  numpy= None
+
 
 #
 # Define some global constants
 #
 
 VERSION= '0.1.0'
-GRADES= map(chr, range(ord('A'), ord('G')+1))
+SCRIPT= 'lc-report'
+GRADES= list(map(chr, range(ord('A'), ord('G')+1)))
+ENGINES= ['python', 'numpy']
 
 # Lending Club API data structure keys
 KEY_COUNT= 'count'
@@ -39,25 +52,36 @@ KEY_NOTE_INTEREST_PAID= 'interestReceived'
 KEY_NOTE_DATE= 'orderDate'
 KEY_NOTE_STATUS= 'loanStatus'
 
+NOTE_FIELDS= [KEY_GRADE, KEY_NOTE_AMOUNT, KEY_NOTE_PRINCIPAL_RETURNED, KEY_NOTE_INTEREST_PAID, KEY_NOTE_PAYMENTS, KEY_NOTE_STATUS]
+NOTE_SUMS= [KEY_NOTE_AMOUNT, KEY_NOTE_PRINCIPAL_RETURNED, KEY_NOTE_INTEREST_PAID, KEY_NOTE_PAYMENTS]
+
 
 
 #
 # Define our functions
 #
 
-# Collect all expected and detected arguments from the command line
+# Collect all expected and detected arguments from the command line (or a given list)
 #
-def GetArguments():
+def GetArguments(arguments=None):
   argumentParser= argparse.ArgumentParser()
 
   argumentParser.add_argument('-t', '--token', '--authorization-token', nargs=1, dest='token', required=True, action='store', help='Lending Club individual API authorization token')
   argumentParser.add_argument('-i', '--id', '--investor-id', nargs=1, dest='id', required=True, action='store', help='Lending Club individual account number')
 
+  argumentParser.add_argument('--store', nargs=1, dest='store', required=False, action='store', help='Local SQLite file for keeping owned notes and their per-grade totals between runs')
+  argumentParser.add_argument('--store-max-age', nargs=1, dest='storeMaxAge', type=float, required=False, action='store', default=[lcstore.MAXIMUM_AGE_SECONDS], help='Seconds a local note store sync stays current before syncing again (orders placed by lc-auto-invest expire it at once)')
+
+  argumentParser.add_argument('--engine', nargs=1, dest='engine', choices=ENGINES, required=False, action='store', default=[ENGINES[0]], help='Aggregate owned notes one at a time (python) or as column arrays (numpy)')
+
+  lcrequest.AddRequestArguments(argumentParser)
+  argumentParser.add_argument('--snapshot-log', nargs=1, dest='snapshotLog', required=False, action='store', help='Keep the account summary and owned notes in this compressed, append-only snapshot log (see lcrecord)')
+
   argumentParser.add_argument('-d', '--debug', dest='debug', required=False, action='store_true', default=False, help='Turn on verbose diagnostics')
 
   argumentParser.add_argument('-v', '--version', action='version', version='%(prog)s '+VERSION)
 
-  return argumentParser.parse_args()
+  return argumentParser.parse_args(arguments)
 
 
 # Validate and normalize some of the obtained arguments and pass the rest along
@@ -67,6 +91,23 @@ def NormalizeArguments(options):
   options.id= str(options.id.pop())
   options.token= str(options.token.pop())
 
+  # convert note store settings
+  if options.store != None:
+    options.store= str(options.store.pop())
+  options.storeMaxAge= float(options.storeMaxAge.pop())
+
+  options.engine= str(options.engine.pop())
+  if options.engine == 'numpy' and numpy == None:
+    raise Exception('The numpy aggregation engine was requested but NumPy is not installed')
+
+  # convert the API request settings shared by all our scripts
+  lcrequest.NormalizeRequestArguments(options, SCRIPT)
+
+  # set up our snapshot log
+  options.recorder= None
+  if options.snapshotLog != None:
+    options.recorder= lcrecord.SnapshotRecorder(str(options.snapshotLog.pop()), [lcrecord.KIND_SUMMARY, lcrecord.KIND_NOTES])
+
   return options
 
 
@@ -74,7 +115,8 @@ def NormalizeArguments(options):
 #
 def GetSummary(options, request):
   # check our account
-  summary= request.get_account_summary()
+  with options.metrics.span(lcmetrics.SPAN_SUMMARY):
+    summary= request.get_account_summary()
 
   print('')
   print('Summary')
@@ -92,13 +134,9 @@ def GetSummary(options, request):
   return summary
 
 
-# Compile detailed performance statistics per grade and report them
+# Compile performance summaries per minor grade and counts per status as notes arrive
 #
-def GetPerformanceDetails(options, request):
-  # check our notes
-  notes= request.get_owned_notes()
-
-  # compile performance summaries
+def CompilePerformance(notes):
   performance= {}
   statusCodes= {}
   for note in notes:
@@ -117,7 +155,62 @@ def GetPerformanceDetails(options, request):
     else:
       statusCodes[note[KEY_NOTE_STATUS]]= 1
 
+  return performance, statusCodes
+
+
+# Compile the same summaries by decoding notes once into column arrays and summing them per group
+#
+# Grades and statuses are coded in order of first appearance, and per group sums accumulate
+# in note order, so results (and the order of statuses) match CompilePerformance exactly.
+#
+def CompilePerformanceColumns(notes):
+  grades= {}
+  statuses= {}
+  columns= numpy.dtype([(KEY_GRADE, numpy.int32), (KEY_NOTE_STATUS, numpy.int32)] + [(key, numpy.float64) for key in NOTE_SUMS])
+  rows= numpy.fromiter(((grades.setdefault(note[KEY_GRADE], len(grades)), statuses.setdefault(note[KEY_NOTE_STATUS], len(statuses)), note[KEY_NOTE_AMOUNT], note[KEY_NOTE_PRINCIPAL_RETURNED], note[KEY_NOTE_INTEREST_PAID], note[KEY_NOTE_PAYMENTS]) for note in notes), dtype=columns)
+
+  counts= numpy.bincount(rows[KEY_GRADE], minlength=len(grades))
+  sums= dict((key, numpy.bincount(rows[KEY_GRADE], weights=rows[key], minlength=len(grades))) for key in NOTE_SUMS)
+  statusCounts= numpy.bincount(rows[KEY_NOTE_STATUS], minlength=len(statuses))
+
+  performance= {}
+  for grade, code in grades.items():
+    performance[grade]= {KEY_COUNT: int(counts[code])}
+    for key in NOTE_SUMS:
+      performance[grade][key]= float(sums[key][code])
+
+  statusCodes= {}
+  for status, code in statuses.items():
+    statusCodes[status]= int(statusCounts[code])
+
+  return performance, statusCodes
 
+
+# Compile detailed performance statistics per grade and report them
+#
+def GetPerformanceDetails(options, request):
+  with options.metrics.span(lcmetrics.SPAN_NOTES):
+    if options.store != None:
+      # read performance summaries precompiled by our local note store
+      with lcstore.NoteStore(options.store, options.id) as store:
+        store.refresh(request, options.storeMaxAge)
+        performance= store.grade_totals()
+        statusCodes= store.status_counts()
+    elif options.engine == 'numpy':
+      # read whole notes, since columns pick their fields directly
+      performance, statusCodes= CompilePerformanceColumns(request.iter_owned_notes())
+    else:
+      performance, statusCodes= CompilePerformance(request.iter_owned_notes(NOTE_FIELDS))
+
+  with options.metrics.span(lcmetrics.SPAN_REPORT):
+    ReportPerformance(performance, statusCodes)
+
+  return performance
+
+
+# Report performance statistics per minor and major grade and note counts per status
+#
+def ReportPerformance(performance, statusCodes):
   # set up accumulators
   count= {}
   invested= {}
@@ -168,10 +261,6 @@ def GetPerformanceDetails(options, request):
     print('{:6d} {}'.format(statusCodes[status], status))
 
 
-
-  return performance
-
-
 # Should there be an 's' at the end?
 #
 def PluralS(number):
@@ -181,24 +270,49 @@ def PluralS(number):
     return 's'
 
 
+# Release what a run set up (profiler, snapshot log, metrics)
+#
+def Shutdown(options):
+  try:
+    try:
+      if options.profiler != None:
+        options.profiler.stop()
+    finally:
+      # queued snapshots are lost unless written here (our writer is a daemon thread)
+      if options.recorder != None:
+        options.recorder.close()
+  finally:
+    # the last export of a daemon run happens here, on interruption
+    options.metrics.export()
+
+
 # Main entry point
 #
 def main():
+  options= None
+  lcscript.HandleTermination()
   try:
     # instantiate our Lending Club API and initialize from command line arguments
+    started= time.perf_counter()
     options= NormalizeArguments(GetArguments())
-    request= LCRequest(options)
+    options.metrics.record(lcmetrics.SPAN_ARGUMENTS, time.perf_counter() - started)
+    if options.profiler != None:
+      options.profiler.start()
 
-    # grab and report current account summary
-    summary= GetSummary(options, request)
+    with LCRequest(options) as request:
+      # grab and report current account summary
+      summary= GetSummary(options, request)
 
-    # compile detailed performance statistics per grade and report them
-    performance= GetPerformanceDetails(options, request)
+      # compile detailed performance statistics per grade and report them
+      performance= GetPerformanceDetails(options, request)
+
+  except KeyboardInterrupt:
+    print('\nInterrupted, shutting down')
 
   except Exception as error:
     print(type(error))
     print(error.args[0])
-    for counter in xrange(1, len(error.args)):
+    for counter in range(1, len(error.args)):
       print('\t' + str(error.args[counter]))
 
   else:
@@ -206,6 +320,11 @@ def main():
       print('')
       print('All done!')
 
+  finally:
+    # stop profiling, write out queued snapshots and export metrics even when interrupted
+    if options != None:
+      Shutdown(options)
+
 
 #
 # Execute if we were run as a program
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+
+
+#
+# Import all necessary libraries
+#
+
+import argparse
+import concurrent.futures
+import itertools
+import json
+import os
+import sys
+import time
+import lcrecord
+from lcscript import LoadScript
+
+
+#
+# Define some global constants
+#
+
+VERSION= '1.0.0'
+TOP= 20
+CHUNK_SIZE= 4
+
+# Ranking measures of a replay (all ranked highest first, except idle cash)
+RANK_TOTAL= 'total'
+RANK_DEPLOYED= 'deployed'
+RANK_RATE= 'rate'
+RANK_NOTES= 'notes'
+RANK_IDLE= 'idle'
+RANKINGS= [RANK_TOTAL, RANK_DEPLOYED, RANK_RATE, RANK_NOTES, RANK_IDLE]
+
+# Result keys
+KEY_INDEX= 'index'
+KEY_ARGUMENTS= 'arguments'
+KEY_FAILURES= 'failures'
+KEY_SECONDS= 'seconds'
+KEY_ERROR= 'error'
+
+# Lending Club API data structure keys
+KEY_ACCOUNT_TOTAL= 'accountTotal'
+
+
+#
+# Define our worker state
+#
+
+# Each worker process decodes the recorded listings once and replays every combination it is
+# handed against that one copy (replays never modify recorded loans)
+#
+_worker= {}
+
+
+# Set up a worker process: load our scripts and decode the listings and starting account
+#
+def InitializeWorker(arguments):
+  backtest= LoadScript('lc-backtest')
+  options= backtest.NormalizeArguments(backtest.GetArguments(arguments))
+
+  with lcrecord.SnapshotReader(options.snapshotLog) as reader:
+    snapshots= list(reader.snapshots(lcrecord.KIND_LISTING, options.start, options.end))
+    listings= [(snapshot.timestamp, snapshot.records()) for snapshot in snapshots]
+    starting= backtest.Account(options, reader, listings[0][0]) if len(listings) > 0 else None
+
+  _worker['backtest']= backtest
+  _worker['script']= LoadScript('lc-auto-invest')
+  _worker['options']= options
+  _worker['listings']= listings
+  _worker['cash']= starting.cash if starting != None else options.cash
+  _worker['notes']= starting.notes if starting != None else []
+
+
+# Replay all listings with one combination of lc-auto-invest arguments
+#
+def Evaluate(index, arguments):
+  backtest= _worker['backtest']
+  script= _worker['script']
+  options= _worker['options']
+  started= time.perf_counter()
+  result= {KEY_INDEX: index, KEY_ARGUMENTS: arguments}
+
+  try:
+    investOptions= script.NormalizeArguments(script.GetArguments(['--token', 'sweep', '--id', '0', '--quiet'] + arguments))
+    request= backtest.ReplayRequest(options, _worker['cash'], _worker['notes'])
+    result[KEY_FAILURES]= backtest.Simulate(options, script, investOptions, request, _worker['listings'])
+
+    deployed= sum(fill[2] for fill in request.fills)
+    result[RANK_TOTAL]= request.get_account_summary()[KEY_ACCOUNT_TOTAL]
+    result[RANK_DEPLOYED]= deployed
+    result[RANK_RATE]= sum(fill[2] * fill[4] for fill in request.fills) / deployed if deployed > 0 else 0
+    result[RANK_NOTES]= len(request.fills)
+    result[RANK_IDLE]= request.idle_cash()
+  except (Exception, SystemExit) as error:
+    result[KEY_ERROR]= ' '.join(str(argument) for argument in error.args)
+
+  result[KEY_SECONDS]= time.perf_counter() - started
+  return result
+
+
+#
+# Define our functions
+#
+
+# Collect all expected and detected arguments from the command line (or a given list)
+#
+def GetArguments(arguments=None):
+  argumentParser= argparse.ArgumentParser(description='Replay recorded listings through lc-auto-invest for every combination of a parameter grid and rank the outcomes', epilog='Arguments after "--" go to lc-auto-invest for every combination (e.g., -- --allocation yield)')
+
+  argumentParser.add_argument('-l', '--snapshot-log', nargs=1, dest='snapshotLog', required=True, action='store', help='Snapshot log of recorded listings (see lc-auto-invest --snapshot-log)')
+  argumentParser.add_argument('--grid', nargs=1, dest='grid', required=False, action='store', help='Parameter grid (JSON) mapping lc-auto-invest options to lists of alternatives, e.g., {"--dti": [30, 40], "--grade": [["A 50", "B 50"], ["A 30", "B 70"]], "--chase-yield": [true, false]}')
+  argumentParser.add_argument('--param', nargs='+', metavar=('OPTION', 'VALUE'), dest='parameters', required=False, action='append', help='Add an lc-auto-invest option (without its leading dashes) and its alternative values to the grid (e.g., --param dti 30 35 40, or --param chase-yield true false for a flag)')
+
+  argumentParser.add_argument('--start', nargs=1, dest='start', required=False, action='store', help='Replay listings recorded from this moment on (e.g., 2026-01-31 or 2026-01-31T06:00)')
+  argumentParser.add_argument('--end', nargs=1, dest='end', required=False, action='store', help='Replay listings recorded until this moment')
+  argumentParser.add_argument('--cash', nargs=1, dest='cash', required=False, action='store', help='Cash the simulated account starts with')
+  argumentParser.add_argument('--from-account', dest='fromAccount', required=False, action='store_true', default=False, help='Start from the latest account summary and owned notes recorded before the first listing instead')
+  argumentParser.add_argument('--fill-rate', nargs=1, dest='fillRate', required=False, action='store', help='Fraction of order items filled in full')
+  argumentParser.add_argument('--order-latency', nargs=1, dest='orderLatency', required=False, action='store', help='Seconds between fetching a listing and an order filling')
+  argumentParser.add_argument('--seed', nargs=1, dest='seed', required=False, action='store', help='Seed for simulated partial fills (the same for every combination)')
+
+  argumentParser.add_argument('-w', '--workers', nargs=1, dest='workers', type=int, required=False, action='store', default=[os.cpu_count() or 1], help='Worker processes replaying combinations in parallel')
+  argumentParser.add_argument('-r', '--rank-by', nargs=1, dest='rankBy', choices=RANKINGS, required=False, action='store', default=[RANK_TOTAL], help='Rank combinations by ending account total, cash deployed, average rate bought, notes bought, or (lowest) average idle cash')
+  argumentParser.add_argument('--top', nargs=1, dest='top', type=int, required=False, action='store', default=[TOP], help='Number of ranked combinations to print (0 prints all)')
+  argumentParser.add_argument('--results', nargs=1, dest='results', required=False, action='store', help='Write every result, ranked, to this JSON lines file')
+
+  argumentParser.add_argument('-v', '--version', action='version', version='%(prog)s '+VERSION)
+
+  argumentParser.add_argument('investArguments', nargs=argparse.REMAINDER, help=argparse.SUPPRESS)
+
+  return argumentParser.parse_args(arguments)
+
+
+# Validate and normalize all of the obtained arguments
+#
+def NormalizeArguments(options):
+  options.snapshotLog= str(options.snapshotLog.pop())
+  options.workers= max(1, int(options.workers.pop()))
+  options.rankBy= str(options.rankBy.pop())
+  options.top= int(options.top.pop())
+  if options.results != None:
+    options.results= str(options.results.pop())
+
+  if len(options.investArguments) > 0 and options.investArguments[0] == '--':
+    options.investArguments= options.investArguments[1:]
+
+  # gather our grid, keeping options in the order given
+  options.grid= LoadGrid(options.grid.pop()) if options.grid != None else {}
+  for parameter in options.parameters or []:
+    if len(parameter) < 2:
+      raise Exception('A grid parameter needs an option and at least one value', ' '.join(parameter))
+    options.grid[OptionName(parameter[0])]= [ParameterValue(value) for value in parameter[1:]]
+  if len(options.grid) == 0:
+    raise Exception('No parameter grid given (use --grid or --param)')
+
+  # replay settings are handed to lc-backtest in every worker
+  options.backtestArguments= ['--snapshot-log', options.snapshotLog]
+  for option, value in [('--start', options.start), ('--end', options.end), ('--cash', options.cash), ('--fill-rate', options.fillRate), ('--order-latency', options.orderLatency), ('--seed', options.seed)]:
+    if value != None:
+      options.backtestArguments.extend([option, str(value.pop())])
+  if options.fromAccount:
+    options.backtestArguments.append('--from-account')
+
+  return options
+
+
+# Read a parameter grid from a JSON file
+#
+def LoadGrid(path):
+  with open(path) as source:
+    grid= json.load(source)
+
+  if not isinstance(grid, dict):
+    raise Exception('A parameter grid must map options to lists of alternatives', path)
+  for option in grid:
+    if not isinstance(grid[option], list) or len(grid[option]) == 0:
+      raise Exception('Grid option "{}" needs a non-empty list of alternatives'.format(option), path)
+
+  return dict((OptionName(option), alternatives) for option, alternatives in grid.items())
+
+
+# Read a value given on our command line as in a grid file (true and false include or omit a flag)
+#
+def ParameterValue(value):
+  if value.lower() in ['true', 'false']:
+    return value.lower() == 'true'
+  return value
+
+
+# Spell an option as lc-auto-invest expects it (e.g., dti becomes --dti)
+#
+def OptionName(option):
+  return option if option.startswith('-') else '--' + option
+
+
+# Turn one alternative of a grid option into command line arguments:
+# true adds the option alone, false (or null) leaves it out, a list repeats the option
+# for each of its entries, and anything else becomes the option's value
+# (values holding several words, e.g., "A 50", become several arguments)
+#
+def OptionArguments(option, alternative):
+  if alternative is True:
+    return [option]
+  if alternative is False or alternative == None:
+    return []
+  if isinstance(alternative, list):
+    return [argument for entry in alternative for argument in OptionArguments(option, entry)]
+  return [option] + str(alternative).split()
+
+
+# Describe one alternative of a grid option for our table
+#
+def Label(alternative):
+  if isinstance(alternative, list):
+    return ','.join(Label(entry) for entry in alternative)
+  if alternative is True:
+    return 'yes'
+  if alternative is False or alternative == None:
+    return 'no'
+  return ''.join(str(alternative).split())
+
+
+# List every combination of the grid as lc-auto-invest arguments along with table labels
+#
+def Combinations(options):
+  combinations= []
+  for alternatives in itertools.product(*options.grid.values()):
+    arguments= list(options.investArguments)
+    for option, alternative in zip(options.grid, alternatives):
+      arguments.extend(OptionArguments(option, alternative))
+    combinations.append((arguments, [Label(alternative) for alternative in alternatives]))
+
+  return combinations
+
+
+# Make sure lc-auto-invest accepts every combination before spending time on any of them
+#
+def Validate(combinations):
+  script= LoadScript('lc-auto-invest')
+  for arguments, labels in combinations:
+    try:
+      script.NormalizeArguments(script.GetArguments(['--token', 'sweep', '--id', '0', '--quiet'] + arguments))
+    except SystemExit:
+      raise Exception('lc-auto-invest rejected a combination of the grid', ' '.join(arguments))
+    except Exception as error:
+      raise Exception('lc-auto-invest rejected a combination of the grid', ' '.join(arguments), *error.args)
+
+
+# Replay every combination across a pool of worker processes
+#
+def Sweep(options, combinations):
+  results= []
+  done= 0
+  with concurrent.futures.ProcessPoolExecutor(max_workers=options.workers, initializer=InitializeWorker, initargs=(options.backtestArguments,)) as executor:
+    indexes= range(len(combinations))
+    for result in executor.map(Evaluate, indexes, [arguments for arguments, labels in combinations], chunksize=CHUNK_SIZE):
+      results.append(result)
+      done+= 1
+      if done % max(1, len(combinations) // 20) == 0 or done == len(combinations):
+        print('\r\tevaluated {:,} of {:,} combinations'.format(done, len(combinations)), end='')
+        sys.stdout.flush()
+  print('')
+
+  return results
+
+
+# Order results best first (failed combinations last)
+#
+def Rank(options, results):
+  ranked= [result for result in results if KEY_ERROR not in result]
+  ranked.sort(key=lambda result: result[options.rankBy], reverse=options.rankBy != RANK_IDLE)
+
+  return ranked + [result for result in results if KEY_ERROR in result]
+
+
+# Print the top of the ranking as a table
+#
+def Report(options, combinations, ranked):
+  widths= [max([len(option)] + [len(labels[column]) for arguments, labels in combinations]) for column, option in enumerate(options.grid)]
+  header= '{:>5}  '.format('rank') + ' '.join('{:>{}}'.format(option, width) for option, width in zip(options.grid, widths))
+  header+= '  {:>12} {:>12} {:>6} {:>7} {:>10} {:>6}'.format('total', 'deployed', 'rate', 'notes', 'idle', 'errors')
+  print('')
+  print(header)
+  print('-' * len(header))
+
+  shown= ranked if options.top <= 0 else ranked[:options.top]
+  for rank, result in enumerate(shown, start=1):
+    labels= combinations[result[KEY_INDEX]][1]
+    line= '{:5d}  '.format(rank) + ' '.join('{:>{}}'.format(label, width) for label, width in zip(labels, widths))
+    if KEY_ERROR in result:
+      line+= '  failed: {}'.format(result[KEY_ERROR])
+    else:
+      line+= '  {:12,.2f} {:12,.2f} {:5.2f}% {:7,} {:10,.2f} {:6,}'.format(result[RANK_TOTAL], result[RANK_DEPLOYED], result[RANK_RATE], result[RANK_NOTES], result[RANK_IDLE], result[KEY_FAILURES])
+    print(line)
+
+
+# Main entry point
+#
+def main():
+  try:
+    options= NormalizeArguments(GetArguments())
+    combinations= Combinations(options)
+    Validate(combinations)
+
+    print('Sweeping {:,} combination{} of {} across {} worker{}'.format(len(combinations), PluralS(len(combinations)), ', '.join(options.grid), options.workers, PluralS(options.workers)))
+    started= time.perf_counter()
+    ranked= Rank(options, Sweep(options, combinations))
+    elapsed= time.perf_counter() - started
+
+    Report(options, combinations, ranked)
+    print('\nEvaluated {:,} combination{} in {:,.1f} seconds'.format(len(ranked), PluralS(len(ranked)), elapsed))
+
+    if options.results != None:
+      with open(options.results, 'w') as destination:
+        for rank, result in enumerate(ranked, start=1):
+          destination.write(json.dumps(dict(result, rank=rank)) + '\n')
+
+  except Exception as error:
+    print(type(error))
+    print(error.args[0])
+    for counter in range(1, len(error.args)):
+      print('\t' + str(error.args[counter]))
+    sys.exit(2)
+
+
+# Should there be an 's' at the end?
+#
+def PluralS(number):
+  if int(number) == 1:
+    return ''
+  else:
+    return 's'
+
+
+#
+# Execute if we were run as a program
+#
+
+if __name__ == '__main__':
+  main()
@@ -6,6 +6,10 @@
 #
 
 import argparse
+import time
+import lcmetrics
+import lcrequest
+import lcscript
 from lcrequest import LCRequest
 from operator import itemgetter
 
@@ -15,6 +19,7 @@ from operator import itemgetter
 #
 
 VERSION= '0.0.3'
+SCRIPT= 'lc-withdraw-funds'
 MINIMUM_WITHDRAWAL_AMOUNT= 100
 MAXIMUM_WITHDRAWAL_AMOUNT= 1000
 
@@ -28,9 +33,9 @@ KEY_TRANSFER_DATE= 'estimatedFundsTransferDate'
 # Define our functions
 #
 
-# Collect all expected and detected arguments from the command line
+# Collect all expected and detected arguments from the command line (or a given list)
 #
-def GetArguments():
+def GetArguments(arguments=None):
   argumentParser= argparse.ArgumentParser()
 
   argumentParser.add_argument('-t', '--token', '--authorization-token', nargs=1, dest='token', required=True, action='store', help='Lending Club individual API authorization token')
@@ -39,7 +44,7 @@ def GetArguments():
   argumentParser.add_argument('--minimum-amount', nargs=1, dest='min', type=int, required=False, action='store', default=[MINIMUM_WITHDRAWAL_AMOUNT], help='Smallest amount to withdraw')
   argumentParser.add_argument('--maximum-amount', nargs=1, dest='max', type=int, required=False, action='store', default=[MAXIMUM_WITHDRAWAL_AMOUNT], help='Largest amount to withdraw')
 
-
+  lcrequest.AddRequestArguments(argumentParser)
 
   argumentParser.add_argument('-n', '--simulation', dest='simulation', required=False, action='store_true', default=False, help='Take no action -- only report decisions')
   argumentParser.add_argument('-q', '--quiet', dest='quiet', required=False, action='store_true', default=False, help='Suppress non-critical messages')
@@ -47,7 +52,7 @@ def GetArguments():
 
   argumentParser.add_argument('-v', '--version', action='version', version='%(prog)s '+VERSION)
 
-  return argumentParser.parse_args()
+  return argumentParser.parse_args(arguments)
 
 
 # Validate and normalize some of the obtained arguments and pass the rest along
@@ -65,6 +70,9 @@ def NormalizeArguments(options):
   options.id= str(options.id.pop())
   options.token= str(options.token.pop())
 
+  # convert the API request settings shared by all our scripts
+  lcrequest.NormalizeRequestArguments(options, SCRIPT)
+
   return options
 
 
@@ -74,7 +82,8 @@ def Withdraw(options, request):
   response= {}
 
   # check our account
-  summary= request.get_account_summary()
+  with options.metrics.span(lcmetrics.SPAN_SUMMARY):
+    summary= request.get_account_summary()
   cash= summary[KEY_AVAILABLE_CASH]
 
   if cash >= options.min:
@@ -93,7 +102,12 @@ def Withdraw(options, request):
     if not options.quiet:
       print(' Withdrawal amount: ${:12,.2f}'.format(amount))
 
-    response= request.submit_withdrawal(amount)
+    if options.simulation:
+      print('\twould have tried to withdraw ${:,.2f} if this was not a simulated run'.format(amount))
+    else:
+      with options.metrics.span(lcmetrics.SPAN_SUBMIT):
+        response= request.submit_withdrawal(amount)
+      options.metrics.count(lcmetrics.COUNTER_WITHDRAWN, response.get(KEY_AMOUNT, 0))
 
     if not options.quiet:
       print('')
@@ -119,16 +133,35 @@ def PluralS(number):
     return 's'
 
 
+# Release what a run set up (profiler, metrics)
+#
+def Shutdown(options):
+  try:
+    if options.profiler != None:
+      options.profiler.stop()
+  finally:
+    options.metrics.export()
+
+
 # Main entry point
 #
 def main():
+  options= None
+  lcscript.HandleTermination()
   try:
     # instantiate our Lending Club API and initialize from command line arguments
+    started= time.perf_counter()
     options= NormalizeArguments(GetArguments())
-    request= LCRequest(options)
+    options.metrics.record(lcmetrics.SPAN_ARGUMENTS, time.perf_counter() - started)
+    if options.profiler != None:
+      options.profiler.start()
 
-    # figure out what we have
-    cash= Withdraw(options, request)
+    with LCRequest(options) as request:
+      # figure out what we have
+      cash= Withdraw(options, request)
+
+  except KeyboardInterrupt:
+    print('\nInterrupted, shutting down')
 
   except Exception as error:
     print(type(error))
@@ -141,6 +174,11 @@ def main():
       print('')
       print('All done!')
 
+  finally:
+    # stop profiling and export metrics even when interrupted
+    if options != None:
+      Shutdown(options)
+
 
 #
 # Execute if we were run as a program
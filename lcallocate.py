@@ -0,0 +1,109 @@
+#
+# Import all necessary libraries
+#
+
+import heapq
+
+
+#
+# Define some global constants
+#
+
+VERSION= '1.0.0'
+
+# Lending Club API data structure keys
+KEY_RATE= 'intRate'
+KEY_LOAN_AMOUNT= 'loanAmount'
+KEY_FUNDED_AMOUNT= 'fundedAmount'
+
+
+#
+# Define our allocation functions
+#
+# Amounts are counted in units of the minimum investment per note.
+#
+
+# Count the units a note can take, given its remaining loan capacity and our per-note cap
+# (a note always takes at least one unit if it has room for one)
+#
+def NoteUnits(note, minimum, maximum):
+  remaining= note[KEY_LOAN_AMOUNT] - note[KEY_FUNDED_AMOUNT]
+  if remaining < minimum:
+    return 0
+  return min(int(remaining // minimum), max(1, int(maximum // minimum)))
+
+
+# Spread units over notes in order: one unit each to as many notes as possible,
+# then one more unit per note in rounds until units or capacity run out
+#
+# Computes the final amounts directly by water-filling the sorted note capacities
+# rather than playing the rounds out one unit at a time.
+#
+def SpreadUnits(notes, units, minimum, maximum):
+  candidates= []
+  for note in notes:
+    if len(candidates) >= units:
+      break
+    capacity= NoteUnits(note, minimum, maximum)
+    if capacity > 0:
+      candidates.append((note, capacity))
+
+  if sum(capacity for note, capacity in candidates) <= units:
+    # every candidate can be filled up
+    return candidates
+
+  # find the level every candidate with enough capacity gets raised to
+  level= 0
+  spent= 0
+  count= len(candidates)
+  for capacity in sorted(capacity for note, capacity in candidates):
+    cost= (capacity - level) * count
+    if spent + cost > units:
+      break
+    spent+= cost
+    level= capacity
+    count-= 1
+
+  level+= (units - spent) // count
+  extra= (units - spent) % count
+
+  # the last, partial round favors notes earlier in order
+  allocations= []
+  for note, capacity in candidates:
+    if capacity > level and extra > 0:
+      allocations.append((note, level + 1))
+      extra-= 1
+    else:
+      allocations.append((note, min(capacity, level)))
+
+  return allocations
+
+
+# Allocate units across grades to maximize total yield, i.e., the interest rate of
+# each unit bought, within the units planned for each grade and the units we can afford
+#
+# Every unit of a note earns the same rate, so taking the highest yielding notes
+# first, each as far as its capacity and its grade allow, is optimal.
+#
+def YieldUnits(buckets, gradeUnits, units, minimum, maximum):
+  heap= []
+  for grade in buckets:
+    for order, note in enumerate(buckets[grade]):
+      heap.append((-note[KEY_RATE], grade, order, note))
+  heapq.heapify(heap)
+
+  allocations= {}
+  remaining= {}
+  for grade in buckets:
+    allocations[grade]= []
+    remaining[grade]= gradeUnits.get(grade, 0)
+
+  while units > 0 and len(heap) > 0:
+    rate, grade, order, note= heapq.heappop(heap)
+    taken= min(NoteUnits(note, minimum, maximum), remaining[grade], units)
+    if taken > 0:
+      allocations[grade].append((note, taken))
+      remaining[grade]-= taken
+      units-= taken
+
+  return allocations
@@ -0,0 +1,201 @@
+#
+# Import all necessary libraries
+#
+
+import copy
+import json
+import os
+import threading
+import time
+
+try:
+  import fcntl
+except ImportError:
+  fcntl= None
+
+
+#
+# Define some global constants
+#
+
+VERSION= '1.0.0'
+
+# Classes of cacheable API responses
+CACHE_SUMMARY= 'summary'
+CACHE_LISTING= 'listing'
+CACHE_NOTES= 'notes'
+CACHE_PORTFOLIOS= 'portfolios'
+
+# Default seconds a response stays fresh (0 never caches it; listings must always be current)
+DEFAULT_TTLS= {
+  CACHE_SUMMARY: 15,
+  CACHE_LISTING: 0,
+  CACHE_NOTES: 0,
+  CACHE_PORTFOLIOS: 3600,
+}
+
+# State keys
+KEY_RESPONSES= 'responses'
+KEY_PORTFOLIOS= 'portfolios'
+
+
+#
+# Define our response cache
+#
+
+# Recent API responses per account and cache class, each fresh for its class's time to live,
+# along with the portfolio IDs seen per account and name (which never expire)
+#
+# The cache is shared by all threads of a process and, through a locked state file, by all
+# processes (e.g., back-to-back runs of our scripts) pointing at the same file.
+#
+class ResponseCache:
+
+  # Constructor
+  def __init__(self, ttls=None, path=None):
+    self.ttls= dict(DEFAULT_TTLS)
+    if ttls != None:
+      for cacheClass in ttls:
+        if cacheClass not in DEFAULT_TTLS:
+          raise Exception('Unknown cache class "{}" (expected one of {})'.format(cacheClass, ', '.join(DEFAULT_TTLS)))
+        if ttls[cacheClass] < 0:
+          raise Exception('The time to live for "{}" must not be negative'.format(cacheClass), ttls[cacheClass])
+        self.ttls[cacheClass]= float(ttls[cacheClass])
+
+    self.path= path
+    if path != None and fcntl == None:
+      raise Exception('Sharing a response cache between processes requires fcntl (POSIX)', path)
+
+    self.lock= threading.Lock()
+    self.state= {KEY_RESPONSES: {}, KEY_PORTFOLIOS: {}}
+
+
+  # Read cache state from our state file, or keep it in memory
+  def _load(self, source):
+    if source == None:
+      return self.state
+
+    source.seek(0)
+    text= source.read()
+    try:
+      state= json.loads(text) if len(text) > 0 else {}
+    except ValueError:
+      # a damaged state file only costs us a few round trips
+      state= {}
+    state.setdefault(KEY_RESPONSES, {})
+    state.setdefault(KEY_PORTFOLIOS, {})
+    return state
+
+
+  def _save(self, source, state):
+    if source == None:
+      self.state= state
+    else:
+      source.seek(0)
+      source.truncate()
+      source.write(json.dumps(state))
+      source.flush()
+
+
+  # Read (and optionally change) our state under both the thread lock and (if shared) the file lock
+  def _update(self, change):
+    with self.lock:
+      source= None
+      if self.path != None:
+        source= open(self.path, 'a+')
+        fcntl.flock(source, fcntl.LOCK_EX)
+
+      try:
+        state= self._load(source)
+        changed, result= change(state)
+        if changed:
+          # expired responses get dropped whenever the state is written
+          now= time.time()
+          responses= state[KEY_RESPONSES]
+          for key in [key for key in responses if now - responses[key][0] >= self.ttls.get(responses[key][1], 0)]:
+            del responses[key]
+          self._save(source, state)
+        return result
+
+      finally:
+        if source != None:
+          fcntl.flock(source, fcntl.LOCK_UN)
+          source.close()
+
+
+  def _key(self, account, cacheClass):
+    return '{} {}'.format(account, cacheClass)
+
+
+  # A fresh response of a class for an account (None if there is none)
+  def get(self, account, cacheClass):
+    if self.ttls.get(cacheClass, 0) <= 0:
+      return None
+
+    def read(state):
+      entry= state[KEY_RESPONSES].get(self._key(account, cacheClass))
+      if entry == None or time.time() - entry[0] >= self.ttls[cacheClass]:
+        return False, None
+      # callers get their own copy, never the cached response itself
+      return False, copy.deepcopy(entry[2])
+
+    return self._update(read)
+
+
+  # Keep a response of a class for an account
+  def put(self, account, cacheClass, result):
+    if self.ttls.get(cacheClass, 0) <= 0:
+      return
+
+    def store(state):
+      state[KEY_RESPONSES][self._key(account, cacheClass)]= (time.time(), cacheClass, copy.deepcopy(result))
+      return True, None
+
+    self._update(store)
+
+
+  # Forget responses of some classes for an account (e.g., after an order changes them)
+  def invalidate(self, account, cacheClasses):
+    def forget(state):
+      changed= False
+      for cacheClass in cacheClasses:
+        changed= state[KEY_RESPONSES].pop(self._key(account, cacheClass), None) != None or changed
+      return changed, None
+
+    self._update(forget)
+
+
+  # The ID of a portfolio by name, if seen before (None if not)
+  def portfolio(self, account, name):
+    def read(state):
+      return False, state[KEY_PORTFOLIOS].get(account, {}).get(name)
+
+    return self._update(read)
+
+
+  # Remember the IDs of portfolios by name
+  def remember(self, account, portfolios):
+    def store(state):
+      known= state[KEY_PORTFOLIOS].setdefault(account, {})
+      changed= any(known.get(name) != portfolioId for name, portfolioId in portfolios.items())
+      known.update(portfolios)
+      return changed, None
+
+    self._update(store)
+
+
+_caches= {}
+_cachesLock= threading.Lock()
+
+
+# Obtain the cache shared by every client in this process with the same settings
+#
+def SharedCache(ttls=None, path=None):
+  if path != None:
+    path= os.path.abspath(path)
+  key= (path, tuple(sorted((ttls or {}).items())))
+
+  with _cachesLock:
+    if key not in _caches:
+      _caches[key]= ResponseCache(ttls, path)
+    return _caches[key]
@@ -0,0 +1,117 @@
+#
+# Import all necessary libraries
+#
+
+import json
+import threading
+
+try:
+  import orjson
+except ImportError:
+  orjson= None
+
+try:
+  import simdjson
+except ImportError:
+  simdjson= None
+
+try:
+  import ujson
+except ImportError:
+  ujson= None
+
+
+#
+# Define some global constants
+#
+
+VERSION= '1.0.0'
+
+# JSON decoding backends
+BACKEND_AUTO= 'auto'
+BACKEND_ORJSON= 'orjson'
+BACKEND_SIMDJSON= 'simdjson'
+BACKEND_UJSON= 'ujson'
+BACKEND_STDLIB= 'json'
+BACKENDS= [BACKEND_AUTO, BACKEND_ORJSON, BACKEND_SIMDJSON, BACKEND_UJSON, BACKEND_STDLIB]
+
+# Backends tried (in order) when none is named; simdjson leads when only one key is wanted,
+# since it can pick that key out without building the rest of the document
+PREFERENCE= [BACKEND_ORJSON, BACKEND_SIMDJSON, BACKEND_UJSON, BACKEND_STDLIB]
+PREFERENCE_KEY_ONLY= [BACKEND_SIMDJSON, BACKEND_ORJSON, BACKEND_UJSON, BACKEND_STDLIB]
+
+MODULES= {BACKEND_ORJSON: orjson, BACKEND_SIMDJSON: simdjson, BACKEND_UJSON: ujson, BACKEND_STDLIB: json}
+
+
+#
+# Define our functions
+#
+
+# Is a backend installed?
+#
+def available(backend):
+  return backend == BACKEND_AUTO or MODULES.get(backend) != None
+
+
+#
+# Define our decoder class
+#
+
+# Decode response bodies (bytes or text) with the fastest backend installed
+#
+# With keyOnly, a body decoded for one top-level key (e.g., the loans of a listing) comes back
+# as a dictionary holding only that key. simdjson parses such bodies on demand and converts only
+# that key's value to Python objects; the other backends decode the whole body and drop the rest.
+#
+class Decoder:
+
+  # Constructor
+  def __init__(self, backend=BACKEND_AUTO, keyOnly=False):
+    if backend == BACKEND_AUTO:
+      backend= [name for name in (PREFERENCE_KEY_ONLY if keyOnly else PREFERENCE) if available(name)][0]
+    elif not available(backend):
+      raise Exception('The {} JSON decoder was requested but it is not installed'.format(backend))
+
+    self.backend= backend
+    self.keyOnly= keyOnly
+    self.parsers= threading.local()
+
+
+  def __repr__(self):
+    return 'Decoder({}{})'.format(self.backend, ', key only' if self.keyOnly else '')
+
+
+  # Decode a whole body, or (with keyOnly) just one of its top-level keys
+  def decode(self, body, key=None):
+    if self.backend == BACKEND_SIMDJSON:
+      document= self._parser().parse(body if isinstance(body, bytes) else body.encode('utf-8'))
+      if key == None or not self.keyOnly or not hasattr(document, 'as_dict'):
+        return self._native(document)
+      return {key: self._native(document[key])} if key in document else {}
+
+    if self.backend == BACKEND_ORJSON:
+      result= orjson.loads(body)
+    elif self.backend == BACKEND_UJSON:
+      result= ujson.loads(body)
+    else:
+      result= json.loads(body)
+
+    if key != None and self.keyOnly and isinstance(result, dict):
+      return {key: result[key]} if key in result else {}
+    return result
+
+
+  # A simdjson parser for this thread (its documents are only valid until it parses again)
+  def _parser(self):
+    if not hasattr(self.parsers, 'parser'):
+      self.parsers.parser= simdjson.Parser()
+    return self.parsers.parser
+
+
+  # Turn a simdjson value into plain Python objects
+  def _native(self, value):
+    if hasattr(value, 'as_dict'):
+      return value.as_dict()
+    if hasattr(value, 'as_list'):
+      return value.as_list()
+    return value
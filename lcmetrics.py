@@ -0,0 +1,321 @@
+#
+# Import all necessary libraries
+#
+
+import contextlib
+import json
+import os
+import threading
+import time
+
+
+#
+# Define some global constants
+#
+
+VERSION= '1.0.0'
+
+# Phases of a run
+SPAN_ARGUMENTS= 'arguments'
+SPAN_SUMMARY= 'summary'
+SPAN_NOTES= 'notes'
+SPAN_PORTFOLIOS= 'portfolios'
+SPAN_LISTING= 'listing'
+SPAN_DECODE= 'decode'
+SPAN_SCREEN= 'screen'
+SPAN_ALLOCATE= 'allocate'
+SPAN_THROTTLE= 'throttle'
+SPAN_SUBMIT= 'submit'
+SPAN_REPORT= 'report'
+
+# Release window phases (seconds from a listing release)
+SPAN_RELEASE_LISTING= 'release_listing'
+SPAN_RELEASE_ORDER= 'release_order'
+
+# Counters
+COUNTER_SCREENED= 'loans_screened'
+COUNTER_ACCEPTED= 'loans_accepted'
+COUNTER_UNITS= 'units_bought'
+COUNTER_CASH= 'cash_deployed'
+COUNTER_WITHDRAWN= 'cash_withdrawn'
+
+# Exported metric names
+PROMETHEUS_PREFIX= 'lc_'
+
+# Upper bounds (seconds) of the transport latency histogram buckets (the last bucket is unbounded)
+LATENCY_BUCKETS= [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+
+# Status recorded for calls that never got a response
+STATUS_ERROR= 'error'
+
+# Seconds between periodic dumps of transport statistics
+STATS_INTERVAL= 60
+
+
+#
+# Define our metrics class
+#
+
+# Timing spans and counters for one run of a script, exportable as JSON lines
+# and as a Prometheus textfile (e.g., for the node exporter's textfile collector)
+#
+class Metrics:
+
+  # Constructor
+  def __init__(self, script, jsonl=None, prometheus=None, profiler=None):
+    self.script= script
+    self.jsonl= jsonl
+    self.prometheus= prometheus
+    self.profiler= profiler
+    self.lock= threading.Lock()
+    self.started= time.time()
+    self.clear()
+
+
+  # Forget all spans and counters (e.g., between daemon releases)
+  def clear(self):
+    with self.lock:
+      self.spans= []
+      self.counters= {}
+      self.recorded= False
+
+
+  # Record a finished span
+  def record(self, name, seconds, started=None):
+    if started == None:
+      started= time.time() - seconds
+    with self.lock:
+      self.spans.append((name, started, seconds))
+      self.recorded= True
+
+
+  # Time a block of code (and trace its allocations if profiling)
+  @contextlib.contextmanager
+  def span(self, name):
+    started= time.time()
+    clock= time.perf_counter()
+    try:
+      if self.profiler == None:
+        yield
+      else:
+        with self.profiler.phase(name):
+          yield
+    finally:
+      self.record(name, time.perf_counter() - clock, started)
+
+
+  # Wrap a function so every call is timed
+  def timed(self, name, function):
+    def call(*arguments, **keywords):
+      with self.span(name):
+        return function(*arguments, **keywords)
+    return call
+
+
+  def count(self, name, amount=1):
+    with self.lock:
+      self.counters[name]= self.counters.get(name, 0) + amount
+      self.recorded= True
+
+
+  # Total seconds and number of spans per phase
+  def totals(self):
+    totals= {}
+    with self.lock:
+      for name, started, seconds in self.spans:
+        total, calls= totals.get(name, (0, 0))
+        totals[name]= (total + seconds, calls + 1)
+    return totals
+
+
+  # Write our spans and counters to whichever destinations were configured, unless nothing was
+  # recorded since the last export or clear (e.g., a daemon stopped right after exporting a release)
+  def export(self):
+    if not self.recorded:
+      return False
+
+    if self.jsonl != None:
+      self.export_jsonl(self.jsonl)
+    if self.prometheus != None:
+      self.export_prometheus(self.prometheus)
+    self.recorded= False
+    return True
+
+
+  # Append one line per span and a closing line with the counters
+  def export_jsonl(self, path):
+    with self.lock:
+      spans= list(self.spans)
+      counters= dict(self.counters)
+
+    with open(path, 'a') as destination:
+      for name, started, seconds in spans:
+        destination.write(json.dumps({'script': self.script, 'span': name, 'started': started, 'seconds': seconds}) + '\n')
+      destination.write(json.dumps({'script': self.script, 'run': self.started, 'exported': time.time(), 'counters': counters}) + '\n')
+
+
+  # Replace a Prometheus textfile (atomically, so a collector never reads half of it)
+  def export_prometheus(self, path):
+    labels= 'script="{}"'.format(self.script)
+    lines= []
+
+    lines.append('# HELP {}phase_seconds Seconds spent in each phase of the last run'.format(PROMETHEUS_PREFIX))
+    lines.append('# TYPE {}phase_seconds gauge'.format(PROMETHEUS_PREFIX))
+    totals= self.totals()
+    for name in sorted(totals):
+      lines.append('{}phase_seconds{{{},phase="{}"}} {:.6f}'.format(PROMETHEUS_PREFIX, labels, name, totals[name][0]))
+
+    lines.append('# HELP {}phase_calls Number of spans of each phase in the last run'.format(PROMETHEUS_PREFIX))
+    lines.append('# TYPE {}phase_calls gauge'.format(PROMETHEUS_PREFIX))
+    for name in sorted(totals):
+      lines.append('{}phase_calls{{{},phase="{}"}} {}'.format(PROMETHEUS_PREFIX, labels, name, totals[name][1]))
+
+    with self.lock:
+      counters= dict(self.counters)
+    for name in sorted(counters):
+      lines.append('# TYPE {}{} gauge'.format(PROMETHEUS_PREFIX, name))
+      lines.append('{}{}{{{}}} {}'.format(PROMETHEUS_PREFIX, name, labels, counters[name]))
+
+    lines.append('# TYPE {}last_run_timestamp_seconds gauge'.format(PROMETHEUS_PREFIX))
+    lines.append('{}last_run_timestamp_seconds{{{}}} {:.3f}'.format(PROMETHEUS_PREFIX, labels, time.time()))
+
+    temporary= '{}.{}.tmp'.format(path, os.getpid())
+    with open(temporary, 'w') as destination:
+      destination.write('\n'.join(lines) + '\n')
+    os.replace(temporary, path)
+
+
+#
+# Define our transport statistics classes
+#
+
+# Per-endpoint statistics of API calls: a latency histogram, response bytes, decode time,
+# status codes, retries and cache hits
+#
+# Latency is split into waiting (until the response headers arrive, i.e., network round
+# trip plus server time) and transfer (reading the body), with decoding kept apart, so we
+# can tell whether time goes to the network, the server or JSON parsing.
+#
+class TransportStats:
+
+  # Constructor
+  def __init__(self):
+    self.lock= threading.Lock()
+    self.started= time.time()
+    self.endpoints= {}
+
+
+  # Find (or start) the statistics of an endpoint; callers must hold our lock
+  def _endpoint(self, endpoint):
+    if endpoint not in self.endpoints:
+      self.endpoints[endpoint]= {
+        'calls': 0,
+        'hits': 0,
+        'statuses': {},
+        'retries': 0,
+        'bytes': 0,
+        'seconds': 0.0,
+        'maximum': 0.0,
+        'waiting': 0.0,
+        'transfer': 0.0,
+        'decodes': 0,
+        'decode': 0.0,
+        'histogram': [0] * (len(LATENCY_BUCKETS) + 1),
+      }
+    return self.endpoints[endpoint]
+
+
+  # Record a finished call (size and waiting may be unknown, e.g., for a streamed body)
+  def record(self, endpoint, status, seconds, waiting=None, retries=0, size=None):
+    bucket= 0
+    while bucket < len(LATENCY_BUCKETS) and seconds > LATENCY_BUCKETS[bucket]:
+      bucket+= 1
+
+    with self.lock:
+      statistics= self._endpoint(endpoint)
+      statistics['calls']+= 1
+      statistics['statuses'][status]= statistics['statuses'].get(status, 0) + 1
+      statistics['retries']+= retries
+      statistics['seconds']+= seconds
+      statistics['maximum']= max(statistics['maximum'], seconds)
+      statistics['histogram'][bucket]+= 1
+      if waiting != None:
+        statistics['waiting']+= waiting
+        statistics['transfer']+= max(0.0, seconds - waiting)
+      if size != None:
+        statistics['bytes']+= size
+
+
+  # Record a call answered from the response cache (without a round trip)
+  def cached(self, endpoint):
+    with self.lock:
+      self._endpoint(endpoint)['hits']+= 1
+
+
+  # Record body bytes read (and the time spent reading them) after a call was recorded
+  def transferred(self, endpoint, size, seconds=0.0):
+    with self.lock:
+      statistics= self._endpoint(endpoint)
+      statistics['bytes']+= size
+      statistics['transfer']+= seconds
+
+
+  # Record the time spent decoding a response body
+  def decoded(self, endpoint, seconds):
+    with self.lock:
+      statistics= self._endpoint(endpoint)
+      statistics['decodes']+= 1
+      statistics['decode']+= seconds
+
+
+  # Copy our statistics, adding the mean latency and the histogram bucket bounds
+  def snapshot(self):
+    with self.lock:
+      endpoints= {}
+      for endpoint, statistics in self.endpoints.items():
+        copy= dict(statistics)
+        copy['statuses']= dict(statistics['statuses'])
+        copy['histogram']= list(statistics['histogram'])
+        copy['mean']= statistics['seconds'] / statistics['calls'] if statistics['calls'] > 0 else 0.0
+        endpoints[endpoint]= copy
+
+    return {'started': self.started, 'time': time.time(), 'buckets': LATENCY_BUCKETS, 'endpoints': endpoints}
+
+
+  # Append a snapshot to a JSON lines file
+  def dump(self, path):
+    with open(path, 'a') as destination:
+      destination.write(json.dumps(self.snapshot()) + '\n')
+
+
+# Dump transport statistics periodically from a background thread (and once more when stopped)
+#
+class StatsDumper:
+
+  # Constructor
+  def __init__(self, stats, path, interval=STATS_INTERVAL):
+    self.stats= stats
+    self.path= path
+    self.interval= interval
+    self.stopped= threading.Event()
+    self.thread= None
+
+
+  def start(self):
+    if self.thread == None and self.interval > 0:
+      self.stopped.clear()
+      self.thread= threading.Thread(target=self._run, name='lc-transport-stats', daemon=True)
+      self.thread.start()
+
+
+  def _run(self):
+    while not self.stopped.wait(self.interval):
+      self.stats.dump(self.path)
+
+
+  def stop(self):
+    if self.thread != None:
+      self.stopped.set()
+      self.thread.join()
+      self.thread= None
+    self.stats.dump(self.path)
@@ -0,0 +1,149 @@
+#
+# Import all necessary libraries
+#
+
+import collections
+import contextlib
+import cProfile
+import lcmetrics
+import os
+import sys
+import threading
+import tracemalloc
+
+
+#
+# Define some global constants
+#
+
+VERSION= '1.0.0'
+
+# Seconds between stack samples
+SAMPLE_INTERVAL= 0.005
+
+# Phases whose memory allocations get traced
+MEMORY_PHASES= [lcmetrics.SPAN_NOTES, lcmetrics.SPAN_SCREEN, lcmetrics.SPAN_ALLOCATE]
+MEMORY_FRAMES= 10
+MEMORY_TOP= 15
+# Phase records kept for the memory report (a daemon traces phases every release, so only the latest are kept)
+MEMORY_RECORDS= 200
+
+# Output file suffixes, appended to the profile prefix
+SUFFIX_STATS= '.prof'
+SUFFIX_STACKS= '.collapsed'
+SUFFIX_MEMORY= '.memory.txt'
+
+
+#
+# Define our profiler
+#
+
+# Profile one run of a script, writing
+#   <prefix>.prof       cProfile statistics of the main thread (for pstats, snakeviz, ...)
+#   <prefix>.collapsed  sampled stacks of all threads, one "frame;frame;... count" line per
+#                       distinct stack (for flamegraph.pl, speedscope, ...)
+#   <prefix>.memory.txt peak allocations and the top allocating lines of each note processing phase
+#
+class Profiler:
+
+  # Constructor
+  def __init__(self, prefix, interval=SAMPLE_INTERVAL):
+    self.prefix= prefix
+    self.interval= interval
+    self.profile= cProfile.Profile()
+    self.stacks= {}
+    self.phases= collections.deque(maxlen=MEMORY_RECORDS)
+    self.traced= 0
+    self.lock= threading.Lock()
+    self.stopped= threading.Event()
+    self.sampler= None
+
+
+  # Start profiling and sampling
+  def start(self):
+    tracemalloc.start(MEMORY_FRAMES)
+    self.stopped.clear()
+    self.sampler= threading.Thread(target=self._sample, name='lc-profile-sampler', daemon=True)
+    self.sampler.start()
+    self.profile.enable()
+
+
+  # Stop profiling and write out everything collected
+  def stop(self):
+    if self.sampler == None:
+      return
+    self.profile.disable()
+    self.stopped.set()
+    self.sampler.join()
+    self.sampler= None
+    tracemalloc.stop()
+
+    self.profile.dump_stats(self.prefix + SUFFIX_STATS)
+    self.write_stacks(self.prefix + SUFFIX_STACKS)
+    self.write_memory(self.prefix + SUFFIX_MEMORY)
+
+
+  # Name a frame after its function and where that function is defined
+  def _frame(self, frame):
+    code= frame.f_code
+    return '{} ({}:{})'.format(code.co_name, os.path.basename(code.co_filename), code.co_firstlineno)
+
+
+  # Tally the current stack of every thread but our own, until stopped
+  def _sample(self):
+    names= {}
+    while not self.stopped.wait(self.interval):
+      for thread in threading.enumerate():
+        names[thread.ident]= thread.name
+
+      for ident, frame in sys._current_frames().items():
+        if ident == threading.get_ident():
+          continue
+        frames= []
+        while frame != None:
+          frames.append(self._frame(frame))
+          frame= frame.f_back
+        frames.append(names.get(ident, str(ident)))
+        stack= ';'.join(reversed(frames))
+        self.stacks[stack]= self.stacks.get(stack, 0) + 1
+
+
+  # Trace the allocations of a phase (tracing is process wide, so concurrent phases blur together)
+  @contextlib.contextmanager
+  def phase(self, name):
+    if name not in MEMORY_PHASES or not tracemalloc.is_tracing():
+      yield
+      return
+
+    before= tracemalloc.take_snapshot()
+    current, peak= tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    try:
+      yield
+    finally:
+      after, peak= tracemalloc.get_traced_memory()
+      top= tracemalloc.take_snapshot().compare_to(before, 'lineno')[:MEMORY_TOP]
+      with self.lock:
+        self.phases.append((name, peak - current, after - current, top))
+        self.traced+= 1
+
+
+  def write_stacks(self, path):
+    with open(path, 'w') as destination:
+      for stack in sorted(self.stacks):
+        destination.write('{} {}\n'.format(stack, self.stacks[stack]))
+
+
+  def write_memory(self, path):
+    with self.lock:
+      phases= list(self.phases)
+      traced= self.traced
+
+    with open(path, 'w') as destination:
+      if traced > len(phases):
+        destination.write('Latest {:,} of {:,} phases traced\n\n'.format(len(phases), traced))
+      for name, peak, retained, top in phases:
+        destination.write('Phase "{}": peak {:,} bytes above its start, {:,} bytes retained\n'.format(name, peak, retained))
+        for statistic in top:
+          destination.write('  {}\n'.format(statistic))
+        destination.write('\n')
@@ -0,0 +1,194 @@
+#
+# Import all necessary libraries
+#
+
+import json
+import os
+import threading
+import time
+
+try:
+  import fcntl
+except ImportError:
+  fcntl= None
+
+
+#
+# Define some global constants
+#
+
+VERSION= '1.0.0'
+
+# Endpoint classes with their own limits
+LIMIT_LISTING= 'listing'
+LIMIT_ACCOUNT= 'account'
+LIMIT_ORDERS= 'orders'
+
+# Default sustained rates (requests per second) and bursts per endpoint class
+DEFAULT_LIMITS= {
+  LIMIT_LISTING: (4.0, 4),
+  LIMIT_ACCOUNT: (2.0, 4),
+  LIMIT_ORDERS: (1.0, 2),
+}
+
+# Endpoint classes limited per account rather than per API client (each account has its own bucket)
+PER_ACCOUNT= [LIMIT_ORDERS]
+
+# Adapting to throttling: cut the rate on 429/503 responses, then recover it gradually
+THROTTLED_STATUS_CODES= [429, 503]
+RATE_DECREASE= 0.5
+RATE_INCREASE= 0.05
+RATE_FLOOR= 0.1
+
+
+#
+# Define our rate limiter
+#
+
+# Token buckets per endpoint class (and per account for PER_ACCOUNT classes), shared by all
+# threads of a process and, through a locked state file, by all processes pointing at the same file
+#
+class RateLimiter:
+
+  # Constructor
+  def __init__(self, limits=None, path=None):
+    self.limits= dict(DEFAULT_LIMITS)
+    if limits != None:
+      for endpointClass in limits:
+        if endpointClass not in DEFAULT_LIMITS:
+          raise Exception('Unknown endpoint class "{}" (expected one of {})'.format(endpointClass, ', '.join(DEFAULT_LIMITS)))
+        rate, burst= limits[endpointClass]
+        if rate <= 0:
+          raise Exception('The rate limit for "{}" must be positive'.format(endpointClass), rate)
+        self.limits[endpointClass]= (float(rate), max(1, int(burst)))
+
+    self.path= path
+    if path != None and fcntl == None:
+      raise Exception('Sharing rate limits between processes requires fcntl (POSIX)', path)
+
+    self.lock= threading.Lock()
+    self.buckets= {}
+
+
+  # Read bucket state from our state file, or keep it in memory
+  def _load(self, source):
+    if source == None:
+      return self.buckets
+
+    source.seek(0)
+    text= source.read()
+    if len(text) == 0:
+      return {}
+    try:
+      return json.loads(text)
+    except ValueError:
+      # a damaged state file only costs us the current bucket levels
+      return {}
+
+
+  def _save(self, source, buckets):
+    if source == None:
+      self.buckets= buckets
+    else:
+      source.seek(0)
+      source.truncate()
+      source.write(json.dumps(buckets))
+      source.flush()
+
+
+  # The bucket of an endpoint class for an account
+  def _bucket(self, endpointClass, account):
+    if endpointClass in PER_ACCOUNT and account != None:
+      return '{} {}'.format(endpointClass, account)
+    return endpointClass
+
+
+  # Update one bucket under both the thread lock and (if shared) the file lock
+  def _update(self, endpointClass, change, account=None):
+    with self.lock:
+      source= None
+      if self.path != None:
+        source= open(self.path, 'a+')
+        fcntl.flock(source, fcntl.LOCK_EX)
+
+      try:
+        buckets= self._load(source)
+        rate, burst= self.limits.get(endpointClass, self.limits[LIMIT_ACCOUNT])
+        now= time.time()
+        bucket= self._bucket(endpointClass, account)
+        tokens, updated, current= buckets.get(bucket, (burst, now, rate))
+
+        # refill at the current (possibly reduced) rate
+        tokens= min(burst, tokens + max(0, now - updated) * current)
+        tokens, current, result= change(tokens, current, rate)
+        buckets[bucket]= (tokens, now, current)
+
+        self._save(source, buckets)
+        return result
+
+      finally:
+        if source != None:
+          fcntl.flock(source, fcntl.LOCK_UN)
+          source.close()
+
+
+  # Take a token and return how long to wait before using it
+  def reserve(self, endpointClass, account=None):
+    def take(tokens, current, rate):
+      tokens-= 1
+      return tokens, current, max(0, -tokens / current)
+
+    return self._update(endpointClass, take, account)
+
+
+  # Wait for a token
+  def acquire(self, endpointClass, account=None):
+    delay= self.reserve(endpointClass, account)
+    if delay > 0:
+      time.sleep(delay)
+    return delay
+
+
+  # Adapt the rate to the outcome of a request
+  def observe(self, endpointClass, throttled, account=None):
+    def adapt(tokens, current, rate):
+      if throttled:
+        current= max(rate * RATE_FLOOR, current * RATE_DECREASE)
+      else:
+        current= min(rate, current + rate * RATE_INCREASE)
+      return tokens, current, current
+
+    return self._update(endpointClass, adapt, account)
+
+
+  # Tokens an endpoint class has right away (negative while requests wait for them)
+  def tokens(self, endpointClass, account=None):
+    def read(tokens, current, rate):
+      return tokens, current, tokens
+
+    return self._update(endpointClass, read, account)
+
+
+  # Current (possibly reduced) rate of an endpoint class
+  def rate(self, endpointClass, account=None):
+    def read(tokens, current, rate):
+      return tokens, current, current
+
+    return self._update(endpointClass, read, account)
+
+
+_limiters= {}
+_limitersLock= threading.Lock()
+
+
+# Obtain the limiter shared by every client in this process with the same settings
+#
+def SharedLimiter(limits=None, path=None):
+  if path != None:
+    path= os.path.abspath(path)
+  key= (path, tuple(sorted((limits or {}).items())))
+
+  with _limitersLock:
+    if key not in _limiters:
+      _limiters[key]= RateLimiter(limits, path)
+    return _limiters[key]
@@ -0,0 +1,326 @@
+#
+# Import all necessary libraries
+#
+
+import bisect
+import hashlib
+import json
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+
+try:
+  import fcntl
+except ImportError:
+  fcntl= None
+
+
+#
+# Define some global constants
+#
+
+VERSION= '1.0.0'
+
+# Kinds of snapshots
+KIND_LISTING= 'listing'
+KIND_SUMMARY= 'summary'
+KIND_NOTES= 'notes'
+KIND_CODES= {KIND_LISTING: 1, KIND_SUMMARY: 2, KIND_NOTES: 3}
+KIND_NAMES= dict((code, kind) for kind, code in KIND_CODES.items())
+
+# Each snapshot in the log is a header (magic, kind, timestamp, payload length) followed by its
+# compressed payload; the index holds one fixed size entry (timestamp, offset, kind) per snapshot
+MAGIC= b'LCS1'
+HEADER= struct.Struct('<4sBdI')
+INDEX= struct.Struct('<dQB')
+INDEX_SUFFIX= '.idx'
+COMPRESSION_LEVEL= 6
+
+# Payload keys
+KEY_FIELDS= 'fields'
+KEY_COLUMNS= 'columns'
+KEY_ROWS= 'rows'
+
+
+#
+# Define our snapshot log classes
+#
+
+# Records (e.g., loans or notes) gathered column by column, one record at a time
+#
+# Each field becomes one list of values, which compresses far better than repeating every
+# key in every record. Fields missing from a record are stored (and read back) as None.
+#
+class Columns:
+
+  # Constructor
+  def __init__(self, records=()):
+    self.fields= {}
+    self.columns= []
+    self.rows= 0
+    for record in records:
+      self.add(record)
+
+
+  def add(self, record):
+    for field in record:
+      if field not in self.fields:
+        self.fields[field]= len(self.columns)
+        self.columns.append([None] * self.rows)
+
+    for field, column in zip(self.fields, self.columns):
+      column.append(record.get(field))
+    self.rows+= 1
+
+
+  # Compress our columns into a snapshot payload
+  def encode(self):
+    payload= {KEY_FIELDS: list(self.fields), KEY_COLUMNS: self.columns, KEY_ROWS: self.rows}
+    return zlib.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'), COMPRESSION_LEVEL)
+
+
+# One snapshot in a log, decoded only when asked for
+#
+class Snapshot:
+
+  # Constructor
+  def __init__(self, log, kind, timestamp, offset, length):
+    self.log= log
+    self.kind= kind
+    self.timestamp= timestamp
+    self.offset= offset
+    self.length= length
+
+
+  def __repr__(self):
+    return 'Snapshot({}, {})'.format(self.kind, time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.timestamp)))
+
+
+  # Decompress and decode our payload, straight from the mapped log
+  def _payload(self):
+    start= self.offset + HEADER.size
+    return json.loads(zlib.decompress(self.log[start:start + self.length]))
+
+
+  # Our records as columns, i.e., a dictionary of value lists by field
+  def columns(self):
+    payload= self._payload()
+    return dict(zip(payload[KEY_FIELDS], payload[KEY_COLUMNS]))
+
+
+  # Our records as a list of dictionaries, as the API returned them
+  def records(self):
+    payload= self._payload()
+    fields= payload[KEY_FIELDS]
+    return [dict(zip(fields, values)) for values in zip(*payload[KEY_COLUMNS])] if len(fields) > 0 else [{} for row in range(payload[KEY_ROWS])]
+
+
+# Append snapshots to a log and its timestamp index
+#
+# Snapshots are encoded and written by a background thread, so recording stays off the
+# path to an order, and a snapshot identical to the last one of its kind (e.g., a listing
+# polled again before anything changed) is skipped. Appends are locked, so several threads (and processes, where file
+# locks are available) can share a log; a snapshot is indexed only once it is completely written.
+#
+class SnapshotRecorder:
+
+  # Constructor
+  def __init__(self, path, kinds=None):
+    self.path= path
+    self.kinds= set(kinds) if kinds != None else set(KIND_CODES)
+    for kind in self.kinds:
+      if kind not in KIND_CODES:
+        raise Exception('Unknown snapshot kind "{}" (expected one of {})'.format(kind, ', '.join(KIND_CODES)))
+    self.lock= threading.Lock()
+    self.queue= queue.Queue()
+    self.writer= None
+    self.digests= {}
+
+
+  # Should we keep snapshots of this kind?
+  def wants(self, kind):
+    return kind in self.kinds
+
+
+  # Queue a snapshot of records (or of a single record, e.g., a summary) for writing
+  def record(self, kind, records, timestamp=None):
+    if not self.wants(kind):
+      return
+    if isinstance(records, dict):
+      records= [records]
+    if timestamp == None:
+      timestamp= time.time()
+
+    with self.lock:
+      if self.writer == None:
+        self.writer= threading.Thread(target=self._write, name='lc-snapshot-writer', daemon=True)
+        self.writer.start()
+    self.queue.put((kind, records, timestamp))
+
+
+  # Write queued snapshots until told to stop
+  def _write(self):
+    while True:
+      item= self.queue.get()
+      try:
+        if item == None:
+          return
+        kind, records, timestamp= item
+        try:
+          self.write(kind, records if isinstance(records, Columns) else Columns(records), timestamp)
+        except Exception as error:
+          # losing a snapshot must neither stop the run that produced it nor our writer
+          # (which would leave flush and close waiting forever)
+          print('\n*** Could not record a {} snapshot in {} ({}: {})'.format(kind, self.path, type(error).__name__, error))
+      finally:
+        self.queue.task_done()
+
+
+  # Wait for all queued snapshots to be written
+  def flush(self):
+    self.queue.join()
+
+
+  # Write all queued snapshots and stop our writer
+  def close(self):
+    with self.lock:
+      writer= self.writer
+      self.writer= None
+    if writer != None:
+      self.queue.put(None)
+      writer.join()
+
+
+  # Append a snapshot of gathered columns
+  def write(self, kind, columns, timestamp=None):
+    if timestamp == None:
+      timestamp= time.time()
+    payload= columns.encode()
+
+    digest= hashlib.sha1(payload).digest()
+    if self.digests.get(kind) == digest:
+      return
+    self.digests[kind]= digest
+
+    with self.lock:
+      with open(self.path, 'ab') as log, open(self.path + INDEX_SUFFIX, 'ab') as index:
+        if fcntl != None:
+          fcntl.flock(log.fileno(), fcntl.LOCK_EX)
+        try:
+          offset= log.seek(0, os.SEEK_END)
+          log.write(HEADER.pack(MAGIC, KIND_CODES[kind], timestamp, len(payload)))
+          log.write(payload)
+          log.flush()
+          index.write(INDEX.pack(timestamp, offset, KIND_CODES[kind]))
+          index.flush()
+        finally:
+          if fcntl != None:
+            fcntl.flock(log.fileno(), fcntl.LOCK_UN)
+
+
+# Read snapshots lazily from a memory mapped log
+#
+# Only the index is loaded up front (or rebuilt from the snapshot headers if it is missing or
+# behind the log); payloads are decompressed one snapshot at a time as they are asked for.
+#
+class SnapshotReader:
+
+  # Constructor
+  def __init__(self, path):
+    self.path= path
+    self.file= open(path, 'rb')
+    size= os.fstat(self.file.fileno()).st_size
+    self.log= mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size > 0 else b''
+    self.entries= self._index(size)
+    self.timestamps= [entry[0] for entry in self.entries]
+
+
+  # Support use as a context manager
+  def __enter__(self):
+    return self
+
+
+  def __exit__(self, type, value, traceback):
+    self.close()
+    return False
+
+
+  def close(self):
+    if isinstance(self.log, mmap.mmap):
+      self.log.close()
+    self.file.close()
+
+
+  def __len__(self):
+    return len(self.entries)
+
+
+  def __iter__(self):
+    return self.snapshots()
+
+
+  # Load the index, sorted by timestamp, falling back on a scan of the log
+  def _index(self, size):
+    entries= []
+    try:
+      with open(self.path + INDEX_SUFFIX, 'rb') as source:
+        data= source.read()
+      for timestamp, offset, kind in INDEX.iter_unpack(data[:len(data) - len(data) % INDEX.size]):
+        entries.append((timestamp, offset, kind))
+    except FileNotFoundError:
+      pass
+
+    # a log written past its index (e.g., interrupted between the two) gets scanned
+    end= 0
+    if len(entries) > 0:
+      last= max(entry[1] for entry in entries)
+      end= last + HEADER.size + self._header(last)[3] if last + HEADER.size <= size else None
+    if end != size:
+      entries= self._scan(size)
+
+    entries.sort()
+    return entries
+
+
+  def _header(self, offset):
+    header= HEADER.unpack_from(self.log, offset)
+    if header[0] != MAGIC:
+      raise Exception('Corrupt snapshot log "{}" (no snapshot at offset {})'.format(self.path, offset))
+    return header
+
+
+  # Walk the snapshot headers of the whole log, ignoring a partly written last snapshot
+  def _scan(self, size):
+    entries= []
+    offset= 0
+    while offset + HEADER.size <= size:
+      magic, kind, timestamp, length= self._header(offset)
+      if offset + HEADER.size + length > size:
+        break
+      entries.append((timestamp, offset, kind))
+      offset+= HEADER.size + length
+    return entries
+
+
+  # Iterate over snapshots (optionally of one kind) taken within a time range
+  def snapshots(self, kind=None, start=None, end=None):
+    first= 0 if start == None else bisect.bisect_left(self.timestamps, start)
+    last= len(self.entries) if end == None else bisect.bisect_right(self.timestamps, end)
+    code= None if kind == None else KIND_CODES[kind]
+
+    for timestamp, offset, entryKind in self.entries[first:last]:
+      if code == None or entryKind == code:
+        yield Snapshot(self.log, KIND_NAMES[entryKind], timestamp, offset, self._header(offset)[3])
+
+
+  # Find the latest snapshot of a kind taken at or before a moment
+  def at(self, kind, moment):
+    for index in range(bisect.bisect_right(self.timestamps, moment) - 1, -1, -1):
+      timestamp, offset, entryKind= self.entries[index]
+      if entryKind == KIND_CODES[kind]:
+        return Snapshot(self.log, kind, timestamp, offset, self._header(offset)[3])
+    return None
@@ -2,7 +2,24 @@
 # Import all necessary libraries
 #
 
+import asyncio
+import codecs
+import json
+import lccache
+import lcjson
+import lcmetrics
+import lcprofile
+import lcratelimit
+import lcrecord
 import requests
+import time
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+  import aiohttp
+except ImportError:
+  aiohttp= None
 
 
 #
@@ -40,11 +57,148 @@ KEY_AMOUNT= 'amount'
 # API request result codes
 STATUS_CODE_OK= 200
 
+# API call details to include in debug errors
+DETAILS_ERRORS= 'errors'
+DETAILS_BODY= 'body'
+
+# Transport defaults
+CONNECT_TIMEOUT= 3.05
+READ_TIMEOUT= 30
+RETRY_TOTAL= 3
+RETRY_BACKOFF= 0.25
+RETRY_STATUS_CODES= [429, 500, 502, 503, 504]
+POOL_CONNECTIONS= 2
+POOL_SIZE= 10
+STREAM_CHUNK_SIZE= 65536
+
 
 #
-# Define our Lending Club API class
+# Define a streaming JSON reader
+#
+
+# Incrementally decode the elements of an array stored under a top-level key,
+# reading the response body one chunk at a time
+#
+class JSONArrayStream:
+
+  # Constructor
+  def __init__(self, chunks):
+    self.chunks= iter(chunks)
+    self.decoder= json.JSONDecoder()
+    self.text= codecs.getincrementaldecoder('utf-8')()
+    self.buffer= ''
+    self.position= 0
+    self.exhausted= False
+    self.reading= 0.0
+
+
+  # Append the next chunk to our buffer, dropping what has been consumed
+  def _read(self):
+    if self.exhausted:
+      return False
+
+    # time spent waiting for chunks, so it can be told apart from decoding
+    clock= time.perf_counter()
+    try:
+      chunk= next(self.chunks)
+    except StopIteration:
+      self.exhausted= True
+      chunk= b''
+    self.reading+= time.perf_counter() - clock
+
+    self.buffer= self.buffer[self.position:] + self.text.decode(chunk, final=self.exhausted)
+    self.position= 0
+    return True
+
+
+  # Skip whitespace and return the next significant character
+  def _peek(self):
+    while True:
+      while self.position < len(self.buffer) and self.buffer[self.position] in ' \t\r\n':
+        self.position+= 1
+      if self.position < len(self.buffer):
+        return self.buffer[self.position]
+      if not self._read():
+        raise ValueError('Unexpected end of JSON stream')
+
+
+  # Consume an expected character
+  def _expect(self, characters):
+    character= self._peek()
+    if character not in characters:
+      raise ValueError('Expected one of "{}" but found "{}" in JSON stream'.format(characters, character))
+    self.position+= 1
+    return character
+
+
+  # Decode the next complete value, reading more chunks as needed
+  def _value(self):
+    self._peek()
+    while True:
+      try:
+        value, end= self.decoder.raw_decode(self.buffer, self.position)
+        if self.exhausted or (end < len(self.buffer) and self.buffer[end] in ' \t\r\n,]}'):
+          # a value not followed by a delimiter (e.g., a number) might continue in the next chunk
+          self.position= end
+          return value
+      except ValueError:
+        if self.exhausted:
+          raise
+      self._read()
+
+
+  # Yield the elements of the array under a top-level key
+  def iterate(self, key):
+    self._expect('{')
+    if self._peek() != '}':
+      while True:
+        name= self._value()
+        self._expect(':')
+        if name == key:
+          self._expect('[')
+          if self._peek() == ']':
+            return
+          while True:
+            yield self._value()
+            if self._expect(',]') == ']':
+              return
+        else:
+          self._value()
+        if self._expect(',}') == '}':
+          break
+
+    raise KeyError(key)
+
+
+#
+# Define our Lending Club API classes
+#
+
+# Everything needed to issue one API call and interpret its result
+#
+class APICall:
+
+  # Constructor
+  def __init__(self, method, endpoint, url, description, payload=None, key=None, empty=None, details=None, limit=lcratelimit.LIMIT_ACCOUNT, record=None, cache=None, invalidates=(), throttled=False):
+    self.method= method
+    self.endpoint= endpoint
+    self.limit= limit
+    # (a throttled call already waited for the rate limit token of its first attempt)
+    self.throttled= throttled
+    self.record= record
+    self.cache= cache
+    self.invalidates= invalidates
+    self.url= url
+    self.description= description
+    self.payload= payload
+    self.key= key
+    self.empty= empty
+    self.details= details
+
+
+# Request building and error handling shared by the synchronous and asynchronous clients
 #
-class LCRequest:
+class LCRequestBase:
 
   # Constructor
   def __init__(self, arguments):
@@ -52,112 +206,635 @@ class LCRequest:
     self.id= arguments.id
     self.debug= arguments.debug
 
+    # the API root may point elsewhere, e.g., at a local stand-in server
+    self.requestRoot= getattr(arguments, 'root', None) or REQUEST_ROOT
     self.requestHeader= {REQUEST_HEADER: self.token}
-    self.requestLoans= REQUEST_ROOT + REQUEST_LOANS
-    self.requestAccounts= REQUEST_ROOT + REQUEST_ACCOUNTS.format(self.id)
+    self.requestLoans= self.requestRoot + REQUEST_LOANS
+    self.requestAccounts= self.requestRoot + REQUEST_ACCOUNTS.format(self.id)
 
+    # transport settings (optional arguments fall back to defaults)
+    self.connectTimeout= getattr(arguments, 'connectTimeout', CONNECT_TIMEOUT)
+    self.readTimeout= getattr(arguments, 'readTimeout', READ_TIMEOUT)
+    self.retries= getattr(arguments, 'retries', RETRY_TOTAL)
+    self.backoff= getattr(arguments, 'backoff', RETRY_BACKOFF)
 
-  # Obtain available cash amount
-  def get_account_summary(self):
-    request= self.requestAccounts + REQUEST_SUMMARY
-    result= requests.get(request, headers=self.requestHeader)
+    # request rates are limited per endpoint class (orders per account) across all clients in this
+    # process (and across processes sharing a rate limit file) unless turned off
+    self.limiter= None
+    if getattr(arguments, 'rateLimit', True):
+      self.limiter= lcratelimit.SharedLimiter(getattr(arguments, 'rateLimits', None), getattr(arguments, 'rateLimitFile', None))
 
-    if result.status_code == STATUS_CODE_OK:
-      return result.json()
-    else:
-      if self.debug:
-        raise Exception('Could not obtain account summary (status code {})'.format(result.status_code), self, request, self.requestHeader)
-      else:
-        raise Exception('Could not obtain account summary (status code {})'.format(result.status_code))
+    # timing spans of the calling script, if it keeps any
+    self.metrics= getattr(arguments, 'metrics', None)
 
+    # snapshot log of the calling script, if it keeps one
+    self.recorder= getattr(arguments, 'recorder', None)
 
-  # Obtain all available notes ("In Funding")
-  def get_available_notes(self):
-    request= self.requestLoans
-    result= requests.get(request, headers=self.requestHeader)
+    # recent responses and portfolio IDs, shared with other clients (and processes, through a cache file) unless turned off
+    self.cache= None
+    if getattr(arguments, 'cache', True):
+      self.cache= lccache.SharedCache(getattr(arguments, 'cacheTTLs', None), getattr(arguments, 'cacheFile', None))
 
-    if result.status_code == STATUS_CODE_OK:
-      if KEY_LOANS in result.json():
-        return result.json()[KEY_LOANS]
-      else:
+    # response bodies are decoded once each, by the fastest JSON backend installed unless one is named
+    self.decoder= lcjson.Decoder(getattr(arguments, 'jsonDecoder', lcjson.BACKEND_AUTO), getattr(arguments, 'decodeKeyOnly', False))
+
+    # per-endpoint transport statistics, optionally dumped periodically while open
+    self.transportStats= lcmetrics.TransportStats()
+    self.statsDumper= None
+    if getattr(arguments, 'statsFile', None) != None:
+      self.statsDumper= lcmetrics.StatsDumper(self.transportStats, arguments.statsFile, getattr(arguments, 'statsInterval', lcmetrics.STATS_INTERVAL))
+
+
+  # Per-endpoint transport statistics of the calls issued so far
+  def stats(self):
+    return self.transportStats.snapshot()
+
+
+  # Describe each API call
+  def _summary_call(self):
+    return APICall('GET', REQUEST_SUMMARY, self.requestAccounts + REQUEST_SUMMARY, 'Could not obtain account summary', record=lcrecord.KIND_SUMMARY, cache=lccache.CACHE_SUMMARY)
+
+
+  def _loans_call(self):
+    return APICall('GET', REQUEST_LOANS, self.requestLoans, 'Could not obtain a list of available loans', key=KEY_LOANS, empty='Received an empty response for available loans', limit=lcratelimit.LIMIT_LISTING, record=lcrecord.KIND_LISTING, cache=lccache.CACHE_LISTING)
+
+
+  def _notes_call(self):
+    return APICall('GET', REQUEST_NOTES, self.requestAccounts + REQUEST_NOTES, 'Could not obtain a list of owned notes', key=KEY_NOTES, record=lcrecord.KIND_NOTES, cache=lccache.CACHE_NOTES)
+
+
+  def _portfolios_call(self):
+    return APICall('GET', REQUEST_PORTFOLIOS, self.requestAccounts + REQUEST_PORTFOLIOS, 'Could not obtain a list of owned portfolios', key=KEY_PORTFOLIOS, cache=lccache.CACHE_PORTFOLIOS)
+
+
+  def _create_portfolio_call(self, name, description):
+    payload= {KEY_AID:self.id, KEY_PORTFOLIO_NAME:name, KEY_PORTFOLIO_DESCRIPTION:description}
+    return APICall('POST', REQUEST_PORTFOLIOS, self.requestAccounts + REQUEST_PORTFOLIOS, 'Could not create the portfolio named "{}" with description "{}"'.format(name, description), payload=payload, details=DETAILS_ERRORS, limit=lcratelimit.LIMIT_ORDERS, invalidates=[lccache.CACHE_PORTFOLIOS])
+
+
+  def _order_call(self, notes, throttled=False):
+    payload= {KEY_AID:self.id, KEY_ORDERS:notes}
+    return APICall('POST', REQUEST_ORDERS, self.requestAccounts + REQUEST_ORDERS, 'Order failed', payload=payload, details=DETAILS_BODY, limit=lcratelimit.LIMIT_ORDERS, invalidates=[lccache.CACHE_SUMMARY, lccache.CACHE_NOTES], throttled=throttled)
+
+
+  def _withdrawal_call(self, amount):
+    payload= {KEY_AID:self.id, KEY_AMOUNT:amount}
+    return APICall('POST', REQUEST_WITHDRAWAL, self.requestAccounts + REQUEST_WITHDRAWAL, 'Order failed', payload=payload, details=DETAILS_BODY, limit=lcratelimit.LIMIT_ORDERS, invalidates=[lccache.CACHE_SUMMARY])
+
+
+  # Take a rate limit token for an API call, returning how long to wait before issuing it
+  def _reserve(self, call):
+    if self.limiter == None:
+      return 0
+    return self.limiter.reserve(call.limit, self.id)
+
+
+  # Take an order rate limit token ahead of a throttled order, returning how long to wait before submitting it
+  def _reserve_order(self):
+    if self.limiter == None:
+      return 0
+    return self.limiter.reserve(lcratelimit.LIMIT_ORDERS, self.id)
+
+
+  # Number of orders the rate limit lets this account submit right away (None if unlimited)
+  def order_capacity(self):
+    if self.limiter == None:
+      return None
+    return max(0, int(self.limiter.tokens(lcratelimit.LIMIT_ORDERS, self.id)))
+
+
+  # Adapt the rate limit to the statuses an API call met (including any retried attempts)
+  def _observe(self, call, statuses):
+    if self.limiter != None:
+      self.limiter.observe(call.limit, any(status in lcratelimit.THROTTLED_STATUS_CODES for status in statuses), self.id)
+
+
+  # Decode a response body, timing it per endpoint (and as a span if we keep metrics)
+  def _decode(self, call, decode):
+    started= time.time()
+    clock= time.perf_counter()
+    try:
+      return decode()
+    finally:
+      seconds= time.perf_counter() - clock
+      self.transportStats.decoded(call.endpoint, seconds)
+      if self.metrics != None:
+        self.metrics.record(lcmetrics.SPAN_DECODE, seconds, started)
+
+
+  # A fresh cached result of an API call (None if there is none)
+  def _cached(self, call):
+    if self.cache == None or call.cache == None:
+      return None
+    result= self.cache.get(self.requestAccounts, call.cache)
+    if result != None:
+      self.transportStats.cached(call.endpoint)
+    return result
+
+
+  # Cache the result of an API call
+  def _remember(self, call, result):
+    if self.cache != None and call.cache != None:
+      self.cache.put(self.requestAccounts, call.cache, result)
+    return result
+
+
+  # Drop cached results an API call may have changed (whether or not it succeeded)
+  def _invalidate(self, call):
+    if self.cache != None and len(call.invalidates) > 0:
+      self.cache.invalidate(self.requestAccounts, call.invalidates)
+
+
+  # The ID of a portfolio we have seen before (None if not)
+  def _known_portfolio(self, name):
+    if self.cache == None:
+      return None
+    return self.cache.portfolio(self.requestAccounts, name)
+
+
+  # Remember the IDs of portfolios and look one up by name
+  def _match_portfolio(self, portfolios, name=None):
+    portfolioIds= dict((portfolio[KEY_PORTFOLIO_NAME], portfolio[KEY_PORTFOLIO_ID]) for portfolio in portfolios)
+    if self.cache != None:
+      self.cache.remember(self.requestAccounts, portfolioIds)
+    return portfolioIds.get(name)
+
+
+  # Should the results of an API call be kept in our snapshot log?
+  def _recording(self, call):
+    return self.recorder != None and call.record != None and self.recorder.wants(call.record)
+
+
+  # Interpret the outcome of an API call, decoding its body at most once
+  # (successful calls for a key may decode only that key)
+  def _result(self, call, status, body):
+    if status == STATUS_CODE_OK:
+      result= self._decode(call, lambda: self.decoder.decode(body, call.key))
+      if call.empty != None and call.key not in result:
         if self.debug:
-          raise Exception('Received an empty response for available loans (result object {})'.format(result.json()), self, request, self.requestHeader)
+          raise Exception('{} (result object {})'.format(call.empty, result), self, call.url, self.requestHeader)
         else:
-          raise Exception('Received an empty response for available loans')
+          raise Exception(call.empty)
+      if call.key != None:
+        result= result[call.key]
+      if self._recording(call):
+        self.recorder.record(call.record, result)
+      return result
+
     else:
+      message= '{} (status code {})'.format(call.description, status)
       if self.debug:
-        raise Exception('Could not obtain a list of available loans (status code {})'.format(result.status_code), self, request, self.requestHeader)
+        details= [self, call.url, self.requestHeader]
+        if call.details == DETAILS_ERRORS:
+          details.append(self.decoder.decode(body)[KEY_ERRORS])
+        elif call.details == DETAILS_BODY:
+          details.append(self.decoder.decode(body))
+        raise Exception(message, *details)
       else:
-        raise Exception('Could not obtain a list of available loans (status code {})'.format(result.status_code))
+        raise Exception(message)
 
 
-  # Obtain a list of all notes owned
-  def get_owned_notes(self):
-    request= self.requestAccounts + REQUEST_NOTES
-    result= requests.get(request, headers=self.requestHeader)
+#
+# Define our Lending Club API class
+#
+class LCRequest(LCRequestBase):
 
-    if result.status_code == STATUS_CODE_OK:
-      return result.json()[KEY_NOTES]
-    else:
+  # Constructor
+  def __init__(self, arguments):
+    LCRequestBase.__init__(self, arguments)
+    self.timeout= (self.connectTimeout, self.readTimeout)
+    self.session= None
+    self.open()
+
+
+  # Support use as a context manager
+  def __enter__(self):
+    return self
+
+
+  def __exit__(self, type, value, traceback):
+    self.close()
+    return False
+
+
+  # Open a persistent, pooled, keep-alive session
+  def open(self):
+    if self.statsDumper != None:
+      self.statsDumper.start()
+
+    if self.session is None:
+      # only idempotent requests get retried after a read failure;
+      # connection failures are always safe to retry
+      retry= Retry(total=self.retries, connect=self.retries, read=self.retries, status=self.retries, backoff_factor=self.backoff, status_forcelist=RETRY_STATUS_CODES, raise_on_status=False)
+      adapter= HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_SIZE, max_retries=retry)
+
+      self.session= requests.Session()
+      self.session.headers.update(self.requestHeader)
+      self.session.mount('https://', adapter)
+      self.session.mount('http://', adapter)
+
+    return self.session
+
+
+  # Release all pooled connections
+  def close(self):
+    if self.session is not None:
+      self.session.close()
+      self.session= None
+
+    if self.statsDumper != None:
+      self.statsDumper.stop()
+
+
+  # Establish a connection ahead of time so the next request skips the TCP and TLS handshakes
+  def warm(self):
+    try:
+      self.open().head(self.requestRoot, timeout=self.timeout)
+    except requests.exceptions.RequestException as error:
       if self.debug:
-        raise Exception('Could not obtain a list of owned notes (status code {})'.format(result.status_code), self, request, self.requestHeader)
+        print('\n*** Could not warm the connection to {} ({})'.format(self.requestRoot, error))
+      return False
+
+    return True
+
+
+  # Issue an API call over our session
+  def _send(self, call, stream=False):
+    delay= 0 if call.throttled else self._reserve(call)
+    if delay > 0:
+      time.sleep(delay)
+
+    clock= time.perf_counter()
+    try:
+      result= self.open().request(call.method, call.url, json=call.payload, timeout=self.timeout, stream=stream)
+    except requests.exceptions.RequestException:
+      self.transportStats.record(call.endpoint, lcmetrics.STATUS_ERROR, time.perf_counter() - clock)
+      raise
+    seconds= time.perf_counter() - clock
+
+    # statuses of attempts retried by the transport count toward throttling too
+    retries= getattr(result.raw, 'retries', None)
+    history= retries.history if retries != None else ()
+    self._observe(call, [attempt.status for attempt in history] + [result.status_code])
+
+    # a streamed body has not been read yet, so its bytes get counted as it is
+    size= None if stream else len(result.content)
+    self.transportStats.record(call.endpoint, result.status_code, seconds, result.elapsed.total_seconds(), len(history), size)
+
+    return result
+
+
+  # Count the bytes of a streamed body as it is consumed
+  def _chunks(self, call, result):
+    for chunk in result.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+      self.transportStats.transferred(call.endpoint, len(chunk))
+      yield chunk
+
+
+  # Issue an API call (unless a fresh result is cached) and interpret its result
+  def _call(self, call):
+    cached= self._cached(call)
+    if cached != None:
+      return cached
+
+    try:
+      result= self._send(call)
+      return self._remember(call, self._result(call, result.status_code, result.content))
+    finally:
+      self._invalidate(call)
+
+
+  # Obtain available cash amount
+  def get_account_summary(self):
+    return self._call(self._summary_call())
+
+
+  # Obtain all available notes ("In Funding")
+  def get_available_notes(self):
+    return self._call(self._loans_call())
+
+
+  # Obtain a list of all notes owned
+  def get_owned_notes(self):
+    return self._call(self._notes_call())
+
+
+  # Iterate over all notes owned as the response arrives, optionally projecting
+  # each note onto a few fields to keep memory use flat
+  def iter_owned_notes(self, fields=None):
+    call= self._notes_call()
+    result= self._send(call, stream=True)
+    stream= None
+    parsing= 0.0
+    snapshot= lcrecord.Columns() if self._recording(call) else None
+
+    try:
+      if result.status_code == STATUS_CODE_OK:
+        stream= JSONArrayStream(self._chunks(call, result))
+        try:
+          # only the time spent inside the stream counts, not that of our caller between notes
+          clock= time.perf_counter()
+          for note in stream.iterate(KEY_NOTES):
+            parsing+= time.perf_counter() - clock
+            if snapshot != None:
+              snapshot.add(note)
+            if fields == None:
+              yield note
+            else:
+              yield dict((field, note.get(field)) for field in fields)
+            clock= time.perf_counter()
+          parsing+= time.perf_counter() - clock
+
+          # only a complete list of notes makes a snapshot
+          if snapshot != None:
+            self.recorder.record(call.record, snapshot)
+        except (KeyError, ValueError) as error:
+          if self.debug:
+            raise Exception('Could not parse the list of owned notes ({})'.format(error), self, call.url, self.requestHeader)
+          else:
+            raise Exception('Could not parse the list of owned notes')
       else:
-        raise Exception('Could not obtain a list of owned notes (status code {})'.format(result.status_code))
+        self._result(call, result.status_code, result.content)
+    finally:
+      result.close()
+      if stream != None:
+        self.transportStats.transferred(call.endpoint, 0, stream.reading)
+        self.transportStats.decoded(call.endpoint, max(0.0, parsing - stream.reading))
 
 
   # Obtain a list of all portfolios owned
   def get_owned_portfolios(self):
-    request= self.requestAccounts + REQUEST_PORTFOLIOS
-    result= requests.get(request, headers=self.requestHeader)
+    return self._call(self._portfolios_call())
 
-    if result.status_code == STATUS_CODE_OK:
-      return result.json()[KEY_PORTFOLIOS]
-    else:
-      if self.debug:
-        raise Exception('Could not obtain a list of owned portfolios (status code {})'.format(result.status_code), self, request, self.requestHeader)
-      else:
-        raise Exception('Could not obtain a list of owned portfolios (status code {})'.format(result.status_code))
+
+  # Find the ID of a portfolio by name (None if there is no such portfolio),
+  # asking for the list of portfolios only for names not seen before
+  def find_portfolio(self, name):
+    portfolioId= self._known_portfolio(name)
+    if portfolioId == None:
+      portfolioId= self._match_portfolio(self.get_owned_portfolios(), name)
+    return portfolioId
 
 
   # Create named portfolio
   def create_portfolio(self, name, description):
-    request= self.requestAccounts + REQUEST_PORTFOLIOS
-    payload= {KEY_AID:self.id, KEY_PORTFOLIO_NAME:name, KEY_PORTFOLIO_DESCRIPTION:description}
-    result= requests.post(request, json=payload, headers=self.requestHeader)
+    portfolio= self._call(self._create_portfolio_call(name, description))
+    self._match_portfolio([portfolio])
+    return portfolio
 
-    if result.status_code == STATUS_CODE_OK:
-      return result.json()
-    else:
-      if self.debug:
-        raise Exception('Could not create the portfolio named "{}" with description "{}" (status code {})'.format(name, description, result.status_code), self, request, self.requestHeader, result.json()[KEY_ERRORS])
-      else:
-        raise Exception('Could not create the portfolio named "{}" with description "{}" (status code {})'.format(name, description, result.status_code)[KEY_ERRORS])
 
+  # Wait for an order rate limit token (so an order submitted as throttled goes out at once)
+  def throttle_order(self):
+    delay= self._reserve_order()
+    if delay > 0:
+      time.sleep(delay)
+    return delay
 
-  # Submit buy order
-  def submit_order(self, notes):
-    request= self.requestAccounts + REQUEST_ORDERS
-    payload= {KEY_AID:self.id, KEY_ORDERS:notes}
-    result= requests.post(request, json=payload, headers=self.requestHeader)
 
-    if result.status_code == STATUS_CODE_OK:
-      return result.json()
-    else:
-      if self.debug:
-        raise Exception('Order failed (status code {})'.format(result.status_code), self, request, self.requestHeader, result.json())
-      else:
-        raise Exception('Order failed (status code {})'.format(result.status_code))
+  # Submit buy order (throttled if we already waited for its rate limit token)
+  def submit_order(self, notes, throttled=False):
+    return self._call(self._order_call(notes, throttled))
+
 
   # Submit withdrawal request
   def submit_withdrawal(self, amount):
-    request= self.requestAccounts + REQUEST_WITHDRAWAL
-    payload= {KEY_AID:self.id, KEY_AMOUNT:amount}
-    result= requests.post(request, json=payload, headers=self.requestHeader)
+    return self._call(self._withdrawal_call(amount))
 
-    if result.status_code == STATUS_CODE_OK:
-      return result.json()
-    else:
+
+#
+# Define our asynchronous Lending Club API class
+#
+class AsyncLCRequest(LCRequestBase):
+
+  # Constructor
+  def __init__(self, arguments):
+    if aiohttp == None:
+      raise Exception('The asynchronous Lending Club API client requires aiohttp')
+
+    LCRequestBase.__init__(self, arguments)
+    self.timeout= aiohttp.ClientTimeout(sock_connect=self.connectTimeout, sock_read=self.readTimeout)
+    self.session= None
+
+
+  # Support use as an asynchronous context manager
+  async def __aenter__(self):
+    self.open()
+    return self
+
+
+  async def __aexit__(self, type, value, traceback):
+    await self.close()
+    return False
+
+
+  # Open a persistent, pooled, keep-alive session (must be called from within the event loop)
+  def open(self):
+    if self.statsDumper != None:
+      self.statsDumper.start()
+
+    if self.session == None:
+      connector= aiohttp.TCPConnector(limit=POOL_SIZE * POOL_CONNECTIONS, limit_per_host=POOL_SIZE)
+      self.session= aiohttp.ClientSession(connector=connector, headers=self.requestHeader, timeout=self.timeout)
+
+    return self.session
+
+
+  # Release all pooled connections
+  async def close(self):
+    if self.session != None:
+      await self.session.close()
+      self.session= None
+
+    if self.statsDumper != None:
+      self.statsDumper.stop()
+
+
+  # Establish a connection ahead of time so the next request skips the TCP and TLS handshakes
+  async def warm(self):
+    try:
+      async with self.open().head(self.requestRoot) as response:
+        await response.read()
+    except (aiohttp.ClientError, asyncio.TimeoutError) as error:
       if self.debug:
-        raise Exception('Order failed (status code {})'.format(result.status_code), self, request, self.requestHeader, result.json())
-      else:
-        raise Exception('Order failed (status code {})'.format(result.status_code))
+        print('\n*** Could not warm the connection to {} ({})'.format(self.requestRoot, error))
+      return False
+
+    return True
+
+
+  # Issue an API call (unless a fresh result is cached) and interpret its result
+  async def _call(self, call):
+    cached= self._cached(call)
+    if cached != None:
+      return cached
+
+    try:
+      return self._remember(call, await self._issue(call))
+    finally:
+      self._invalidate(call)
+
+
+  # Issue an API call, retrying with backoff like the synchronous client
+  # (only idempotent calls are retried once a request may have reached the server)
+  async def _issue(self, call):
+    attempt= 0
+    while True:
+      # (a throttled call already holds the token of its first attempt)
+      delay= 0 if call.throttled and attempt == 0 else self._reserve(call)
+      if delay > 0:
+        await asyncio.sleep(delay)
+
+      # latency spans all attempts, like that of the synchronous client's transport retries
+      clock= time.perf_counter()
+      if attempt == 0:
+        first= clock
+      try:
+        async with self.open().request(call.method, call.url, json=call.payload) as response:
+          status= response.status
+          waiting= time.perf_counter() - clock
+          body= await response.read()
+
+        self._observe(call, [status])
+        if status not in RETRY_STATUS_CODES or call.method != 'GET' or attempt >= self.retries:
+          self.transportStats.record(call.endpoint, status, time.perf_counter() - first, waiting, attempt, len(body))
+          return self._result(call, status, body)
+
+      except aiohttp.ClientConnectorError:
+        if attempt >= self.retries:
+          self.transportStats.record(call.endpoint, lcmetrics.STATUS_ERROR, time.perf_counter() - first, retries=attempt)
+          raise
+      except (aiohttp.ClientError, asyncio.TimeoutError):
+        if attempt >= self.retries or call.method != 'GET':
+          self.transportStats.record(call.endpoint, lcmetrics.STATUS_ERROR, time.perf_counter() - first, retries=attempt)
+          raise
+
+      if attempt > 0:
+        await asyncio.sleep(self.backoff * (2 ** attempt))
+      attempt+= 1
+
+
+  # Obtain available cash amount
+  async def get_account_summary(self):
+    return await self._call(self._summary_call())
+
+
+  # Obtain all available notes ("In Funding")
+  async def get_available_notes(self):
+    return await self._call(self._loans_call())
+
+
+  # Obtain a list of all notes owned
+  async def get_owned_notes(self):
+    return await self._call(self._notes_call())
+
+
+  # Obtain a list of all portfolios owned
+  async def get_owned_portfolios(self):
+    return await self._call(self._portfolios_call())
+
+
+  # Find the ID of a portfolio by name (None if there is no such portfolio)
+  async def find_portfolio(self, name):
+    portfolioId= self._known_portfolio(name)
+    if portfolioId == None:
+      portfolioId= self._match_portfolio(await self.get_owned_portfolios(), name)
+    return portfolioId
+
+
+  # Create named portfolio
+  async def create_portfolio(self, name, description):
+    portfolio= await self._call(self._create_portfolio_call(name, description))
+    self._match_portfolio([portfolio])
+    return portfolio
+
+
+  # Wait for an order rate limit token (so an order submitted as throttled goes out at once)
+  async def throttle_order(self):
+    delay= self._reserve_order()
+    if delay > 0:
+      await asyncio.sleep(delay)
+    return delay
+
+
+  # Submit buy order (throttled if we already waited for its rate limit token)
+  async def submit_order(self, notes, throttled=False):
+    return await self._call(self._order_call(notes, throttled))
+
+
+  # Submit withdrawal request
+  async def submit_withdrawal(self, amount):
+    return await self._call(self._withdrawal_call(amount))
+
+
+#
+# Define the script options shared by all our API clients
+#
+
+# Add the transport, rate limit, response cache, metrics, decoding, and profiling options to a script's argument parser
+#
+def AddRequestArguments(argumentParser):
+  argumentParser.add_argument('--api-root', nargs=1, dest='root', required=False, action='store', help='Lending Club API root URL to use instead of the live API (e.g., a local lc-mock-server.py)')
+  argumentParser.add_argument('--connect-timeout', nargs=1, dest='connectTimeout', type=float, required=False, action='store', default=[CONNECT_TIMEOUT], help='Seconds to wait for a connection to the Lending Club API')
+  argumentParser.add_argument('--read-timeout', nargs=1, dest='readTimeout', type=float, required=False, action='store', default=[READ_TIMEOUT], help='Seconds to wait for a Lending Club API response')
+  argumentParser.add_argument('--retries', nargs=1, dest='retries', type=int, required=False, action='store', default=[RETRY_TOTAL], help='Number of times to retry a failed Lending Club API request')
+  argumentParser.add_argument('--backoff', nargs=1, dest='backoff', type=float, required=False, action='store', default=[RETRY_BACKOFF], help='Backoff factor (in seconds) between retries')
+  argumentParser.add_argument('--rate-limit', nargs=3, metavar=('CLASS', 'PER_SECOND', 'BURST'), dest='rateLimits', required=False, action='append', help='Limit Lending Club API requests for an endpoint class (listing, account, or orders, which each account limits separately)')
+  argumentParser.add_argument('--rate-limit-file', nargs=1, dest='rateLimitFile', required=False, action='store', help='Local file for sharing rate limits with other processes')
+  argumentParser.add_argument('--no-rate-limit', dest='rateLimit', required=False, action='store_false', default=True, help='Do not limit the Lending Club API request rate')
+  argumentParser.add_argument('--cache-ttl', nargs=2, metavar=('CLASS', 'SECONDS'), dest='cacheTTLs', required=False, action='append', help='Seconds a cached Lending Club API response stays fresh for a response class (summary, listing, notes, or portfolios; 0 never caches it)')
+  argumentParser.add_argument('--cache-file', nargs=1, dest='cacheFile', required=False, action='store', help='Local file for sharing cached API responses and known portfolio IDs with later runs and other processes')
+  argumentParser.add_argument('--no-cache', dest='cache', required=False, action='store_false', default=True, help='Do not cache Lending Club API responses or portfolio IDs')
+
+  argumentParser.add_argument('--metrics-jsonl', nargs=1, dest='metricsJSONL', required=False, action='store', help='Append timing spans and counters for the run to this JSON lines file')
+  argumentParser.add_argument('--metrics-prometheus', nargs=1, dest='metricsPrometheus', required=False, action='store', help='Write timing spans and counters for the run to this Prometheus textfile (one file per script, since each run replaces it)')
+  argumentParser.add_argument('--transport-stats', nargs=1, dest='statsFile', required=False, action='store', help='Append per-endpoint API transport statistics (latency, bytes, decode time, statuses, retries) to this JSON lines file')
+  argumentParser.add_argument('--transport-stats-interval', nargs=1, type=float, dest='statsInterval', default=[lcmetrics.STATS_INTERVAL], required=False, action='store', help='Seconds between transport statistics dumps while a session is open (0 dumps only when it closes)')
+  argumentParser.add_argument('--json-decoder', nargs=1, dest='jsonDecoder', choices=lcjson.BACKENDS, required=False, action='store', default=[lcjson.BACKEND_AUTO], help='JSON backend for decoding Lending Club API responses (auto picks the fastest one installed)')
+  argumentParser.add_argument('--decode-key-only', dest='decodeKeyOnly', required=False, action='store_true', default=False, help='Decode only the part of each API response that is used (e.g., the loans of a listing; fastest with simdjson)')
+  argumentParser.add_argument('--profile', nargs=1, dest='profile', required=False, action='store', help='Profile the run, writing cProfile statistics, sampled stacks (for flame graphs) and note processing allocation peaks to files starting with this prefix')
+
+
+# Validate and normalize the options added by AddRequestArguments, setting up a script's timing spans and counters
+#
+def NormalizeRequestArguments(options, script):
+  # convert transport settings
+  if options.root != None:
+    options.root= str(options.root.pop())
+  options.connectTimeout= float(options.connectTimeout.pop())
+  options.readTimeout= float(options.readTimeout.pop())
+  options.retries= int(options.retries.pop())
+  options.backoff= float(options.backoff.pop())
+
+  # convert rate limit settings
+  if options.rateLimits != None:
+    options.rateLimits= dict((limit[0], (float(limit[1]), int(limit[2]))) for limit in options.rateLimits)
+  if options.rateLimitFile != None:
+    options.rateLimitFile= options.rateLimitFile.pop()
+
+  # convert response cache settings
+  if options.cacheTTLs != None:
+    options.cacheTTLs= dict((ttl[0], float(ttl[1])) for ttl in options.cacheTTLs)
+  if options.cacheFile != None:
+    options.cacheFile= options.cacheFile.pop()
+
+  # set up timing spans and counters
+  if options.metricsJSONL != None:
+    options.metricsJSONL= str(options.metricsJSONL.pop())
+  if options.metricsPrometheus != None:
+    options.metricsPrometheus= str(options.metricsPrometheus.pop())
+  options.profiler= None
+  if options.profile != None:
+    options.profiler= lcprofile.Profiler(str(options.profile.pop()))
+  options.metrics= lcmetrics.Metrics(script, options.metricsJSONL, options.metricsPrometheus, options.profiler)
+
+  if options.statsFile != None:
+    options.statsFile= str(options.statsFile.pop())
+  options.statsInterval= float(options.statsInterval.pop())
+  if options.statsInterval < 0:
+    raise Exception('Transport statistics interval ({}) must not be negative'.format(options.statsInterval))
+
+  options.jsonDecoder= str(options.jsonDecoder.pop())
+  if not lcjson.available(options.jsonDecoder):
+    raise Exception('The {} JSON decoder was requested but it is not installed'.format(options.jsonDecoder))
+
+  return options
@@ -0,0 +1,201 @@
+#
+# Import all necessary libraries
+#
+
+import numbers
+from operator import itemgetter
+
+try:
+  import numpy
+except ImportError:
+  numpy= None
+
+
+#
+# Define some global constants
+#
+
+VERSION= '1.0.0'
+
+# Lending Club API data structure keys
+KEY_ID= 'id'
+KEY_GRADE= 'grade'
+
+# Rule operators (see lcstrategy)
+OPERATOR_IN= 'in'
+OPERATOR_MIN= 'min'
+OPERATOR_MAX= 'max'
+OPERATOR_EQUALS= 'equals'
+
+
+#
+# Define our screening classes and functions
+#
+
+# Report whether the columnar engine can be used
+#
+def Available():
+  return numpy is not None
+
+
+# Typed column arrays decoded once from a list of loan dictionaries
+#
+# Columns are decoded on first use: categorical columns as integer codes over a
+# vocabulary and numeric columns as floats with missing (None) values as NaN.
+# Rules with non-numeric values (e.g., "equals" on a text field) use categorical codes.
+#
+class NoteColumns:
+
+  # Constructor
+  def __init__(self, notes):
+    if numpy is None:
+      raise Exception('The columnar screening engine requires NumPy')
+
+    self.notes= notes
+    self.size= len(notes)
+    self.ids= numpy.array([note[KEY_ID] for note in notes], dtype=numpy.int64)
+    self.codes= {}
+    self.vocabularies= {}
+    self.numbers= {}
+
+
+  # Decode one categorical column
+  def categorical(self, key):
+    if key not in self.codes:
+      vocabulary= {}
+      self.codes[key]= numpy.fromiter((vocabulary.setdefault(note[key], len(vocabulary)) for note in self.notes), dtype=numpy.int32, count=self.size)
+      self.vocabularies[key]= vocabulary
+    return self.codes[key]
+
+
+  # Decode one numeric column
+  def numeric(self, key):
+    if key not in self.numbers:
+      self.numbers[key]= numpy.array([note[key] for note in self.notes], dtype=numpy.float64)
+    return self.numbers[key]
+
+
+  # Mask rows whose categorical value is among the accepted values
+  def isin(self, key, values):
+    codes= self.categorical(key)
+    vocabulary= self.vocabularies[key]
+    accepted= [vocabulary[value] for value in values if value in vocabulary]
+    return numpy.isin(codes, accepted)
+
+
+  # Mask rows not among the given loan IDs
+  def notin(self, ids):
+    if len(ids) == 0:
+      return numpy.ones(self.size, dtype=bool)
+    return numpy.isin(self.ids, numpy.fromiter(ids, dtype=numpy.int64, count=len(ids)), invert=True)
+
+
+  # Mask rows passing a single strategy rule
+  def rule(self, rule):
+    if rule.operator == OPERATOR_IN:
+      return self.isin(rule.field, rule.value)
+    if not isinstance(rule.value, numbers.Number):
+      return self.compare(rule)
+
+    column= self.numeric(rule.field)
+    with numpy.errstate(invalid='ignore'):
+      if rule.operator == OPERATOR_MIN:
+        mask= column >= rule.value
+      elif rule.operator == OPERATOR_MAX:
+        mask= column <= rule.value
+      else:
+        mask= column == rule.value
+
+    if rule.missing == 'pass':
+      mask|= numpy.isnan(column)
+    return mask
+
+
+  # Mask rows passing a rule on a categorical column, comparing each distinct value once
+  # as lcstrategy compiles the rule (i.e., as Python objects)
+  def compare(self, rule):
+    codes= self.categorical(rule.field)
+    passed= numpy.zeros(len(self.vocabularies[rule.field]), dtype=bool)
+    for value, code in self.vocabularies[rule.field].items():
+      if value is None:
+        passed[code]= rule.missing == 'pass'
+      elif rule.operator == OPERATOR_MIN:
+        passed[code]= value >= rule.value
+      elif rule.operator == OPERATOR_MAX:
+        passed[code]= value <= rule.value
+      else:
+        passed[code]= value == rule.value
+    return passed[codes]
+
+
+  # Select the loans flagged by a boolean mask, preserving their original order
+  def select(self, mask):
+    return [self.notes[index] for index in numpy.flatnonzero(mask)]
+
+
+# Screen loans by ownership, grade, and strategy rules with boolean masks
+#
+def ScreenNotes(ownedLoans, columns, desiredGrades, rules):
+  mask= columns.notin(ownedLoans)
+  mask&= columns.isin(KEY_GRADE, desiredGrades)
+  for rule in rules:
+    mask&= columns.rule(rule)
+
+  return columns.select(mask)
+
+
+# Screening verdicts remembered per loan between polls of the listing
+#
+# A loan is screened again only when it is new or when one of its screened
+# attributes changed (funding changes with every poll, so it is left to order
+# sizing, which reads it from the listing). Loans that leave the listing are evicted.
+#
+class VerdictCache:
+
+  # Constructor
+  def __init__(self, fields):
+    self.fields= sorted(set(fields))
+    self.signature= itemgetter(*self.fields)
+    self.clear()
+
+
+  # Forget all verdicts
+  def clear(self):
+    self.verdicts= {}
+    self.ownedLoans= None
+    self.desiredGrades= None
+    self.changed= 0
+
+
+  # Screen loans, evaluating only new or changed loans with the given screening function
+  def screen(self, notes, ownedLoans, desiredGrades, screen):
+    desiredGrades= frozenset(desiredGrades)
+    if ownedLoans is not self.ownedLoans or desiredGrades != self.desiredGrades:
+      # verdicts depend on what we own and which grades we want
+      self.clear()
+      self.ownedLoans= ownedLoans
+      self.desiredGrades= desiredGrades
+
+    verdicts= {}
+    signatures= {}
+    changed= []
+    for note in notes:
+      id= note[KEY_ID]
+      signature= self.signature(note)
+      cached= self.verdicts.get(id)
+      if cached != None and cached[0] == signature:
+        verdicts[id]= cached
+      else:
+        signatures[id]= signature
+        changed.append(note)
+
+    if len(changed) > 0:
+      accepted= set(note[KEY_ID] for note in screen(changed))
+      for id in signatures:
+        verdicts[id]= (signatures[id], id in accepted)
+
+    # keeping only this poll's entries evicts loans that left the listing
+    self.verdicts= verdicts
+    self.changed= len(changed)
+
+    return [note for note in notes if verdicts[note[KEY_ID]][1]]
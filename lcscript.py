@@ -0,0 +1,51 @@
+#
+# Import all necessary libraries
+#
+
+import importlib.util
+import os
+import signal
+import threading
+
+
+#
+# Define some global constants
+#
+
+VERSION= '1.0.0'
+SCRIPT_DIRECTORY= os.path.dirname(os.path.abspath(__file__))
+
+
+#
+# Define our helpers for reusing the command line scripts
+#
+
+_scripts= {}
+_lock= threading.Lock()
+
+
+# Load one of our command line scripts (e.g., "lc-auto-invest") as a module
+#
+def LoadScript(name):
+  with _lock:
+    if name not in _scripts:
+      path= os.path.join(SCRIPT_DIRECTORY, name + '.py')
+      if not os.path.exists(path):
+        raise Exception('Could not find the script "{}"'.format(name), path)
+
+      specification= importlib.util.spec_from_file_location(name.replace('-', '_'), path)
+      script= importlib.util.module_from_spec(specification)
+      specification.loader.exec_module(script)
+      _scripts[name]= script
+
+    return _scripts[name]
+
+
+# Treat SIGTERM like Ctrl-C, so a script stopped by a service manager (e.g., a daemon)
+# shuts down cleanly instead of dying on the spot
+#
+def HandleTermination():
+  def terminate(number, frame):
+    raise KeyboardInterrupt()
+
+  signal.signal(signal.SIGTERM, terminate)
@@ -0,0 +1,200 @@
+#
+# Import all necessary libraries
+#
+
+import sqlite3
+import time
+
+
+#
+# Define some global constants
+#
+
+VERSION= '1.0.0'
+
+# Seconds a sync stays current by default (payments trickle in; our own orders expire it at once)
+MAXIMUM_AGE_SECONDS= 3600
+
+# Lending Club API data structure keys
+KEY_NOTE_ID= 'noteId'
+KEY_LOAN_ID= 'loanId'
+KEY_GRADE= 'grade'
+KEY_PRINCIPAL= 'principalPending'
+KEY_NOTE_AMOUNT= 'noteAmount'
+KEY_NOTE_PRINCIPAL_RETURNED= 'principalReceived'
+KEY_NOTE_INTEREST_PAID= 'interestReceived'
+KEY_NOTE_PAYMENTS= 'paymentsReceived'
+KEY_NOTE_STATUS= 'loanStatus'
+KEY_COUNT= 'count'
+
+# Note fields kept in the store (in column order) and the ones summed per grade
+NOTE_FIELDS= [KEY_NOTE_ID, KEY_LOAN_ID, KEY_GRADE, KEY_PRINCIPAL, KEY_NOTE_AMOUNT, KEY_NOTE_PRINCIPAL_RETURNED, KEY_NOTE_INTEREST_PAID, KEY_NOTE_PAYMENTS, KEY_NOTE_STATUS]
+SUM_FIELDS= [KEY_PRINCIPAL, KEY_NOTE_AMOUNT, KEY_NOTE_PRINCIPAL_RETURNED, KEY_NOTE_INTEREST_PAID, KEY_NOTE_PAYMENTS]
+
+SCHEMA= '''
+CREATE TABLE IF NOT EXISTS notes (
+  account TEXT NOT NULL, noteId INTEGER NOT NULL, loanId INTEGER NOT NULL, grade TEXT NOT NULL,
+  principalPending REAL, noteAmount REAL, principalReceived REAL, interestReceived REAL, paymentsReceived REAL, loanStatus TEXT,
+  PRIMARY KEY (account, noteId));
+CREATE INDEX IF NOT EXISTS notesByLoan ON notes (account, loanId);
+
+CREATE TABLE IF NOT EXISTS grades (
+  account TEXT NOT NULL, grade TEXT NOT NULL, count INTEGER NOT NULL DEFAULT 0,
+  principalPending REAL NOT NULL DEFAULT 0, noteAmount REAL NOT NULL DEFAULT 0, principalReceived REAL NOT NULL DEFAULT 0,
+  interestReceived REAL NOT NULL DEFAULT 0, paymentsReceived REAL NOT NULL DEFAULT 0,
+  PRIMARY KEY (account, grade));
+
+CREATE TABLE IF NOT EXISTS statuses (
+  account TEXT NOT NULL, loanStatus TEXT NOT NULL, count INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (account, loanStatus));
+
+-- (statuses are reported in the order the API last listed them, like a pass over the notes would)
+CREATE TABLE IF NOT EXISTS statusOrder (
+  account TEXT NOT NULL, loanStatus TEXT NOT NULL, position INTEGER NOT NULL,
+  PRIMARY KEY (account, loanStatus));
+
+CREATE TABLE IF NOT EXISTS syncs (
+  account TEXT NOT NULL PRIMARY KEY, synced REAL NOT NULL);
+
+-- (triggers avoid INSERT OR IGNORE since an upsert's conflict handling would override it)
+CREATE TRIGGER IF NOT EXISTS noteAdded AFTER INSERT ON notes BEGIN
+  INSERT INTO grades (account, grade) SELECT NEW.account, NEW.grade WHERE NOT EXISTS (SELECT 1 FROM grades WHERE account = NEW.account AND grade = NEW.grade);
+  UPDATE grades SET count= count + 1, principalPending= principalPending + NEW.principalPending, noteAmount= noteAmount + NEW.noteAmount,
+    principalReceived= principalReceived + NEW.principalReceived, interestReceived= interestReceived + NEW.interestReceived, paymentsReceived= paymentsReceived + NEW.paymentsReceived
+    WHERE account = NEW.account AND grade = NEW.grade;
+  INSERT INTO statuses (account, loanStatus) SELECT NEW.account, NEW.loanStatus WHERE NOT EXISTS (SELECT 1 FROM statuses WHERE account = NEW.account AND loanStatus = NEW.loanStatus);
+  UPDATE statuses SET count= count + 1 WHERE account = NEW.account AND loanStatus = NEW.loanStatus;
+END;
+
+CREATE TRIGGER IF NOT EXISTS noteRemoved AFTER DELETE ON notes BEGIN
+  UPDATE grades SET count= count - 1, principalPending= principalPending - OLD.principalPending, noteAmount= noteAmount - OLD.noteAmount,
+    principalReceived= principalReceived - OLD.principalReceived, interestReceived= interestReceived - OLD.interestReceived, paymentsReceived= paymentsReceived - OLD.paymentsReceived
+    WHERE account = OLD.account AND grade = OLD.grade;
+  UPDATE statuses SET count= count - 1 WHERE account = OLD.account AND loanStatus = OLD.loanStatus;
+END;
+
+CREATE TRIGGER IF NOT EXISTS noteChanged AFTER UPDATE ON notes BEGIN
+  UPDATE grades SET count= count - 1, principalPending= principalPending - OLD.principalPending, noteAmount= noteAmount - OLD.noteAmount,
+    principalReceived= principalReceived - OLD.principalReceived, interestReceived= interestReceived - OLD.interestReceived, paymentsReceived= paymentsReceived - OLD.paymentsReceived
+    WHERE account = OLD.account AND grade = OLD.grade;
+  INSERT INTO grades (account, grade) SELECT NEW.account, NEW.grade WHERE NOT EXISTS (SELECT 1 FROM grades WHERE account = NEW.account AND grade = NEW.grade);
+  UPDATE grades SET count= count + 1, principalPending= principalPending + NEW.principalPending, noteAmount= noteAmount + NEW.noteAmount,
+    principalReceived= principalReceived + NEW.principalReceived, interestReceived= interestReceived + NEW.interestReceived, paymentsReceived= paymentsReceived + NEW.paymentsReceived
+    WHERE account = NEW.account AND grade = NEW.grade;
+  UPDATE statuses SET count= count - 1 WHERE account = OLD.account AND loanStatus = OLD.loanStatus;
+  INSERT INTO statuses (account, loanStatus) SELECT NEW.account, NEW.loanStatus WHERE NOT EXISTS (SELECT 1 FROM statuses WHERE account = NEW.account AND loanStatus = NEW.loanStatus);
+  UPDATE statuses SET count= count + 1 WHERE account = NEW.account AND loanStatus = NEW.loanStatus;
+END;
+'''
+
+# Apply staged notes, touching only new or changed rows
+SQL_UPSERT= '''
+INSERT INTO notes (account, {columns}) SELECT ?, {columns} FROM staged WHERE true
+  ON CONFLICT (account, noteId) DO UPDATE SET {assignments}
+  WHERE {differences}
+'''.format(
+  columns= ', '.join(NOTE_FIELDS),
+  assignments= ', '.join('{0}= excluded.{0}'.format(field) for field in NOTE_FIELDS[1:]),
+  differences= ' OR '.join('notes.{0} IS NOT excluded.{0}'.format(field) for field in NOTE_FIELDS[1:]))
+
+SQL_DELETE= 'DELETE FROM notes WHERE account = ? AND noteId NOT IN (SELECT noteId FROM staged)'
+
+
+#
+# Define our note store classes
+#
+
+# Local persistent store of owned notes with per-grade aggregates kept current by triggers
+#
+class NoteStore:
+
+  # Constructor
+  def __init__(self, path, account):
+    self.path= path
+    self.account= str(account)
+    # (connections may be handed from a prefetching thread to the main thread, never shared at once)
+    self.connection= sqlite3.connect(path, check_same_thread=False)
+    self.connection.executescript(SCHEMA)
+
+
+  # Support use as a context manager
+  def __enter__(self):
+    return self
+
+
+  def __exit__(self, type, value, traceback):
+    self.close()
+    return False
+
+
+  def close(self):
+    if self.connection != None:
+      self.connection.close()
+      self.connection= None
+
+
+  # Seconds since the last sync (None if never synced)
+  def age(self):
+    row= self.connection.execute('SELECT synced FROM syncs WHERE account = ?', (self.account,)).fetchone()
+    if row == None:
+      return None
+    return time.time() - row[0]
+
+
+  # Mark the store out of date so the next refresh syncs (e.g., once notes have been ordered)
+  def expire(self):
+    with self.connection:
+      self.connection.execute('DELETE FROM syncs WHERE account = ?', (self.account,))
+
+
+  # Bring the store in line with a complete list of owned notes, applying only differences
+  def sync(self, notes):
+    with self.connection:
+      self.connection.execute('CREATE TEMP TABLE IF NOT EXISTS staged AS SELECT {} FROM notes WHERE 0'.format(', '.join(NOTE_FIELDS)))
+      self.connection.execute('DELETE FROM staged')
+      self.connection.executemany('INSERT INTO staged VALUES ({})'.format(', '.join('?' * len(NOTE_FIELDS))), ([note.get(field) for field in NOTE_FIELDS] for note in notes))
+
+      changed= self.connection.execute(SQL_UPSERT, (self.account,)).rowcount
+      removed= self.connection.execute(SQL_DELETE, (self.account,)).rowcount
+
+      self.connection.execute('DELETE FROM statusOrder WHERE account = ?', (self.account,))
+      self.connection.execute('INSERT INTO statusOrder (account, loanStatus, position) SELECT ?, loanStatus, MIN(rowid) FROM staged WHERE loanStatus IS NOT NULL GROUP BY loanStatus', (self.account,))
+
+      self.connection.execute('INSERT OR REPLACE INTO syncs (account, synced) VALUES (?, ?)', (self.account, time.time()))
+      self.connection.execute('DELETE FROM staged')
+
+    return changed, removed
+
+
+  # Sync from the Lending Club API unless the store is recent enough
+  def refresh(self, request, maxAge=MAXIMUM_AGE_SECONDS):
+    age= self.age()
+    if age == None or age >= maxAge:
+      return self.sync(request.iter_owned_notes(NOTE_FIELDS))
+    return 0, 0
+
+
+  # Set of owned loan IDs, read once (screening looks up every listed loan, on every poll)
+  def owned_loans(self):
+    return set(row[0] for row in self.connection.execute('SELECT DISTINCT loanId FROM notes WHERE account = ?', (self.account,)))
+
+
+  # Aggregates per minor grade
+  def grade_totals(self):
+    totals= {}
+    for row in self.connection.execute('SELECT grade, count, {} FROM grades WHERE account = ? AND count > 0'.format(', '.join(SUM_FIELDS)), (self.account,)):
+      totals[row[0]]= dict(zip([KEY_COUNT] + SUM_FIELDS, row[1:]))
+    return totals
+
+
+  # Aggregates per major grade
+  def major_grade_totals(self):
+    totals= {}
+    for row in self.connection.execute('SELECT substr(grade, 1, 1), SUM(count), {} FROM grades WHERE account = ? AND count > 0 GROUP BY 1'.format(', '.join('SUM({})'.format(field) for field in SUM_FIELDS)), (self.account,)):
+      totals[row[0]]= dict(zip([KEY_COUNT] + SUM_FIELDS, row[1:]))
+    return totals
+
+
+  # Note counts per loan status, in the order the statuses first appear among the notes
+  def status_counts(self):
+    return dict(self.connection.execute('SELECT statuses.loanStatus, statuses.count FROM statuses LEFT JOIN statusOrder ON statusOrder.account = statuses.account AND statusOrder.loanStatus = statuses.loanStatus WHERE statuses.account = ? AND statuses.count > 0 ORDER BY statusOrder.position IS NULL, statusOrder.position, statuses.rowid', (self.account,)).fetchall())
@@ -0,0 +1,180 @@
+#
+# Import all necessary libraries
+#
+
+import json
+import os
+
+try:
+  import yaml
+except ImportError:
+  yaml= None
+
+try:
+  import tomllib
+except ImportError:
+  tomllib= None
+
+
+#
+# Define some global constants
+#
+
+VERSION= '1.0.0'
+
+# Strategy file keys
+KEY_RULES= 'rules'
+KEY_GRADES= 'grades'
+KEY_MINIMUM= 'minimumAmountPerNote'
+KEY_MAXIMUM= 'maximumAmountPerNote'
+KEY_FIELD= 'field'
+KEY_MISSING= 'missing'
+
+# Rule operators and how each treats a missing (None) value by default
+OPERATOR_IN= 'in'
+OPERATOR_MIN= 'min'
+OPERATOR_MAX= 'max'
+OPERATOR_EQUALS= 'equals'
+OPERATORS= {OPERATOR_IN: 'fail', OPERATOR_MIN: 'fail', OPERATOR_MAX: 'pass', OPERATOR_EQUALS: 'fail'}
+MISSING= ['pass', 'fail']
+
+# Number of loans used to measure how selective each rule is
+CALIBRATION_SAMPLE= 500
+
+
+#
+# Define our strategy classes and functions
+#
+
+# A single screening rule on one loan field
+#
+class Rule:
+
+  # Constructor
+  def __init__(self, field, operator, value, missing=None):
+    if operator not in OPERATORS:
+      raise Exception('Unknown rule operator "{}" for field "{}"'.format(operator, field))
+    if missing == None:
+      missing= OPERATORS[operator]
+    elif missing not in MISSING:
+      raise Exception('Unknown missing value treatment "{}" for field "{}"'.format(missing, field))
+
+    self.field= field
+    self.operator= operator
+    self.value= frozenset(value) if operator == OPERATOR_IN else value
+    self.missing= missing
+    self.rejection= None
+
+
+  # Python source for this rule's test, referring to its value by name
+  def source(self, name):
+    field= 'note[{!r}]'.format(self.field)
+    if self.operator == OPERATOR_IN:
+      test= '{} in {}'.format(field, name)
+    elif self.operator == OPERATOR_MIN:
+      test= '{} >= {}'.format(field, name)
+    elif self.operator == OPERATOR_MAX:
+      test= '{} <= {}'.format(field, name)
+    else:
+      test= '{} == {}'.format(field, name)
+
+    if self.missing == 'pass':
+      return '({} is None or {})'.format(field, test)
+    else:
+      return '({} is not None and {})'.format(field, test)
+
+
+  def __repr__(self):
+    return 'Rule({!r}, {!r}, {!r}, {!r})'.format(self.field, self.operator, self.value, self.missing)
+
+
+# A set of screening rules, grade allocations, and per-note amounts
+#
+class Strategy:
+
+  # Constructor
+  def __init__(self, rules, grades=None, minimum=None, maximum=None):
+    self.rules= list(rules)
+    self.grades= grades
+    self.minimum= minimum
+    self.maximum= maximum
+    self.calibrated= False
+    self._predicate= None
+
+
+  # Single predicate testing all rules in order, compiled on first use
+  @property
+  def predicate(self):
+    if self._predicate == None:
+      self._predicate= Compile(self.rules)
+    return self._predicate
+
+
+  # Measure each rule's rejection rate on sample loans and reorder the rules
+  # so that the most selective ones run first
+  def calibrate(self, notes):
+    sample= notes[:CALIBRATION_SAMPLE]
+    if len(sample) > 0:
+      for rule in self.rules:
+        test= Compile([rule])
+        rule.rejection= sum(1 for note in sample if not test(note)) / float(len(sample))
+
+      self.rules.sort(key=lambda rule: rule.rejection, reverse=True)
+      self._predicate= None
+      self.calibrated= True
+
+    return self.rules
+
+
+# Compile rules into a single short-circuiting predicate
+#
+def Compile(rules):
+  namespace= {}
+  tests= []
+  for index, rule in enumerate(rules):
+    name= 'VALUE{}'.format(index)
+    namespace[name]= rule.value
+    tests.append(rule.source(name))
+
+  if len(tests) == 0:
+    tests.append('True')
+
+  return eval('lambda note: ' + ' and '.join(tests), namespace)
+
+
+# Build a strategy from a parsed strategy document
+#
+def ParseStrategy(document):
+  rules= []
+  for specification in document.get(KEY_RULES, []):
+    operators= [operator for operator in OPERATORS if operator in specification]
+    if KEY_FIELD not in specification or len(operators) != 1:
+      raise Exception('A strategy rule needs a field and exactly one of {}'.format(', '.join(sorted(OPERATORS))), specification)
+    rules.append(Rule(specification[KEY_FIELD], operators[0], specification[operators[0]], specification.get(KEY_MISSING)))
+
+  return Strategy(rules, document.get(KEY_GRADES), document.get(KEY_MINIMUM), document.get(KEY_MAXIMUM))
+
+
+# Load a strategy from a JSON, YAML, or TOML file
+#
+def LoadStrategy(path):
+  extension= os.path.splitext(path)[1].lower()
+
+  if extension in ['.yaml', '.yml']:
+    if yaml == None:
+      raise Exception('Reading YAML strategy files requires PyYAML', path)
+    with open(path) as source:
+      document= yaml.safe_load(source)
+  elif extension == '.toml':
+    if tomllib == None:
+      raise Exception('Reading TOML strategy files requires Python 3.11 or later', path)
+    with open(path, 'rb') as source:
+      document= tomllib.load(source)
+  else:
+    with open(path) as source:
+      document= json.load(source)
+
+  if not isinstance(document, dict):
+    raise Exception('Strategy file does not contain a mapping', path)
+
+  return ParseStrategy(document)
@@ -0,0 +1,148 @@
+#
+# Import all necessary libraries
+#
+
+import datetime
+import random
+
+
+#
+# Define some global constants
+#
+
+VERSION= '1.0.0'
+
+# Loan attributes and their plausible values
+GRADES= list(map(chr, range(ord('A'), ord('G')+1)))
+GRADE_RATES= {'A': (5.3, 8.8), 'B': (9.4, 12.6), 'C': (13.6, 17.1), 'D': (18.2, 21.9), 'E': (22.4, 25.6), 'F': (26.3, 28.8), 'G': (29.0, 30.9)}
+GRADE_WEIGHTS= [18, 30, 27, 14, 7, 3, 1]
+PURPOSES= ['debt_consolidation', 'credit_card', 'home_improvement', 'other', 'major_purchase', 'small_business', 'car', 'medical', 'house', 'vacation', 'moving']
+PURPOSE_WEIGHTS= [50, 22, 7, 6, 3, 3, 2, 2, 2, 2, 1]
+HOMES= ['MORTGAGE', 'RENT', 'OWN', 'OTHER']
+HOME_WEIGHTS= [48, 40, 11, 1]
+EMPLOYMENT_MONTHS= [0, 6, 12, 24, 36, 60, 120]
+LOAN_AMOUNTS= [1000, 2400, 5000, 7500, 10000, 12000, 15000, 20000, 25000, 35000, 40000]
+TERMS= [36, 60]
+NOTE_STATUSES= ['Current', 'Fully Paid', 'In Grace Period', 'Late (16-30 days)', 'Late (31-120 days)', 'Charged Off']
+NOTE_STATUS_WEIGHTS= [70, 20, 2, 2, 3, 3]
+NOTE_AMOUNT= 25
+
+FIRST_LOAN_ID= 100000000
+
+
+#
+# Define our synthetic data generators
+#
+# Each generator takes a seed so the same arguments always produce the same data.
+#
+
+# Generate available loans ("In Funding") as returned by the listing
+#
+def Listing(count, seed=0, firstId=FIRST_LOAN_ID):
+  generator= random.Random(seed)
+  loans= []
+
+  for id in range(firstId, firstId + count):
+    grade= generator.choices(GRADES, GRADE_WEIGHTS)[0]
+    low, high= GRADE_RATES[grade]
+    loanAmount= generator.choice(LOAN_AMOUNTS)
+    joint= generator.random() < 0.15
+
+    loans.append({
+      'id': id,
+      'grade': grade,
+      'subGrade': grade + str(generator.randint(1, 5)),
+      'intRate': round(generator.uniform(low, high), 2),
+      'term': generator.choice(TERMS),
+      'purpose': generator.choices(PURPOSES, PURPOSE_WEIGHTS)[0],
+      'homeOwnership': generator.choices(HOMES, HOME_WEIGHTS)[0],
+      'empLength': generator.choice(EMPLOYMENT_MONTHS + [None]),
+      'annualInc': round(generator.lognormvariate(11.1, 0.5), -2),
+      'dti': round(generator.uniform(0, 45), 2),
+      'dtiJoint': round(generator.uniform(0, 40), 2) if joint else None,
+      'bcUtil': round(generator.uniform(0, 100), 1),
+      'collections12MthsExMed': generator.choices([0, 1, 2], [94, 5, 1])[0],
+      'taxLiens': generator.choices([0, 1], [97, 3])[0],
+      'mthsSinceLastDelinq': generator.choice([None, None, None, 3, 8, 14, 30, 60]),
+      'mthsSinceLastRecord': generator.choice([None, None, None, None, 20, 50, 90]),
+      'mthsSinceLastMajorDerog': generator.choice([None, None, None, 10, 30, 60]),
+      'loanAmount': loanAmount,
+      'fundedAmount': round(loanAmount * generator.choice([0, 0, 0.1, 0.25, 0.5, 0.75, 0.9, 0.98]) / NOTE_AMOUNT) * NOTE_AMOUNT,
+    })
+
+  return loans
+
+
+# Generate owned notes as returned by the detailed notes listing
+#
+def OwnedNotes(count, seed=0, firstLoanId=FIRST_LOAN_ID - 10000000):
+  generator= random.Random(seed)
+  notes= []
+  lastOrder= datetime.date(2020, 1, 1)
+
+  for noteId in range(1, count + 1):
+    grade= generator.choices(GRADES, GRADE_WEIGHTS)[0]
+    low, high= GRADE_RATES[grade]
+    rate= round(generator.uniform(low, high), 2)
+    status= generator.choices(NOTE_STATUSES, NOTE_STATUS_WEIGHTS)[0]
+    noteAmount= NOTE_AMOUNT * generator.choice([1, 1, 1, 2, 4])
+    if status == 'Fully Paid':
+      principalReceived= noteAmount
+    else:
+      principalReceived= round(noteAmount * generator.uniform(0, 0.9), 2)
+    interestReceived= round(principalReceived * rate / 100 * generator.uniform(0.5, 2), 2)
+    if status == 'Charged Off':
+      principalPending= 0
+    else:
+      principalPending= round(noteAmount - principalReceived, 2)
+
+    notes.append({
+      'noteId': noteId,
+      'loanId': firstLoanId + generator.randrange(count * 2),
+      'orderId': 1000000 + noteId // 10,
+      'grade': grade + str(generator.randint(1, 5)),
+      'interestRate': rate,
+      'loanStatus': status,
+      'noteAmount': noteAmount,
+      'principalPending': principalPending,
+      'principalReceived': principalReceived,
+      'interestReceived': interestReceived,
+      'paymentsReceived': round(principalReceived + interestReceived, 2),
+      'orderDate': (lastOrder - datetime.timedelta(days=generator.randrange(1500))).isoformat() + 'T00:00:00.000-08:00',
+    })
+
+  return notes
+
+
+# Summarize an account holding the given notes
+#
+def Summary(id, notes, cash):
+  outstanding= sum(note['principalPending'] for note in notes)
+  return {
+    'investorId': id,
+    'availableCash': cash,
+    'accountTotal': round(cash + outstanding, 2),
+    'accruedInterest': 0,
+    'infundingBalance': 0,
+    'receivedInterest': round(sum(note['interestReceived'] for note in notes), 2),
+    'receivedPrincipal': round(sum(note['principalReceived'] for note in notes), 2),
+    'receivedLateFees': 0,
+    'outstandingPrincipal': round(outstanding, 2),
+    'totalNotes': len(notes),
+    'totalPortfolios': 0,
+  }
+
+
+#
+# Define our simulated order outcomes
+#
+
+# Amount of a note order that fills, in whole notes, as far as the loan's remaining amount and our
+# cash allow; orders missing the fill rate lose out to other investors and fill fewer whole notes
+# (none for an order of a single note or less)
+#
+def FilledAmount(generator, requested, remaining, cash, fillRate):
+  invested= min(requested, remaining, cash)
+  if generator.random() >= fillRate:
+    invested= min(invested, NOTE_AMOUNT * generator.randrange(max(1, int(requested // NOTE_AMOUNT))))
+  return invested // NOTE_AMOUNT * NOTE_AMOUNT
@@ -7,7 +7,7 @@ setup(name='lcrequest',
       version='1.0.0',
       description='Lending Club API access for automated investing',
       url='https://github.com/nigelboid/lc-investor',
-      py_modules=['lcrequest'],
+      py_modules=['lcrequest', 'lcscreen', 'lcstrategy', 'lcstore', 'lcscript', 'lcratelimit', 'lcallocate', 'lcsynthetic', 'lcmetrics', 'lcprofile', 'lcrecord', 'lcjson', 'lccache'],
       author='Igor S. Livshits',
       license='MIT',
       )
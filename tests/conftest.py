@@ -0,0 +1,119 @@
+#
+# Import all necessary libraries
+#
+
+import argparse
+import itertools
+import os
+import sys
+import threading
+
+import pytest
+
+# our modules and scripts live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import lcscript
+import lcsynthetic
+
+
+#
+# Define our stand-ins and fixtures
+#
+
+# Serve synthetic account data the way LCRequest does
+#
+class SyntheticRequest:
+
+  # Constructor
+  def __init__(self, notes, listing=(), cash=1000.0):
+    self.notes= notes
+    self.listing= listing
+    self.cash= cash
+    self.orders= []
+    self.orderIds= itertools.count(1)
+    self.lock= threading.Lock()
+
+
+  def get_account_summary(self):
+    return lcsynthetic.Summary(1, self.notes, self.cash)
+
+
+  def get_available_notes(self):
+    return self.listing
+
+
+  def get_owned_notes(self):
+    return self.notes
+
+
+  def iter_owned_notes(self, fields=None):
+    for note in self.notes:
+      yield note if fields == None else dict((field, note.get(field)) for field in fields)
+
+
+  def find_portfolio(self, name):
+    return None
+
+
+  def warm(self):
+    pass
+
+
+  def order_capacity(self):
+    return None
+
+
+  def throttle_order(self):
+    return 0
+
+
+  # Fill every order in full
+  def submit_order(self, notes, throttled=False):
+    with self.lock:
+      self.orders.append(notes)
+      orderId= next(self.orderIds)
+    return {'orderInstructId': orderId, 'orderConfirmations': [{'loanId': item['loanId'], 'requestedAmount': item['requestedAmount'], 'investedAmount': item['requestedAmount'], 'executionStatus': ['ORDER_FULFILLED']} for item in notes]}
+
+
+@pytest.fixture(scope='session')
+def investor():
+  return lcscript.LoadScript('lc-auto-invest')
+
+
+@pytest.fixture(scope='session')
+def reporter():
+  return lcscript.LoadScript('lc-report')
+
+
+# Parse and normalize a script's arguments for a test account
+#
+def ScriptOptions(script, arguments=()):
+  return script.NormalizeArguments(script.GetArguments(['--token', 'test', '--id', '1'] + list(arguments)))
+
+
+# Start local Lending Club API stand-in servers, shutting them down after the test
+#
+@pytest.fixture
+def serve():
+  mockServer= lcscript.LoadScript('lc-mock-server')
+  servers= []
+
+  def Serve(arguments=()):
+    server= mockServer.StartServer(mockServer.NormalizeArguments(mockServer.GetArguments(['--port', '0'] + list(arguments))))
+    servers.append(server)
+    return server
+
+  yield Serve
+  for server in servers:
+    server.shutdown()
+    server.server_close()
+
+
+# API client options for a stand-in server (without rate limits or caching unless given)
+#
+def ClientOptions(server, **settings):
+  options= argparse.Namespace(token='test', id='1', debug=False, root=server.root, rateLimit=False, cache=False)
+  for setting in settings:
+    setattr(options, setting, settings[setting])
+  return options
@@ -0,0 +1,226 @@
+#
+# Import all necessary libraries
+#
+
+import datetime
+import time
+
+import pytest
+
+import lcmetrics
+import lcrequest
+import lcsynthetic
+from conftest import ScriptOptions, SyntheticRequest
+
+
+#
+# Define our stand-ins
+#
+
+# Serve one listing before a release and another (with new loans) from the release on
+#
+class ReleasingRequest(SyntheticRequest):
+
+  # Constructor
+  def __init__(self, notes, listing, released, release):
+    SyntheticRequest.__init__(self, notes, listing)
+    self.released= released
+    self.release= release
+    self.polls= 0
+
+
+  def get_available_notes(self):
+    if time.time() < self.release:
+      return self.listing
+    self.polls+= 1
+    return self.released
+
+
+# Let a given number of orders through the rate limit at once, filling a share of each note
+# (and failing orders that include a given loan)
+#
+class OrderingRequest(SyntheticRequest):
+
+  # Constructor
+  def __init__(self, capacity=None, filled=1.0, failing=None):
+    SyntheticRequest.__init__(self, [])
+    self.capacity= capacity
+    self.filled= filled
+    self.failing= failing
+    self.throttles= 0
+
+
+  def order_capacity(self):
+    return self.capacity
+
+
+  def throttle_order(self):
+    with self.lock:
+      self.throttles+= 1
+    return 0
+
+
+  def submit_order(self, notes, throttled=False):
+    assert throttled
+    if any(item['loanId'] == self.failing for item in notes):
+      raise Exception('Order failed (status code 500)')
+    response= SyntheticRequest.submit_order(self, notes, throttled)
+    for confirmation in response['orderConfirmations']:
+      confirmation['investedAmount']= confirmation['requestedAmount'] * self.filled // 25 * 25
+    return response
+
+
+# An order of one $25 note for each of a number of loans
+#
+def BuyList(investor, options, count):
+  return [investor.OrderItem(options, lcsynthetic.FIRST_LOAN_ID + index, 25) for index in range(count)]
+
+
+#
+# Define our tests
+#
+
+def test_next_release(investor):
+  options= ScriptOptions(investor, ['--release-times', '18:00', '06:00'])
+  day= datetime.datetime(2026, 3, 10)
+
+  def At(hour, minute=0, days=0):
+    return time.mktime((day + datetime.timedelta(days=days, hours=hour, minutes=minute)).timetuple())
+
+  assert investor.NextRelease(options, At(5, 59)) == At(6)
+  assert investor.NextRelease(options, At(6)) == At(18)
+  assert investor.NextRelease(options, At(17, 30)) == At(18)
+  assert investor.NextRelease(options, At(18)) == At(6, days=1)
+
+
+def test_poll_listing_waits_for_new_loans(investor):
+  options= ScriptOptions(investor, ['--poll-interval', '0.01', '--poll-duration', '0.2'])
+  listing= lcsynthetic.Listing(20, 1)
+  release= time.time() + 0.05
+  request= ReleasingRequest([], listing, listing + lcsynthetic.Listing(5, 2, lcsynthetic.FIRST_LOAN_ID + 100), release)
+
+  notes, polls= investor.PollListing(options, request, set(note['id'] for note in listing), time.time())
+  assert len(notes) == 25
+  assert polls > 1
+
+  # a listing without new loans is given up on after the poll duration
+  request= ReleasingRequest([], listing, listing, time.time())
+  started= time.time()
+  notes, polls= investor.PollListing(options, request, set(note['id'] for note in listing), started)
+  assert notes == None
+  assert 0.2 <= time.time() - started < 1
+
+
+def test_daemon_buys_from_the_released_listing(investor, monkeypatch):
+  options= ScriptOptions(investor, ['--daemon', '--lead-time', '0.2', '--poll-interval', '0.01', '--poll-duration', '2', '--grade', 'B', '100', '--quiet'])
+  listing= lcsynthetic.Listing(300, 1)
+  added= lcsynthetic.Listing(100, 2, lcsynthetic.FIRST_LOAN_ID + 1000)
+  release= time.time() + 0.3
+  request= ReleasingRequest(lcsynthetic.OwnedNotes(50, 3), listing, listing + added, release)
+
+  # one release, then stop
+  releases= [release]
+  def NextRelease(options, now):
+    if len(releases) == 0:
+      raise KeyboardInterrupt()
+    return releases.pop()
+  monkeypatch.setattr(investor, 'NextRelease', NextRelease)
+
+  with pytest.raises(KeyboardInterrupt):
+    investor.RunDaemon(options, request)
+
+  assert request.polls >= 1
+  assert len(request.orders) == 1
+  ordered= sum(item['requestedAmount'] for item in request.orders[0])
+  assert 0 < ordered <= request.cash
+  # the listing was screened ahead of the release, so only the new loans were screened after it
+  assert options.verdicts.changed == len(added)
+
+
+@pytest.mark.parametrize('capacity, sizes', [(None, [10] * 11 + [7]), (50, [10] * 11 + [7]), (2, [59, 58]), (0, [117])])
+def test_order_chunks_follow_the_rate_limit(investor, capacity, sizes):
+  options= ScriptOptions(investor, ['--order-chunk-size', '10', '--quiet'])
+  request= OrderingRequest(capacity)
+  buyList= BuyList(investor, options, 117)
+
+  response= investor.SubmitOrder(options, request, buyList)
+  assert sorted((len(order) for order in request.orders), reverse=True) == sizes
+  assert request.throttles == len(sizes)
+  # confirmations and order IDs come back in chunk order
+  assert [confirmation['loanId'] for confirmation in response['orderConfirmations']] == [item['loanId'] for item in buyList]
+  assert sorted(response.get('orderInstructIds', [response['orderInstructId']])) == list(range(1, len(sizes) + 1))
+
+  # an order within the chunk size is never split
+  request= OrderingRequest(capacity)
+  investor.SubmitOrder(options, request, buyList[:10])
+  assert len(request.orders) == 1
+
+
+def test_merge_responses(investor):
+  confirmations= [{'loanId': loanId, 'requestedAmount': 25, 'investedAmount': 25, 'executionStatus': ['ORDER_FULFILLED']} for loanId in range(4)]
+  merged= investor.MergeResponses([
+    {'orderInstructId': 7, 'orderConfirmations': confirmations[:2]},
+    {'orderInstructId': None, 'orderConfirmations': []},
+    {'orderInstructId': 8, 'orderInstructIds': [8, 9], 'orderConfirmations': confirmations[2:], 'failedChunks': ['order of 1 note failed']},
+  ])
+  assert merged == {'orderInstructId': 7, 'orderInstructIds': [7, 8, 9], 'orderConfirmations': confirmations, 'failedChunks': ['order of 1 note failed']}
+  assert investor.MergeResponses([{'orderInstructId': None, 'orderConfirmations': []}]) == {'orderInstructId': None, 'orderConfirmations': []}
+
+
+def test_failed_chunks_keep_what_executed(investor):
+  options= ScriptOptions(investor, ['--order-chunk-size', '10', '--quiet'])
+  buyList= BuyList(investor, options, 30)
+  request= OrderingRequest(failing=buyList[15]['loanId'])
+
+  response= investor.SubmitChunks(options, request, buyList)
+  assert [confirmation['loanId'] for confirmation in response['orderConfirmations']] == [item['loanId'] for item in buyList[:10] + buyList[20:]]
+  assert len(response['failedChunks']) == 1
+
+  # the money spent is counted before the failure is raised
+  with pytest.raises(Exception, match='1 of the order chunks failed'):
+    investor.SubmitOrder(options, request, buyList)
+  assert options.metrics.counters[lcmetrics.COUNTER_CASH] == 20 * 25
+
+  # when every chunk fails there is nothing to keep
+  request= OrderingRequest(failing=buyList[0]['loanId'])
+  with pytest.raises(Exception, match='status code 500'):
+    investor.SubmitChunks(options, request, buyList[:10])
+
+
+def test_unfilled_amounts_are_reinvested(investor):
+  options= ScriptOptions(investor, ['--maximum-amount-per-note', '100', '--refill-rounds', '1', '--quiet'])
+  candidates= lcsynthetic.Listing(200, 5)
+  account= {investor.KEY_CANDIDATES: {'B': candidates}}
+  buyList= [investor.OrderItem(options, note['id'], 100) for note in candidates[:4]]
+  request= OrderingRequest(filled=0.5)
+
+  response= investor.SubmitOrder(options, request, buyList, account)
+  assert len(request.orders) == 2
+  # half of the $400 went unfilled, so $200 more goes to the next loans never ordered
+  refill= request.orders[1]
+  assert sum(item['requestedAmount'] for item in refill) == 200
+  assert set(item['loanId'] for item in refill).isdisjoint(item['loanId'] for item in buyList)
+  assert set(item['loanId'] for item in refill) <= set(note['id'] for note in candidates)
+  assert len(response['orderConfirmations']) == len(buyList) + len(refill)
+
+
+def test_rate_limited_orders_wait_outside_the_submit_span(investor, serve):
+  server= serve(['--listing-size', '150', '--cash', '10000'])
+  options= ScriptOptions(investor, ['--api-root', server.root, '--order-chunk-size', '10', '--rate-limit', 'orders', '1', '2', '--no-cache', '--quiet'])
+
+  with lcrequest.LCRequest(options) as request:
+    buyList= [investor.OrderItem(options, note['id'], 25) for note in request.get_available_notes()[:117]]
+    started= time.time()
+    response= investor.SubmitOrder(options, request, buyList)
+    # the order goes out as only as many chunks as the orders bucket lets through at once
+    assert time.time() - started < 0.9
+    assert len(response['orderInstructIds']) == 2
+    assert sum(confirmation['investedAmount'] for confirmation in response['orderConfirmations']) == 117 * 25
+
+    # with the bucket spent, the next order waits for a token before its submit span starts
+    investor.SubmitOrder(options, request, buyList[:5])
+
+  spans= [(name, seconds) for name, started, seconds in options.metrics.spans]
+  assert max(seconds for name, seconds in spans if name == lcmetrics.SPAN_THROTTLE) > 0.5
+  assert max(seconds for name, seconds in spans if name == lcmetrics.SPAN_SUBMIT) < 0.5
+  assert len([name for name, seconds in spans if name == lcmetrics.SPAN_SUBMIT]) == 3
@@ -0,0 +1,93 @@
+#
+# Import all necessary libraries
+#
+
+import copy
+import random
+
+import pytest
+
+import lcscript
+import lcsynthetic
+
+
+#
+# Define our stand-ins and fixtures
+#
+
+@pytest.fixture(scope='module')
+def backtester():
+  return lcscript.LoadScript('lc-backtest')
+
+
+# Parse lc-backtest options (and the lc-auto-invest options of its replayed runs)
+#
+def BacktestOptions(backtester, investor, arguments=()):
+  options= backtester.NormalizeArguments(backtester.GetArguments(['--snapshot-log', 'unused'] + list(arguments)))
+  return options, backtester.InvestOptions(investor, options)
+
+
+# Listings recorded every few hours, each with some new loans
+#
+def Listings(count, hours=4):
+  return [(1767225600 + index * hours * 3600, lcsynthetic.Listing(100, index, lcsynthetic.FIRST_LOAN_ID + index * 50)) for index in range(count)]
+
+
+#
+# Define our tests
+#
+
+def test_filled_amounts():
+  generator= random.Random(1)
+  assert lcsynthetic.FilledAmount(generator, 100, 1000, 1000, 1) == 100
+  # filled in whole notes, as far as the loan and our cash allow
+  assert lcsynthetic.FilledAmount(generator, 100, 60, 1000, 1) == 50
+  assert lcsynthetic.FilledAmount(generator, 100, 1000, 40, 1) == 25
+
+  # orders missing the fill rate get fewer whole notes, and none for a single note or less
+  for requested in [10, 25, 30]:
+    assert lcsynthetic.FilledAmount(generator, requested, 1000, 1000, 0) == 0
+  partial= [lcsynthetic.FilledAmount(generator, 100, 1000, 1000, 0) for attempt in range(200)]
+  assert set(partial) == {0, 25, 50, 75}
+
+
+def test_replayed_orders_fill_like_the_stand_in_server(backtester, investor):
+  options, investOptions= BacktestOptions(backtester, investor, ['--fill-rate', '0', '--cash', '1000'])
+  request= backtester.ReplayRequest(options, options.cash, [])
+  loans= lcsynthetic.Listing(20, 1)
+  recorded= copy.deepcopy(loans)
+  request.advance(1767225600)
+  request.list(loans)
+
+  # orders below a note no longer fail to draw a partial fill
+  response= request.submit_order([{'loanId': loan['id'], 'requestedAmount': amount} for loan, amount in zip(loans, [10, 25, 50, 100])])
+  invested= [confirmation['investedAmount'] for confirmation in response['orderConfirmations']]
+  assert invested[:2] == [0, 0]
+  assert request.cash == 1000 - sum(invested)
+  assert len(request.notes) == len([amount for amount in invested if amount > 0])
+  # recorded loans are never modified
+  assert loans == recorded
+
+  request.fillRate= 1
+  response= request.submit_order([{'loanId': loans[10]['id'], 'requestedAmount': 100}, {'loanId': 1, 'requestedAmount': 25}])
+  assert [confirmation['executionStatus'] for confirmation in response['orderConfirmations']] == [['ORDER_FULFILLED'], ['NOT_AN_IN_FUNDING_LOAN']]
+
+  # bought notes repay monthly
+  request.advance(1767225600 + 40 * 86400)
+  assert request.repaid > 0
+  assert request.notes[-1]['loanStatus'] == 'Current'
+
+
+def test_simulated_replays_are_reproducible(backtester, investor):
+  results= []
+  for attempt in range(2):
+    options, investOptions= BacktestOptions(backtester, investor, ['--fill-rate', '0.5', '--seed', '3', '--cash', '2000', '--', '--grade', 'B', '60', '--grade', 'C', '40', '--order-chunk-size', '5'])
+    request= backtester.ReplayRequest(options, options.cash, [])
+    assert backtester.Simulate(options, investor, investOptions, request, Listings(6)) == 0
+    results.append((request.fills, request.cash, request.repaid))
+
+  assert results[0] == results[1]
+  fills, cash, repaid= results[0]
+  assert len(fills) > 0
+  # every dollar is accounted for
+  assert cash == pytest.approx(2000 - sum(fill[2] for fill in fills) + repaid)
@@ -0,0 +1,61 @@
+#
+# Import all necessary libraries
+#
+
+import json
+import urllib.error
+import urllib.request
+
+
+#
+# Define our helpers
+#
+
+# Issue one request to a stand-in server, returning its status and decoded body
+#
+def Fetch(server, path, payload=None):
+  data= None if payload == None else json.dumps(payload).encode('utf-8')
+  request= urllib.request.Request(server.root + path, data=data, headers={'Authorization': 'test', 'Content-Type': 'application/json'})
+  try:
+    with urllib.request.urlopen(request) as response:
+      return response.status, json.loads(response.read())
+  except urllib.error.HTTPError as error:
+    return error.code, json.loads(error.read())
+
+
+# Run the same requests against a fresh server, recording every outcome
+#
+def Session(serve, arguments):
+  server= serve(arguments)
+  status, body= Fetch(server, 'loans/listing')
+  while status != 200:
+    status, body= Fetch(server, 'loans/listing')
+  loans= body['loans']
+
+  outcomes= [Fetch(server, 'accounts/1/summary')[0] for attempt in range(40)]
+  for loan in loans[:20]:
+    outcomes.append(Fetch(server, 'accounts/1/orders', {'aid': 1, 'orders': [{'loanId': loan['id'], 'requestedAmount': 100}]}))
+  return outcomes
+
+
+#
+# Define our tests
+#
+
+def test_seeded_runs_are_reproducible(serve):
+  arguments= ['--error-rate', '0.3', '--jitter', '0.001', '--fill-rate', '0.5']
+  first= Session(serve, arguments + ['--seed', '7'])
+  assert first == Session(serve, arguments + ['--seed', '7'])
+  assert first != Session(serve, arguments + ['--seed', '8'])
+
+  # the injected failures and partial fills both happened
+  assert {200, 500, 503} <= set(outcome for outcome in first[:40])
+  assert any(status == 200 and body['orderConfirmations'][0]['investedAmount'] < 100 for status, body in first[40:])
+
+
+def test_orders_of_one_note_or_less_partially_filled(serve):
+  server= serve(['--fill-rate', '0', '--cash', '1000'])
+  loans= Fetch(server, 'loans/listing')[1]['loans']
+  status, body= Fetch(server, 'accounts/1/orders', {'aid': 1, 'orders': [{'loanId': loans[0]['id'], 'requestedAmount': 25}, {'loanId': loans[1]['id'], 'requestedAmount': 10}]})
+  assert status == 200
+  assert [confirmation['investedAmount'] for confirmation in body['orderConfirmations']] == [0, 0]
@@ -0,0 +1,35 @@
+#
+# Import all necessary libraries
+#
+
+import argparse
+import json
+import sys
+
+import lcscript
+
+
+#
+# Define our tests
+#
+
+def test_run_once_exports_one_run_per_account_task(serve, tmp_path, monkeypatch):
+  orchestrator= lcscript.LoadScript('lc-orchestrate')
+  server= serve(['--cash', '200'])
+  monkeypatch.setattr(sys, 'stdout', orchestrator.ThreadOutput(sys.stdout))
+
+  metrics= dict((name, tmp_path / '{}.jsonl'.format(name)) for name in ['first', 'second'])
+  accounts= [
+    {'name': 'first', 'id': 1, 'token': 'test', 'invest': ['--quiet', '--metrics-jsonl', str(metrics['first'])], 'report': []},
+    {'name': 'second', 'id': 2, 'token': 'test', 'invest': ['--quiet', '--metrics-jsonl', str(metrics['second'])]},
+  ]
+  options= argparse.Namespace(root=server.root, workers=2, simulation=False, debug=False, output=None)
+
+  outcomes= orchestrator.RunOnce(options, accounts)
+  assert [(outcome['account'], outcome['task'], outcome['status']) for outcome in outcomes] == [('first', 'invest', 'ok'), ('first', 'report', 'ok'), ('second', 'invest', 'ok')]
+
+  # the shared listing fetch keeps no metrics of its own, so each investing run exports once
+  for name in metrics:
+    runs= [record for record in map(json.loads, metrics[name].read_text().splitlines()) if 'run' in record and 'span' not in record]
+    assert len(runs) == 1
+    assert runs[0]['script'] == 'lc-auto-invest'
@@ -0,0 +1,40 @@
+#
+# Import all necessary libraries
+#
+
+import pytest
+
+import lcscreen
+import lcstore
+import lcsynthetic
+from conftest import ScriptOptions, SyntheticRequest
+
+
+#
+# Define our tests
+#
+
+@pytest.mark.skipif(not lcscreen.Available(), reason='NumPy is not installed')
+@pytest.mark.parametrize('count, seed', [(0, 1), (1, 2), (50, 3), (5000, 4)])
+def test_column_engine_compiles_the_same_performance(reporter, count, seed):
+  notes= lcsynthetic.OwnedNotes(count, seed)
+  performance, statusCodes= reporter.CompilePerformance(notes)
+  columnPerformance, columnStatusCodes= reporter.CompilePerformanceColumns(iter(notes))
+
+  # sums accumulate in note order, so they match to the last bit
+  assert columnPerformance == performance
+  assert list(columnStatusCodes.items()) == list(statusCodes.items())
+
+
+@pytest.mark.skipif(not lcscreen.Available(), reason='NumPy is not installed')
+def test_engines_and_store_print_the_same_report(reporter, tmp_path, capsys):
+  request= SyntheticRequest(lcsynthetic.OwnedNotes(2000, 5))
+  reports= []
+  for arguments in [[], ['--engine', 'numpy'], ['--store', str(tmp_path / 'notes.db')]]:
+    reporter.GetPerformanceDetails(ScriptOptions(reporter, arguments), request)
+    reports.append(capsys.readouterr().out)
+
+  assert reports[1] == reports[0]
+  assert reports[2] == reports[0]
+  with lcstore.NoteStore(str(tmp_path / 'notes.db'), 1) as store:
+    assert list(store.status_counts().items()) == list(reporter.CompilePerformanceColumns(request.notes)[1].items())
@@ -0,0 +1,90 @@
+#
+# Import all necessary libraries
+#
+
+import json
+
+import pytest
+
+import lcrecord
+import lcscript
+import lcsynthetic
+
+
+#
+# Define our stand-ins and fixtures
+#
+
+@pytest.fixture(scope='module')
+def sweeper():
+  return lcscript.LoadScript('lc-sweep')
+
+
+# Parse lc-sweep options with a grid file
+#
+def SweepOptions(sweeper, tmp_path, grid, arguments=()):
+  path= tmp_path / 'grid.json'
+  path.write_text(json.dumps(grid))
+  return sweeper.NormalizeArguments(sweeper.GetArguments(['--snapshot-log', str(tmp_path / 'snapshots.log'), '--grid', str(path)] + list(arguments)))
+
+
+#
+# Define our tests
+#
+
+def test_grid_expands_every_combination(sweeper, tmp_path):
+  grid= {'dti': [30, 40], '--grade': [['A 50', 'B 50'], ['A 30', 'B 70']]}
+  options= SweepOptions(sweeper, tmp_path, grid, ['--param', 'chase-yield', 'true', 'False', '--seed', '5', '--', '--allocation', 'yield'])
+  assert list(options.grid) == ['--dti', '--grade', '--chase-yield']
+  assert options.backtestArguments == ['--snapshot-log', str(tmp_path / 'snapshots.log'), '--seed', '5']
+
+  combinations= sweeper.Combinations(options)
+  assert len(combinations) == 2 * 2 * 2
+  assert combinations[0] == (['--allocation', 'yield', '--dti', '30', '--grade', 'A', '50', '--grade', 'B', '50', '--chase-yield'], ['30', 'A50,B50', 'yes'])
+  assert combinations[-1] == (['--allocation', 'yield', '--dti', '40', '--grade', 'A', '30', '--grade', 'B', '70'], ['40', 'A30,B70', 'no'])
+  # every combination is distinct
+  assert len(set(tuple(arguments) for arguments, labels in combinations)) == len(combinations)
+  sweeper.Validate(combinations)
+
+
+def test_alternatives_become_arguments(sweeper):
+  assert sweeper.OptionName('dti') == '--dti'
+  assert sweeper.OptionName('-g') == '-g'
+  assert [sweeper.ParameterValue(value) for value in ['TRUE', 'false', '30', 'A 50']] == [True, False, '30', 'A 50']
+  assert sweeper.OptionArguments('--eat-cash', None) == []
+  assert sweeper.OptionArguments('--grade', ['A 50', ['B 25', 'C 25']]) == ['--grade', 'A', '50', '--grade', 'B', '25', '--grade', 'C', '25']
+  assert sweeper.Label(['A 50', True, None, 2.5]) == 'A50,yes,no,2.5'
+
+
+def test_bad_grids_are_rejected(sweeper, tmp_path):
+  for grid in [[30, 40], {'dti': []}, {'dti': 30}]:
+    with pytest.raises(Exception, match='[Gg]rid'):
+      SweepOptions(sweeper, tmp_path, grid)
+  with pytest.raises(Exception, match='at least one value'):
+    SweepOptions(sweeper, tmp_path, {'dti': [30]}, ['--param', 'dti'])
+
+  # combinations lc-auto-invest would reject fail before any replay
+  options= SweepOptions(sweeper, tmp_path, {'dti': [30, 'many']})
+  with pytest.raises(Exception, match='rejected a combination'):
+    sweeper.Validate(sweeper.Combinations(options))
+
+
+def test_combinations_replay_and_rank(sweeper, tmp_path):
+  recorder= lcrecord.SnapshotRecorder(str(tmp_path / 'snapshots.log'))
+  for index in range(4):
+    recorder.record(lcrecord.KIND_LISTING, lcsynthetic.Listing(200, index, lcsynthetic.FIRST_LOAN_ID + index * 100), 1767225600.0 + index * 4 * 3600)
+  recorder.close()
+
+  options= SweepOptions(sweeper, tmp_path, {'grade': ['A 100', 'B 100', 'C 100']}, ['--cash', '1000', '--rank-by', 'rate'])
+  combinations= sweeper.Combinations(options) + [(['--dti', 'many'], ['bad'])]
+
+  # evaluate in this process the way each worker does
+  sweeper.InitializeWorker(options.backtestArguments)
+  results= [sweeper.Evaluate(index, arguments) for index, (arguments, labels) in enumerate(combinations)]
+  assert [result['failures'] for result in results[:3]] == [0, 0, 0]
+  assert 'error' in results[3]
+
+  # riskier grades buy at higher rates, and failed combinations rank last
+  ranked= sweeper.Rank(options, results)
+  assert [result['index'] for result in ranked] == [2, 1, 0, 3]
+  assert all(0 < result['deployed'] <= 1000 for result in ranked[:3])
@@ -0,0 +1,80 @@
+#
+# Import all necessary libraries
+#
+
+import itertools
+import random
+
+import lcallocate
+import lcsynthetic
+
+
+#
+# Define our reference allocation
+#
+
+# The two-pass loop SpreadUnits replaced: one minimum investment each to as many notes as
+# possible, then one more to each note in rounds (in amounts, as ComposeOrder used to count)
+#
+def TwoPassAmounts(notes, units, minimum, maximum):
+  cash= units * minimum
+  orders= {}
+  unfunded= {}
+  count= 0
+  spent= 0
+
+  for note in notes:
+    if (note['loanAmount'] - note['fundedAmount']) >= minimum and (spent + minimum) <= cash:
+      orders[note['id']]= minimum
+      unfunded[note['id']]= note['loanAmount'] - note['fundedAmount'] - minimum
+      count+= 1
+      spent+= minimum
+      if (spent + minimum) > cash or count == units:
+        break
+
+  while (spent + minimum) <= cash and count < units and len(unfunded) > 0:
+    for id in list(unfunded):
+      if unfunded[id] >= minimum and (orders[id] + minimum) <= maximum:
+        orders[id]+= minimum
+        unfunded[id]-= minimum
+        count+= 1
+        spent+= minimum
+        if (spent + minimum) > cash or count == units:
+          break
+      else:
+        del unfunded[id]
+
+  return orders
+
+
+def SpreadAmounts(notes, units, minimum, maximum):
+  return dict((note['id'], taken * minimum) for note, taken in lcallocate.SpreadUnits(notes, units, minimum, maximum) if taken > 0)
+
+
+#
+# Define our tests
+#
+
+def test_spread_units_matches_two_pass_loop():
+  for seed, count, units, (minimum, maximum) in itertools.product(range(8), [0, 1, 3, 40, 400], [1, 2, 7, 50, 1000], [(25, 25), (25, 100), (25, 1000), (50, 120), (25, 10)]):
+    notes= lcsynthetic.Listing(count, seed)
+    assert SpreadAmounts(notes, units, minimum, maximum) == TwoPassAmounts(notes, units, minimum, maximum), (seed, count, units, minimum, maximum)
+
+
+def test_spread_units_on_nearly_funded_notes():
+  generator= random.Random(3)
+  for trial in range(200):
+    notes= [{'id': id, 'loanAmount': 1000, 'fundedAmount': 1000 - 25 * generator.randrange(6)} for id in range(generator.randrange(1, 30))]
+    units= generator.randrange(1, 60)
+    assert SpreadAmounts(notes, units, 25, 75) == TwoPassAmounts(notes, units, 25, 75), trial
+
+
+def test_spread_units_keeps_note_order_and_limits():
+  notes= lcsynthetic.Listing(100, 5)
+  allocations= lcallocate.SpreadUnits(notes, 37, 25, 100)
+
+  order= [note['id'] for note in notes]
+  assert [order.index(note['id']) for note, taken in allocations] == sorted(order.index(note['id']) for note, taken in allocations)
+  assert sum(taken for note, taken in allocations) <= 37
+  for note, taken in allocations:
+    assert taken <= lcallocate.NoteUnits(note, 25, 100)
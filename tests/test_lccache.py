@@ -0,0 +1,143 @@
+#
+# Import all necessary libraries
+#
+
+import pytest
+
+import lccache
+import lcrequest
+from conftest import ClientOptions
+
+
+#
+# Define our stand-ins
+#
+
+# A clock that only moves when told to
+#
+class Clock:
+
+  # Constructor
+  def __init__(self):
+    self.now= 1000000.0
+
+
+  def time(self):
+    return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+  clock= Clock()
+  monkeypatch.setattr(lccache, 'time', clock)
+  return clock
+
+
+#
+# Define our tests
+#
+
+def test_responses_stay_fresh_for_their_time_to_live(clock):
+  cache= lccache.ResponseCache({lccache.CACHE_SUMMARY: 10})
+  summary= {'availableCash': 100}
+  cache.put('1', lccache.CACHE_SUMMARY, summary)
+  # listings are never cached by default
+  cache.put('1', lccache.CACHE_LISTING, [{'id': 1}])
+  assert cache.get('1', lccache.CACHE_LISTING) == None
+
+  # callers get copies, so changing one changes neither the cache nor the caller's response
+  cached= cache.get('1', lccache.CACHE_SUMMARY)
+  cached['availableCash']= 0
+  summary['availableCash']= 50
+  assert cache.get('1', lccache.CACHE_SUMMARY) == {'availableCash': 100}
+  assert cache.get('2', lccache.CACHE_SUMMARY) == None
+
+  clock.now+= 9.9
+  assert cache.get('1', lccache.CACHE_SUMMARY) == {'availableCash': 100}
+  clock.now+= 0.1
+  assert cache.get('1', lccache.CACHE_SUMMARY) == None
+
+
+def test_invalidation_forgets_only_the_named_classes():
+  cache= lccache.ResponseCache({lccache.CACHE_NOTES: 60})
+  for account in ['1', '2']:
+    cache.put(account, lccache.CACHE_SUMMARY, {'availableCash': 100})
+    cache.put(account, lccache.CACHE_NOTES, [])
+  cache.put('1', lccache.CACHE_PORTFOLIOS, [])
+
+  cache.invalidate('1', [lccache.CACHE_SUMMARY, lccache.CACHE_NOTES])
+  assert cache.get('1', lccache.CACHE_SUMMARY) == None
+  assert cache.get('1', lccache.CACHE_NOTES) == None
+  assert cache.get('1', lccache.CACHE_PORTFOLIOS) == []
+  assert cache.get('2', lccache.CACHE_SUMMARY) == {'availableCash': 100}
+  assert cache.get('2', lccache.CACHE_NOTES) == []
+
+
+def test_bad_times_to_live_are_rejected():
+  with pytest.raises(Exception, match='Unknown cache class'):
+    lccache.ResponseCache({'orders': 10})
+  with pytest.raises(Exception, match='must not be negative'):
+    lccache.ResponseCache({lccache.CACHE_SUMMARY: -1})
+
+
+def test_portfolio_ids_never_expire(clock):
+  cache= lccache.ResponseCache()
+  assert cache.portfolio('1', 'auto') == None
+  cache.remember('1', {'auto': 7, 'manual': 8})
+  clock.now+= 365 * 86400
+  assert cache.portfolio('1', 'auto') == 7
+  assert cache.portfolio('2', 'auto') == None
+  cache.remember('1', {'auto': 9})
+  assert (cache.portfolio('1', 'auto'), cache.portfolio('1', 'manual')) == (9, 8)
+
+
+def test_cache_files_are_shared_between_processes(tmp_path):
+  path= str(tmp_path / 'cache.json')
+  # each cache stands in for another process using the same file
+  writer= lccache.ResponseCache(path=path)
+  reader= lccache.ResponseCache(path=path)
+  writer.put('1', lccache.CACHE_SUMMARY, {'availableCash': 100})
+  writer.remember('1', {'auto': 7})
+  assert reader.get('1', lccache.CACHE_SUMMARY) == {'availableCash': 100}
+  assert reader.portfolio('1', 'auto') == 7
+
+  reader.invalidate('1', [lccache.CACHE_SUMMARY])
+  assert writer.get('1', lccache.CACHE_SUMMARY) == None
+
+  # a damaged file only costs a few round trips
+  (tmp_path / 'cache.json').write_text('{"responses": ')
+  assert reader.get('1', lccache.CACHE_SUMMARY) == None
+  reader.remember('1', {'auto': 7})
+  assert writer.portfolio('1', 'auto') == 7
+
+
+def test_clients_with_the_same_settings_share_a_cache(tmp_path):
+  assert lccache.SharedCache({lccache.CACHE_SUMMARY: 5}) is lccache.SharedCache({lccache.CACHE_SUMMARY: 5})
+  assert lccache.SharedCache({lccache.CACHE_SUMMARY: 5}) is not lccache.SharedCache({lccache.CACHE_SUMMARY: 6})
+  path= tmp_path / 'cache.json'
+  assert lccache.SharedCache(path=str(path)) is lccache.SharedCache(path=str(path.parent / '.' / path.name))
+
+
+def test_client_skips_round_trips_for_fresh_responses(serve, tmp_path):
+  server= serve(['--cash', '500'])
+  options= ClientOptions(server, cache=True, cacheFile=str(tmp_path / 'cache.json'))
+  with lcrequest.LCRequest(options) as request:
+    loans= request.get_available_notes()
+    assert request.get_account_summary() == request.get_account_summary()
+    assert request.find_portfolio('auto') == None
+    portfolioId= request.create_portfolio('auto', 'Automatically created')['portfolioId']
+
+    # an order invalidates the summary it changes
+    request.submit_order([{'loanId': loans[0]['id'], 'requestedAmount': 25}])
+    assert request.get_account_summary()['availableCash'] == 475
+    statistics= request.transportStats.endpoints
+
+  assert statistics[lcrequest.REQUEST_SUMMARY]['calls'] == 2
+  assert statistics[lcrequest.REQUEST_SUMMARY]['hits'] == 1
+
+  # a later run finds the portfolio without asking for the list of portfolios again
+  with lcrequest.LCRequest(options) as request:
+    assert request.find_portfolio('auto') == portfolioId
+    assert request.get_available_notes() != None
+    assert lcrequest.REQUEST_PORTFOLIOS not in request.transportStats.endpoints
+    assert request.transportStats.endpoints[lcrequest.REQUEST_LOANS]['calls'] == 1
@@ -0,0 +1,73 @@
+#
+# Import all necessary libraries
+#
+
+import json
+
+import pytest
+
+import lcjson
+import lcrequest
+import lcsynthetic
+from conftest import ClientOptions
+
+
+#
+# Define some global constants
+#
+
+INSTALLED= [backend for backend in lcjson.BACKENDS if backend != lcjson.BACKEND_AUTO and lcjson.available(backend)]
+MISSING= [backend for backend in lcjson.BACKENDS if not lcjson.available(backend)]
+
+LISTING= {'asOfDate': '2026-01-01T06:00:00.000-08:00', 'loans': lcsynthetic.Listing(20, 1)}
+
+
+#
+# Define our tests
+#
+
+@pytest.mark.parametrize('backend', INSTALLED)
+@pytest.mark.parametrize('body', [json.dumps(LISTING), json.dumps(LISTING).encode('utf-8')])
+def test_backends_decode_like_the_standard_library(backend, body):
+  expected= json.loads(body)
+  assert lcjson.Decoder(backend).decode(body) == expected
+  assert lcjson.Decoder(backend).decode(body, 'loans') == expected
+  assert lcjson.Decoder(backend).decode('[1, 2.5, "three", null]') == [1, 2.5, 'three', None]
+
+
+@pytest.mark.parametrize('backend', INSTALLED)
+def test_key_only_decoding_keeps_one_key(backend):
+  decoder= lcjson.Decoder(backend, keyOnly=True)
+  body= json.dumps(LISTING).encode('utf-8')
+  assert decoder.decode(body, 'loans') == {'loans': LISTING['loans']}
+  assert decoder.decode(body, 'myNotes') == {}
+  # without a key (or for a body that is not an object) the whole body comes back
+  assert decoder.decode(body) == LISTING
+  assert decoder.decode('[1, 2]', 'loans') == [1, 2]
+
+
+def test_auto_picks_the_first_installed_backend():
+  assert lcjson.Decoder().backend == [backend for backend in lcjson.PREFERENCE if lcjson.available(backend)][0]
+  assert lcjson.Decoder(keyOnly=True).backend == [backend for backend in lcjson.PREFERENCE_KEY_ONLY if lcjson.available(backend)][0]
+  assert lcjson.available(lcjson.BACKEND_STDLIB)
+  assert repr(lcjson.Decoder(lcjson.BACKEND_STDLIB, keyOnly=True)) == 'Decoder(json, key only)'
+
+
+@pytest.mark.skipif(len(MISSING) == 0, reason='Every JSON backend is installed')
+def test_missing_backends_are_rejected():
+  with pytest.raises(Exception, match='not installed'):
+    lcjson.Decoder(MISSING[0])
+
+
+@pytest.mark.parametrize('backend', INSTALLED)
+def test_client_decodes_each_response_once(serve, backend, monkeypatch):
+  server= serve(['--seed', '4', '--listing-size', '50'])
+  with lcrequest.LCRequest(ClientOptions(server)) as request:
+    expected= request.get_available_notes()
+
+  bodies= []
+  decode= lcjson.Decoder.decode
+  monkeypatch.setattr(lcjson.Decoder, 'decode', lambda self, body, key=None: bodies.append(key) or decode(self, body, key))
+  with lcrequest.LCRequest(ClientOptions(server, jsonDecoder=backend, decodeKeyOnly=True)) as request:
+    assert request.get_available_notes() == expected
+  assert bodies == [lcrequest.KEY_LOANS]
@@ -0,0 +1,80 @@
+#
+# Import all necessary libraries
+#
+
+import json
+
+import lcmetrics
+from conftest import ScriptOptions
+
+
+#
+# Define our helpers
+#
+
+# Read back the runs (closing lines) and spans of a JSON lines export
+#
+def Exported(path):
+  records= [json.loads(line) for line in path.read_text().splitlines()] if path.exists() else []
+  return [record for record in records if 'run' in record], [record for record in records if 'span' in record]
+
+
+#
+# Define our tests
+#
+
+def test_export_writes_spans_and_counters(tmp_path):
+  metrics= lcmetrics.Metrics('test', str(tmp_path / 'metrics.jsonl'), str(tmp_path / 'metrics.prom'))
+  with metrics.span(lcmetrics.SPAN_SCREEN):
+    pass
+  metrics.timed(lcmetrics.SPAN_SUBMIT, lambda: None)()
+  metrics.timed(lcmetrics.SPAN_SUBMIT, lambda: None)()
+  metrics.count(lcmetrics.COUNTER_CASH, 50)
+  metrics.count(lcmetrics.COUNTER_CASH, 25)
+
+  assert metrics.export()
+  runs, spans= Exported(tmp_path / 'metrics.jsonl')
+  assert [span['span'] for span in spans] == [lcmetrics.SPAN_SCREEN, lcmetrics.SPAN_SUBMIT, lcmetrics.SPAN_SUBMIT]
+  assert runs[0]['counters'] == {lcmetrics.COUNTER_CASH: 75}
+
+  prometheus= (tmp_path / 'metrics.prom').read_text()
+  assert '{}phase_calls{{script="test",phase="submit"}} 2'.format(lcmetrics.PROMETHEUS_PREFIX) in prometheus
+  assert '{}{}{{script="test"}} 75'.format(lcmetrics.PROMETHEUS_PREFIX, lcmetrics.COUNTER_CASH) in prometheus
+
+
+def test_export_skips_runs_with_nothing_new(tmp_path):
+  path= tmp_path / 'metrics.jsonl'
+  metrics= lcmetrics.Metrics('test', str(path))
+  assert not metrics.export()
+  assert not path.exists()
+
+  metrics.count(lcmetrics.COUNTER_UNITS)
+  assert metrics.export()
+  assert not metrics.export()
+  assert len(Exported(path)[0]) == 1
+
+  # a daemon exports and clears after each release, then once more when it stops
+  metrics.record(lcmetrics.SPAN_SUBMIT, 0.5)
+  metrics.export()
+  metrics.clear()
+  assert not metrics.export()
+  assert len(Exported(path)[0]) == 2
+
+  metrics.record(lcmetrics.SPAN_SUBMIT, 0.5)
+  metrics.clear()
+  assert not metrics.export()
+  assert len(Exported(path)[0]) == 2
+
+
+def test_shutdown_after_a_daemon_release_adds_no_empty_run(investor, tmp_path):
+  path= tmp_path / 'metrics.jsonl'
+  options= ScriptOptions(investor, ['--daemon', '--metrics-jsonl', str(path)])
+  with options.metrics.span(lcmetrics.SPAN_LISTING):
+    pass
+  options.metrics.export()
+  options.metrics.clear()
+
+  investor.Shutdown(options)
+  runs, spans= Exported(path)
+  assert len(runs) == 1
+  assert [span['span'] for span in spans] == [lcmetrics.SPAN_LISTING]
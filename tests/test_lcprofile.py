@@ -0,0 +1,37 @@
+#
+# Import all necessary libraries
+#
+
+import lcmetrics
+import lcprofile
+import lcsynthetic
+
+
+#
+# Define our tests
+#
+
+def test_profiler_keeps_the_latest_phases(tmp_path, monkeypatch):
+  monkeypatch.setattr(lcprofile, 'MEMORY_RECORDS', 3)
+  prefix= str(tmp_path / 'run')
+  profiler= lcprofile.Profiler(prefix)
+  metrics= lcmetrics.Metrics('test', profiler=profiler)
+
+  profiler.start()
+  try:
+    # every daemon release traces its note processing phases again
+    for release in range(5):
+      with metrics.span(lcmetrics.SPAN_SCREEN):
+        lcsynthetic.Listing(100, release)
+      with metrics.span(lcmetrics.SPAN_SUBMIT):
+        pass
+  finally:
+    profiler.stop()
+
+  assert len(profiler.phases) == 3
+  assert profiler.traced == 5
+  memory= (tmp_path / 'run.memory.txt').read_text()
+  assert memory.startswith('Latest 3 of 5 phases traced')
+  assert memory.count('Phase "screen"') == 3
+  assert (tmp_path / 'run.prof').stat().st_size > 0
+  assert (tmp_path / 'run.collapsed').exists()
@@ -0,0 +1,111 @@
+#
+# Import all necessary libraries
+#
+
+import pytest
+
+import lcratelimit
+
+
+#
+# Define our stand-ins
+#
+
+# A clock that only moves when told to (sleeping moves it too)
+#
+class Clock:
+
+  # Constructor
+  def __init__(self):
+    self.now= 1000000.0
+    self.slept= 0
+
+
+  def time(self):
+    return self.now
+
+
+  def sleep(self, seconds):
+    self.slept+= seconds
+    self.now+= seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+  clock= Clock()
+  monkeypatch.setattr(lcratelimit, 'time', clock)
+  return clock
+
+
+#
+# Define our tests
+#
+
+def test_bucket_bursts_then_spaces_requests(clock):
+  limiter= lcratelimit.RateLimiter({lcratelimit.LIMIT_LISTING: (2.0, 3)})
+  assert [limiter.reserve(lcratelimit.LIMIT_LISTING) for attempt in range(5)] == [0, 0, 0, 0.5, 1.0]
+
+  # tokens come back at the sustained rate, but never beyond the burst
+  clock.now+= 1.0
+  assert limiter.reserve(lcratelimit.LIMIT_LISTING) == 0.5
+  clock.now+= 60
+  assert [limiter.reserve(lcratelimit.LIMIT_LISTING) for attempt in range(4)] == [0, 0, 0, 0.5]
+
+  # acquiring sleeps for the delay
+  assert limiter.acquire(lcratelimit.LIMIT_LISTING) == 1.0
+  assert clock.slept == 1.0
+
+
+def test_orders_are_limited_per_account(clock):
+  limiter= lcratelimit.RateLimiter()
+  rate, burst= lcratelimit.DEFAULT_LIMITS[lcratelimit.LIMIT_ORDERS]
+  for account in ['1', '2']:
+    assert [limiter.reserve(lcratelimit.LIMIT_ORDERS, account) for attempt in range(burst + 1)] == [0] * burst + [1 / rate]
+
+  # other endpoint classes are shared by all accounts
+  rate, burst= lcratelimit.DEFAULT_LIMITS[lcratelimit.LIMIT_ACCOUNT]
+  assert [limiter.reserve(lcratelimit.LIMIT_ACCOUNT, '1') for attempt in range(burst)] == [0] * burst
+  assert limiter.reserve(lcratelimit.LIMIT_ACCOUNT, '2') == 1 / rate
+
+
+def test_throttling_cuts_the_rate_then_recovers(clock):
+  limiter= lcratelimit.RateLimiter({lcratelimit.LIMIT_ACCOUNT: (4.0, 1)})
+  assert limiter.observe(lcratelimit.LIMIT_ACCOUNT, True) == 4.0 * lcratelimit.RATE_DECREASE
+  for attempt in range(20):
+    limiter.observe(lcratelimit.LIMIT_ACCOUNT, True)
+  assert limiter.rate(lcratelimit.LIMIT_ACCOUNT) == 4.0 * lcratelimit.RATE_FLOOR
+
+  # waits follow the reduced rate
+  limiter.reserve(lcratelimit.LIMIT_ACCOUNT)
+  assert limiter.reserve(lcratelimit.LIMIT_ACCOUNT) == pytest.approx(1 / (4.0 * lcratelimit.RATE_FLOOR))
+
+  for attempt in range(100):
+    limiter.observe(lcratelimit.LIMIT_ACCOUNT, False)
+  assert limiter.rate(lcratelimit.LIMIT_ACCOUNT) == 4.0
+
+
+def test_limits_are_shared_through_a_file(clock, tmp_path):
+  path= str(tmp_path / 'limits.json')
+  first= lcratelimit.RateLimiter(path=path)
+  second= lcratelimit.RateLimiter(path=path)
+  rate, burst= lcratelimit.DEFAULT_LIMITS[lcratelimit.LIMIT_LISTING]
+
+  assert [first.reserve(lcratelimit.LIMIT_LISTING) for attempt in range(burst)] == [0] * burst
+  assert second.reserve(lcratelimit.LIMIT_LISTING) == 1 / rate
+  second.observe(lcratelimit.LIMIT_LISTING, True)
+  assert first.rate(lcratelimit.LIMIT_LISTING) == rate * lcratelimit.RATE_DECREASE
+
+  # a damaged file only resets the buckets
+  with open(path, 'w') as destination:
+    destination.write('{"listing": [')
+  assert first.reserve(lcratelimit.LIMIT_LISTING) == 0
+
+
+def test_shared_limiters_and_bad_limits(tmp_path):
+  assert lcratelimit.SharedLimiter({lcratelimit.LIMIT_ORDERS: (0.5, 1)}) is lcratelimit.SharedLimiter({lcratelimit.LIMIT_ORDERS: (0.5, 1)})
+  assert lcratelimit.SharedLimiter() is not lcratelimit.SharedLimiter(path=str(tmp_path / 'limits.json'))
+
+  with pytest.raises(Exception, match='Unknown endpoint class'):
+    lcratelimit.RateLimiter({'loans': (1.0, 1)})
+  with pytest.raises(Exception, match='must be positive'):
+    lcratelimit.RateLimiter({lcratelimit.LIMIT_ORDERS: (0, 1)})
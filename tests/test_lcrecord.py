@@ -0,0 +1,116 @@
+#
+# Import all necessary libraries
+#
+
+import os
+
+import pytest
+
+import lcrecord
+import lcsynthetic
+
+
+#
+# Define our helpers
+#
+
+# Records as read back, i.e., with every field of the snapshot (missing ones as None)
+#
+def Filled(records):
+  fields= []
+  for record in records:
+    fields.extend(field for field in record if field not in fields)
+  return [dict((field, record.get(field)) for field in fields) for record in records]
+
+
+#
+# Define our tests
+#
+
+def test_recorded_snapshots_read_back(tmp_path):
+  path= str(tmp_path / 'snapshots.log')
+  listings= [lcsynthetic.Listing(300, seed) for seed in range(3)]
+  notes= lcsynthetic.OwnedNotes(200, 4)
+  summary= lcsynthetic.Summary(1, notes, 500.0)
+
+  recorder= lcrecord.SnapshotRecorder(path)
+  recorder.record(lcrecord.KIND_SUMMARY, summary, 100.0)
+  recorder.record(lcrecord.KIND_NOTES, notes, 101.0)
+  for index, listing in enumerate(listings):
+    recorder.record(lcrecord.KIND_LISTING, listing, 110.0 + index)
+  recorder.close()
+
+  with lcrecord.SnapshotReader(path) as reader:
+    assert len(reader) == 5
+    assert [snapshot.kind for snapshot in reader] == [lcrecord.KIND_SUMMARY, lcrecord.KIND_NOTES] + [lcrecord.KIND_LISTING] * 3
+    assert [snapshot.records() for snapshot in reader.snapshots(lcrecord.KIND_LISTING)] == [Filled(listing) for listing in listings]
+    assert reader.at(lcrecord.KIND_SUMMARY, 200.0).records() == [summary]
+    assert reader.at(lcrecord.KIND_NOTES, 101.0).records() == notes
+    assert reader.at(lcrecord.KIND_NOTES, 100.5) == None
+
+    # time ranges and columns
+    assert [snapshot.timestamp for snapshot in reader.snapshots(start=101.0, end=111.0)] == [101.0, 110.0, 111.0]
+    assert reader.at(lcrecord.KIND_LISTING, 111.5).columns()['id'] == [loan['id'] for loan in listings[1]]
+
+
+def test_records_with_missing_fields_and_repeats(tmp_path):
+  path= str(tmp_path / 'snapshots.log')
+  records= [{'id': 1, 'grade': 'A'}, {'id': 2, 'dti': 3.5}, {}, {'id': 4, 'grade': None, 'purpose': 'é☃'}]
+
+  recorder= lcrecord.SnapshotRecorder(path, [lcrecord.KIND_LISTING])
+  recorder.record(lcrecord.KIND_LISTING, records, 1.0)
+  # a listing polled again before anything changed is skipped
+  recorder.record(lcrecord.KIND_LISTING, records, 2.0)
+  recorder.record(lcrecord.KIND_LISTING, [], 3.0)
+  # kinds we were not asked to keep are dropped
+  recorder.record(lcrecord.KIND_NOTES, records, 4.0)
+  recorder.close()
+
+  with lcrecord.SnapshotReader(path) as reader:
+    assert [(snapshot.kind, snapshot.timestamp) for snapshot in reader] == [(lcrecord.KIND_LISTING, 1.0), (lcrecord.KIND_LISTING, 3.0)]
+    assert list(reader)[0].records() == Filled(records)
+    assert list(reader)[1].records() == []
+
+
+def test_reader_rebuilds_a_missing_or_stale_index(tmp_path):
+  path= str(tmp_path / 'snapshots.log')
+  recorder= lcrecord.SnapshotRecorder(path)
+  for seed in range(4):
+    recorder.record(lcrecord.KIND_LISTING, lcsynthetic.Listing(20, seed), float(seed))
+  recorder.close()
+
+  with lcrecord.SnapshotReader(path) as reader:
+    expected= [snapshot.records() for snapshot in reader]
+
+  # an index behind its log (e.g., written by an interrupted run) is rebuilt from the log
+  with open(path + lcrecord.INDEX_SUFFIX, 'r+b') as index:
+    index.truncate(lcrecord.INDEX.size * 2)
+  with lcrecord.SnapshotReader(path) as reader:
+    assert [snapshot.records() for snapshot in reader] == expected
+
+  os.remove(path + lcrecord.INDEX_SUFFIX)
+  with lcrecord.SnapshotReader(path) as reader:
+    assert [snapshot.records() for snapshot in reader] == expected
+
+  # a partly written last snapshot is ignored
+  with open(path, 'ab') as log:
+    log.write(lcrecord.HEADER.pack(lcrecord.MAGIC, lcrecord.KIND_CODES[lcrecord.KIND_LISTING], 9.0, 1000) + b'partial')
+  with lcrecord.SnapshotReader(path) as reader:
+    assert [snapshot.records() for snapshot in reader] == expected
+
+
+def test_recorder_survives_a_bad_snapshot(tmp_path, capsys):
+  path= str(tmp_path / 'snapshots.log')
+  recorder= lcrecord.SnapshotRecorder(path)
+  recorder.record(lcrecord.KIND_LISTING, [{'id': 1, 'when': object()}], 1.0)
+  recorder.record(lcrecord.KIND_LISTING, [{'id': 2}], 2.0)
+  recorder.close()
+
+  assert 'Could not record a listing snapshot' in capsys.readouterr().out
+  with lcrecord.SnapshotReader(path) as reader:
+    assert [snapshot.records() for snapshot in reader] == [[{'id': 2}]]
+
+
+def test_recorder_rejects_unknown_kinds(tmp_path):
+  with pytest.raises(Exception):
+    lcrecord.SnapshotRecorder(str(tmp_path / 'snapshots.log'), ['trades'])
@@ -0,0 +1,119 @@
+#
+# Import all necessary libraries
+#
+
+import asyncio
+import json
+
+import pytest
+
+import lcrequest
+import lcsynthetic
+from conftest import ClientOptions
+from lcrequest import JSONArrayStream
+
+
+#
+# Define some global constants
+#
+
+DOCUMENTS= [
+  {'myNotes': lcsynthetic.OwnedNotes(20, 1)},
+  {'a': 1, 'b': [1, {'x': '}]"'}], 'myNotes': lcsynthetic.OwnedNotes(5, 2), 'c': 12345},
+  {'z': 12345678, 'myNotes': []},
+  {'myNotes': [1, 2.5, -0.125, 1e21, 'é☃  ', None, True, False, [], {}]},
+]
+
+
+#
+# Define our helpers
+#
+
+def Chunks(body, size):
+  return [body[start:start + size] for start in range(0, len(body), size)]
+
+
+#
+# Define our tests
+#
+
+@pytest.mark.parametrize('document', DOCUMENTS)
+def test_stream_splits_anywhere(document):
+  for body in [json.dumps(document, ensure_ascii=False).encode('utf-8'), json.dumps(document, indent=2).encode('utf-8')]:
+    # every chunk size up to a small one splits tokens, numbers, and multibyte characters somewhere
+    for size in list(range(1, 17)) + [1000, len(body)]:
+      assert list(JSONArrayStream(Chunks(body, size)).iterate('myNotes')) == document['myNotes'], size
+
+
+def test_stream_splits_at_every_offset():
+  body= json.dumps(DOCUMENTS[3], ensure_ascii=False).encode('utf-8')
+  for split in range(len(body) + 1):
+    assert list(JSONArrayStream([body[:split], body[split:]]).iterate('myNotes')) == DOCUMENTS[3]['myNotes'], split
+
+
+def test_stream_without_the_key():
+  with pytest.raises(KeyError):
+    list(JSONArrayStream(Chunks(b'{"a": [1, 2], "b": {"myNotes": []}}', 3)).iterate('myNotes'))
+  with pytest.raises(KeyError):
+    list(JSONArrayStream([b'{}']).iterate('myNotes'))
+
+
+def test_stream_cut_short():
+  body= json.dumps(DOCUMENTS[0]).encode('utf-8')
+  with pytest.raises(ValueError):
+    list(JSONArrayStream(Chunks(body[:len(body) // 2], 64)).iterate('myNotes'))
+
+
+@pytest.mark.skipif(lcrequest.aiohttp == None, reason='aiohttp is not installed')
+def test_async_client_matches_the_synchronous_one(serve):
+  server= serve(['--seed', '3', '--notes', '200', '--listing-size', '100'])
+
+  async def Fetch():
+    async with lcrequest.AsyncLCRequest(ClientOptions(server)) as request:
+      assert await request.warm()
+      # independent calls overlap on the event loop
+      return await asyncio.gather(request.get_account_summary(), request.get_available_notes(), request.get_owned_notes(), request.get_owned_portfolios())
+
+  fetched= asyncio.run(Fetch())
+  with lcrequest.LCRequest(ClientOptions(server)) as request:
+    assert fetched == [request.get_account_summary(), request.get_available_notes(), request.get_owned_notes(), request.get_owned_portfolios()]
+  assert len(fetched[1]) == 100
+  assert len(fetched[2]) == 200
+
+
+@pytest.mark.skipif(lcrequest.aiohttp == None, reason='aiohttp is not installed')
+def test_async_client_orders_and_portfolios(serve):
+  server= serve(['--cash', '500'])
+
+  async def Order():
+    async with lcrequest.AsyncLCRequest(ClientOptions(server)) as request:
+      loans= await request.get_available_notes()
+      assert await request.find_portfolio('auto') == None
+      portfolio= await request.create_portfolio('auto', 'Automatically created')
+      assert await request.find_portfolio('auto') == portfolio['portfolioId']
+
+      response= await request.submit_order([{'loanId': loan['id'], 'requestedAmount': 25} for loan in loans[:4]])
+      return response, await request.get_account_summary()
+
+  response, summary= asyncio.run(Order())
+  assert [confirmation['investedAmount'] for confirmation in response['orderConfirmations']] == [25] * 4
+  assert summary['availableCash'] == 400
+
+
+@pytest.mark.skipif(lcrequest.aiohttp == None, reason='aiohttp is not installed')
+def test_async_client_retries_only_idempotent_calls(serve):
+  server= serve(['--error-rate', '1'])
+
+  async def Fail(call):
+    async with lcrequest.AsyncLCRequest(ClientOptions(server, retries=2, backoff=0.01)) as request:
+      with pytest.raises(Exception, match='status code 50'):
+        await call(request)
+      return request.stats()['endpoints']
+
+  endpoints= asyncio.run(Fail(lambda request: request.get_account_summary()))
+  assert endpoints[lcrequest.REQUEST_SUMMARY]['calls'] == 1
+  assert endpoints[lcrequest.REQUEST_SUMMARY]['retries'] == 2
+
+  # an order may have executed, so it is never retried
+  endpoints= asyncio.run(Fail(lambda request: request.submit_order([{'loanId': 1, 'requestedAmount': 25}])))
+  assert endpoints[lcrequest.REQUEST_ORDERS]['retries'] == 0
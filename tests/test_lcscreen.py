@@ -0,0 +1,108 @@
+#
+# Import all necessary libraries
+#
+
+import copy
+
+import pytest
+
+import lcscreen
+import lcsynthetic
+from conftest import ScriptOptions
+
+
+#
+# Define some global constants
+#
+
+PREFERENCES= [
+  [],
+  ['--dti', '20', '--utilization', '50', '--employment-months', '6', '--record-months', '10'],
+  ['--delinquency-months', '12', '--derogatory-months', '24'],
+]
+
+
+#
+# Define our tests
+#
+
+@pytest.mark.skipif(not lcscreen.Available(), reason='NumPy is not installed')
+@pytest.mark.parametrize('preferences', PREFERENCES)
+def test_numpy_engine_picks_the_same_notes(investor, preferences):
+  python= ScriptOptions(investor, preferences)
+  numpy= ScriptOptions(investor, preferences + ['--engine', 'numpy'])
+
+  for count, seed in [(0, 1), (1, 2), (50, 3), (5000, 4)]:
+    notes= lcsynthetic.Listing(count, seed)
+    ownedLoans= set(note['id'] for note in notes[::7])
+    for desiredGrades in [{'A', 'B', 'C', 'F'}, {'G'}, set()]:
+      expected= investor.FilterNotesByPreference(python, ownedLoans, notes, desiredGrades)
+      assert investor.FilterNotesByPreference(numpy, ownedLoans, notes, desiredGrades) == expected
+      # notes decoded into columns once (e.g., for repeated screening) give the same picks
+      assert investor.FilterNotesByPreference(numpy, ownedLoans, lcscreen.NoteColumns(notes), desiredGrades) == expected
+
+
+# Screen loans through a verdict cache and directly, counting the loans the cache screens again
+#
+def CachedScreening(investor, cache, ownedLoans, notes, desiredGrades):
+  options= ScriptOptions(investor, PREFERENCES[1])
+  direct= investor.ScreenNotesByPreference(options, ownedLoans, notes, desiredGrades)
+  cached= cache.screen(notes, ownedLoans, desiredGrades, lambda changed: investor.ScreenNotesByPreference(options, ownedLoans, changed, desiredGrades))
+  return cached, direct
+
+
+def test_verdict_cache_screens_only_new_or_changed_loans(investor):
+  options= ScriptOptions(investor, PREFERENCES[1])
+  cache= lcscreen.VerdictCache(['grade'] + [rule.field for rule in options.strategy.rules])
+  ownedLoans= {lcsynthetic.FIRST_LOAN_ID + 5}
+  desiredGrades= {'A', 'B', 'C'}
+  notes= lcsynthetic.Listing(2000, 7)
+
+  cached, direct= CachedScreening(investor, cache, ownedLoans, notes, desiredGrades)
+  assert cached == direct
+  assert cache.changed == len(notes)
+
+  # polling again with nothing changed screens nothing
+  cached, direct= CachedScreening(investor, cache, ownedLoans, notes, desiredGrades)
+  assert cached == direct
+  assert cache.changed == 0
+
+  # funding changes alone keep verdicts; changed attributes and new loans get screened
+  polled= copy.deepcopy(notes[100:]) + lcsynthetic.Listing(50, 9, lcsynthetic.FIRST_LOAN_ID + len(notes))
+  for note in polled[:300]:
+    note['fundedAmount']+= 25
+  polled[0]['dti']= 99
+  polled[1]['purpose']= 'vacation'
+  cached, direct= CachedScreening(investor, cache, ownedLoans, polled, desiredGrades)
+  assert cached == direct
+  assert cache.changed == 2 + 50
+
+  # loans that left the listing are evicted
+  assert len(cache.verdicts) == len(polled)
+
+
+def test_verdict_cache_starts_over_for_new_owned_loans_or_grades(investor):
+  options= ScriptOptions(investor)
+  cache= lcscreen.VerdictCache(['grade'] + [rule.field for rule in options.strategy.rules])
+  notes= lcsynthetic.Listing(500, 11)
+  ownedLoans= set()
+
+  CachedScreening(investor, cache, ownedLoans, notes, {'A', 'B'})
+  cached, direct= CachedScreening(investor, cache, ownedLoans, notes, {'B', 'A'})
+  assert cached == direct
+  assert cache.changed == 0
+
+  cached, direct= CachedScreening(investor, cache, ownedLoans, notes, {'A'})
+  assert cached == direct
+  assert cache.changed == len(notes)
+
+  # a new set of owned loans (e.g., after an order) invalidates every verdict
+  ownedLoans= set(note['id'] for note in notes[:100])
+  cached, direct= CachedScreening(investor, cache, ownedLoans, notes, {'A'})
+  assert cached == direct
+  assert cache.changed == len(notes)
+
+  cache.clear()
+  assert cache.verdicts == {}
+  CachedScreening(investor, cache, ownedLoans, notes, {'A'})
+  assert cache.changed == len(notes)
@@ -0,0 +1,162 @@
+#
+# Import all necessary libraries
+#
+
+import copy
+
+import pytest
+
+import lcstore
+import lcsynthetic
+from conftest import ScriptOptions, SyntheticRequest
+
+
+#
+# Define some global constants
+#
+
+# Per-grade totals the report shows (the store also sums pending principal, for lc-auto-invest)
+REPORTED= [lcstore.KEY_COUNT, lcstore.KEY_NOTE_AMOUNT, lcstore.KEY_NOTE_PRINCIPAL_RETURNED, lcstore.KEY_NOTE_INTEREST_PAID, lcstore.KEY_NOTE_PAYMENTS]
+
+
+#
+# Define our stand-ins and helpers
+#
+
+# Count note downloads and add the notes ordered to the owned notes, as the API would
+#
+class BuyingRequest(SyntheticRequest):
+
+  # Constructor
+  def __init__(self, notes, listing=(), cash=1000.0):
+    SyntheticRequest.__init__(self, list(notes), listing, cash)
+    self.downloads= 0
+
+
+  def iter_owned_notes(self, fields=None):
+    self.downloads+= 1
+    return SyntheticRequest.iter_owned_notes(self, fields)
+
+
+  def submit_order(self, notes, throttled=False):
+    response= SyntheticRequest.submit_order(self, notes, throttled)
+    for item in notes:
+      self.notes.append(dict(self.notes[0], noteId=max(note['noteId'] for note in self.notes) + 1, loanId=item['loanId'], principalPending=item['requestedAmount']))
+    return response
+
+
+# Round the reported sums of per-grade totals (the store adds them up in a different order)
+#
+def Rounded(totals):
+  return dict((grade, dict((key, round(totals[grade][key], 6)) for key in REPORTED)) for grade in totals)
+
+
+# Change some notes, drop some, and add new ones, as a later sync would see them
+#
+def Changed(notes):
+  notes= copy.deepcopy(notes[50:])
+  for note in notes[:40]:
+    note['principalReceived']+= 1.25
+    note['principalPending']-= 1.25
+    note['loanStatus']= 'Fully Paid'
+  added= lcsynthetic.OwnedNotes(30, 9)
+  for note in added:
+    note['noteId']+= 100000
+  return notes + added
+
+
+#
+# Define our tests
+#
+
+def test_store_matches_report_engines(reporter, tmp_path):
+  notes= lcsynthetic.OwnedNotes(2000, 1)
+  performance, statusCodes= reporter.CompilePerformance(notes)
+
+  with lcstore.NoteStore(str(tmp_path / 'notes.db'), 1) as store:
+    assert store.sync(notes) == (len(notes), 0)
+    assert Rounded(store.grade_totals()) == Rounded(performance)
+    # statuses come out in the order they first appear among the notes, like the other engines
+    assert list(store.status_counts().items()) == list(statusCodes.items())
+
+
+def test_store_applies_only_differences(reporter, tmp_path):
+  notes= lcsynthetic.OwnedNotes(500, 2)
+  later= Changed(notes)
+  performance, statusCodes= reporter.CompilePerformance(later)
+
+  with lcstore.NoteStore(str(tmp_path / 'notes.db'), 1) as store:
+    store.sync(notes)
+    changed, removed= store.sync(later)
+    assert removed == 50
+    assert changed == 40 + 30
+
+    assert Rounded(store.grade_totals()) == Rounded(performance)
+    assert list(store.status_counts().items()) == list(statusCodes.items())
+    assert store.owned_loans() == set(note['loanId'] for note in later)
+
+    # syncing the same notes again changes nothing
+    assert store.sync(later) == (0, 0)
+
+  # another account in the same store is kept apart
+  with lcstore.NoteStore(str(tmp_path / 'notes.db'), 2) as store:
+    assert store.grade_totals() == {}
+    store.sync(notes[:10])
+  with lcstore.NoteStore(str(tmp_path / 'notes.db'), 1) as store:
+    assert Rounded(store.grade_totals()) == Rounded(performance)
+
+
+@pytest.mark.parametrize('preferences', [['--store-max-age', '0'], []])
+def test_store_tally_matches_tally_notes(investor, tmp_path, preferences):
+  notes= lcsynthetic.OwnedNotes(1500, 3)
+  request= SyntheticRequest(notes)
+  count, principal, notesCount, investedLoans= investor.TallyNotes(ScriptOptions(investor), request)
+
+  options= ScriptOptions(investor, ['--store', str(tmp_path / 'notes.db')] + preferences)
+  for attempt in range(2):
+    # the second tally may read the store without syncing it
+    storeCount, storePrincipal, storeNotesCount, storeInvestedLoans= investor.TallyNotes(options, request)
+    assert storeCount == count
+    assert dict((grade, round(storePrincipal[grade], 6)) for grade in storePrincipal) == dict((grade, round(principal[grade], 6)) for grade in principal)
+    assert storeNotesCount == notesCount == len(notes)
+    assert storeInvestedLoans == investedLoans
+
+
+def test_store_syncs_again_after_an_order(investor, tmp_path):
+  request= BuyingRequest(lcsynthetic.OwnedNotes(300, 4))
+  options= ScriptOptions(investor, ['--store', str(tmp_path / 'notes.db'), '--quiet'])
+
+  # by default a recent sync is reused
+  investor.TallyNotes(options, request)
+  count, principal, notesCount, investedLoans= investor.TallyNotes(options, request)
+  assert request.downloads == 1
+  assert notesCount == 300
+
+  # notes just ordered are never bought again
+  loanId= lcsynthetic.FIRST_LOAN_ID + 100000
+  investor.SubmitOrder(options, request, [investor.OrderItem(options, loanId, 50)])
+  count, principal, notesCount, investedLoans= investor.TallyNotes(options, request)
+  assert request.downloads == 2
+  assert notesCount == 301
+  assert loanId in investedLoans
+
+  # a simulated order buys nothing, so the store stays current
+  options.simulation= True
+  investor.SubmitOrder(options, request, [investor.OrderItem(options, loanId + 1, 50)])
+  investor.TallyNotes(options, request)
+  assert request.downloads == 2
+
+
+def test_store_expires(tmp_path):
+  with lcstore.NoteStore(str(tmp_path / 'notes.db'), 1) as store:
+    request= BuyingRequest(lcsynthetic.OwnedNotes(10, 5))
+    assert store.age() == None
+    store.refresh(request)
+    assert 0 <= store.age() < lcstore.MAXIMUM_AGE_SECONDS
+    assert store.refresh(request) == (0, 0)
+    assert request.downloads == 1
+
+    store.expire()
+    assert store.age() == None
+    store.refresh(request)
+    assert request.downloads == 2
@@ -0,0 +1,114 @@
+#
+# Import all necessary libraries
+#
+
+import json
+
+import pytest
+
+import lcscreen
+import lcstrategy
+import lcsynthetic
+from conftest import ScriptOptions
+
+
+#
+# Define some global constants
+#
+
+# Rules of every operator, on numeric and text fields, with both treatments of missing values
+RULES= [
+  {'field': 'purpose', 'in': ['debt_consolidation', 'credit_card', 'car']},
+  {'field': 'purpose', 'equals': 'debt_consolidation'},
+  {'field': 'homeOwnership', 'equals': 'RENT', 'missing': 'pass'},
+  {'field': 'subGrade', 'min': 'B3'},
+  {'field': 'subGrade', 'max': 'D2'},
+  {'field': 'empLength', 'min': 12},
+  {'field': 'empLength', 'equals': 120, 'missing': 'pass'},
+  {'field': 'dti', 'max': 30},
+  {'field': 'dtiJoint', 'max': 25, 'missing': 'fail'},
+  {'field': 'taxLiens', 'equals': 0},
+  {'field': 'mthsSinceLastDelinq', 'min': 12, 'missing': 'pass'},
+]
+
+
+#
+# Define our helpers
+#
+
+# Write a strategy file and parse it for lc-auto-invest
+#
+def StrategyOptions(investor, tmp_path, document, arguments=()):
+  path= tmp_path / 'strategy.json'
+  path.write_text(json.dumps(document))
+  return ScriptOptions(investor, ['--strategy', str(path)] + list(arguments))
+
+
+# Test a rule the slow way
+#
+def Passes(rule, note):
+  value= note[rule['field']]
+  operator= [operator for operator in lcstrategy.OPERATORS if operator in rule][0]
+  if value is None:
+    return rule.get('missing', lcstrategy.OPERATORS[operator]) == 'pass'
+  if operator == 'in':
+    return value in rule['in']
+  if operator == 'min':
+    return value >= rule['min']
+  if operator == 'max':
+    return value <= rule['max']
+  return value == rule['equals']
+
+
+#
+# Define our tests
+#
+
+@pytest.mark.parametrize('rule', RULES)
+def test_compiled_rule_matches_its_definition(rule):
+  strategy= lcstrategy.ParseStrategy({'rules': [rule]})
+  for note in lcsynthetic.Listing(500, 1):
+    assert strategy.predicate(note) == Passes(rule, note), note
+
+
+def test_calibrated_strategy_keeps_its_verdicts():
+  strategy= lcstrategy.ParseStrategy({'rules': RULES[5:]})
+  notes= lcsynthetic.Listing(2000, 2)
+  before= [strategy.predicate(note) for note in notes]
+  strategy.calibrate(notes)
+  assert [strategy.predicate(note) for note in notes] == before
+  assert [rule.rejection for rule in strategy.rules] == sorted((rule.rejection for rule in strategy.rules), reverse=True)
+
+
+@pytest.mark.skipif(not lcscreen.Available(), reason='NumPy is not installed')
+@pytest.mark.parametrize('rules', [[rule] for rule in RULES] + [RULES[:3], RULES[3:]])
+def test_engines_agree_on_strategy_rules(investor, tmp_path, rules):
+  python= StrategyOptions(investor, tmp_path, {'rules': rules})
+  numpy= StrategyOptions(investor, tmp_path, {'rules': rules}, ['--engine', 'numpy'])
+  notes= lcsynthetic.Listing(3000, 3)
+  desiredGrades= set(lcsynthetic.GRADES)
+
+  expected= investor.FilterNotesByPreference(python, set(), notes, desiredGrades)
+  assert len(expected) > 0
+  assert investor.FilterNotesByPreference(numpy, set(), notes, desiredGrades) == expected
+
+
+def test_strategy_file_overrides_command_line(investor, tmp_path):
+  options= StrategyOptions(investor, tmp_path, {'grades': {'A': 12.5, 'B': 37.5}, 'minimumAmountPerNote': 50, 'maximumAmountPerNote': 200}, ['--grade', 'C', '100'])
+  assert options.min == 50
+  assert options.max == 200
+  assert options.allocations['A'] == 0.125
+  assert options.allocations['B'] == 0.375
+  assert options.allocations['C'] == 0
+  # a strategy without rules screens with the command line preferences
+  assert len(options.strategy.rules) > 0
+
+
+def test_grade_percentages(investor):
+  options= ScriptOptions(investor, ['--grade', 'A', '33.3', '--grade', 'B', '33.3', '--grade', 'c', '33.4'])
+  assert options.allocations['A'] == pytest.approx(0.333)
+  assert options.allocations['C'] == pytest.approx(0.334)
+
+  for grades in [['--grade', 'A', 'half'], ['--grade', 'A', '-5'], ['--grade', 'A', '60', '--grade', 'B', '40.5']]:
+    with pytest.raises(Exception):
+      ScriptOptions(investor, grades)